@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import discord
+
+from storage import IOWorker, _atomic_write
+
+
+def _hash_arquivo(caminho: Path) -> str:
+    h = hashlib.sha256()
+    with caminho.open("rb") as f:
+        for bloco in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _conferir(caminho: str, info):
+    # Roda fora do loop: stat e, se mtime/tamanho mudaram, o sha256 do
+    # arquivo inteiro. None se o arquivo não existe.
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    if not os.path.isfile(caminho):
+        return None
+    if info and info["mtime_ns"] == st.st_mtime_ns and info["tamanho"] == st.st_size:
+        return info
+    return {"sha256": _hash_arquivo(Path(caminho)), "mtime_ns": st.st_mtime_ns, "tamanho": st.st_size}
+
+
+def _expirou(url: str, margem: float = 3600) -> bool:
+    # URLs de anexo do Discord trazem ?ex=<timestamp hex> de validade
+    ex = parse_qs(urlparse(url).query).get("ex")
+    if not ex:
+        return False
+    try:
+        return int(ex[0], 16) - margem < time.time()
+    except ValueError:
+        return False
+
+
+class AssetCache:
+    # Imagens locais (imagens/...) são enviadas uma vez para o canal de
+    # assets; os embeds passam a usar a URL do CDN em vez de reenviar o
+    # arquivo a cada pack, página ou duplicata.
+    #
+    # assets.json guarda:
+    #   arquivos: caminho -> {sha256, mtime_ns, tamanho}
+    #   uploads:  sha256  -> {url, canal, mensagem}
+    # O hash só é recalculado quando mtime/tamanho mudam; se o conteúdo
+    # mudou, o hash novo não tem upload e o arquivo é enviado de novo.
+    # Arquivos iguais em caminhos diferentes dividem o mesmo upload.
+    #
+    # Nada de disco no loop: stat/hash vão para o executor padrão e o
+    # assets.json é gravado na thread de I/O do store.
+
+    def __init__(self, path: Path, canal_id: int = None, io: IOWorker = None):
+        self.path = Path(path)
+        self.canal_id = canal_id
+        self.io = io or IOWorker("assets-io")
+        self.arquivos = {}
+        self.uploads = {}
+        self._enviando = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.arquivos = data.get("arquivos", {})
+            self.uploads = data.get("uploads", {})
+
+    def _salvar(self):
+        # cópia rasa: as entradas são trocadas inteiras, nunca alteradas;
+        # gravações ainda na fila viram uma só
+        dados = {"arquivos": dict(self.arquivos), "uploads": dict(self.uploads)}
+        return self.io.submit(("assets", str(self.path)), _atomic_write, self.path, dados, "assets", 2)
+
+    async def _hash(self, caminho: str):
+        info = self.arquivos.get(caminho)
+        novo = await asyncio.get_running_loop().run_in_executor(None, _conferir, caminho, info)
+        if novo is None:
+            return None
+        if novo is not info:
+            self.arquivos[caminho] = novo
+        return novo["sha256"]
+
+    async def url(self, bot, caminho: str):
+        # URL do CDN para a imagem local, ou None (sem canal configurado,
+        # arquivo inexistente ou falha no envio): aí quem chama anexa o arquivo.
+        if not self.canal_id:
+            return None
+        sha = await self._hash(caminho)
+        if sha is None:
+            return None
+        upload = self.uploads.get(sha)
+        if upload and not _expirou(upload["url"]):
+            return upload["url"]
+
+        # um envio por conteúdo, mesmo com vários comandos pedindo juntos
+        tarefa = self._enviando.get(sha)
+        if tarefa is None:
+            tarefa = self._enviando[sha] = asyncio.ensure_future(self._enviar(bot, caminho, sha, upload))
+            tarefa.add_done_callback(lambda _: self._enviando.pop(sha, None))
+        return await asyncio.shield(tarefa)
+
+    async def _canal(self, bot):
+        canal = bot.get_channel(self.canal_id)
+        if canal is None:
+            canal = await bot.fetch_channel(self.canal_id)
+        return canal
+
+    async def _enviar(self, bot, caminho: str, sha: str, upload):
+        try:
+            canal = await self._canal(bot)
+            msg = None
+            if upload:
+                # só a URL assinada venceu: busca a mensagem de novo em vez de reenviar
+                try:
+                    msg = await canal.fetch_message(upload["mensagem"])
+                except discord.NotFound:
+                    msg = None
+            if msg is None or not msg.attachments:
+                msg = await canal.send(
+                    content=f"`{os.path.basename(caminho)}` sha256={sha[:12]}",
+                    file=discord.File(caminho, filename=os.path.basename(caminho)),
+                )
+            self.uploads[sha] = {"url": msg.attachments[0].url, "canal": canal.id, "mensagem": msg.id}
+            self._salvar()
+            return self.uploads[sha]["url"]
+        except Exception as e:
+            print(f"[assets] falha ao enviar {caminho}: {e}")
+            return None
@@ -0,0 +1,319 @@
+# Roda os comandos do bot (callbacks) com ctx/membro/servidor falsos sobre
+# uma base sintética, sem rede e sem token. Serve para pegar regressão no
+# store, nos duelos e nas coleções:
+#
+#     python benchmarks/bench_commands.py --users 10000 --backend json
+#     python benchmarks/bench_commands.py --users 1000000 --com-cartas 20000 --backend sqlite
+#     python benchmarks/bench_commands.py --comandos abrirpack,ranking --json saida.json
+#
+# Cada execução usa um DATA_DIR temporário; os arquivos do repositório
+# não são tocados. Relata vazão, p50/p95/p99 e memória (RSS) depois de
+# cada comando, o tamanho dos arquivos de dados e a memória do processo.
+# A memória "base carregada" inclui uma segunda cópia da base, aberta só
+# para medir o tempo de carga.
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+COMANDOS = ["abrirpack", "kitdiario", "duelar", "aceitar", "fusao", "ranking", "minhacolecao", "meuscards"]
+
+
+# ---------------------------------------------------------
+# Objetos falsos do Discord
+# ---------------------------------------------------------
+class FakeMessage:
+    _ids = 0
+
+    def __init__(self, content=None, embed=None):
+        FakeMessage._ids += 1
+        self.id = FakeMessage._ids
+        self.content = content
+        self.embed = embed
+        self.attachments = []
+
+    async def edit(self, **kwargs):
+        self.embed = kwargs.get("embed", self.embed)
+
+    async def delete(self):
+        pass
+
+    async def add_reaction(self, emoji):
+        pass
+
+
+class FakeMember:
+    def __init__(self, user_id: int, guild=None):
+        self.id = user_id
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+        self.display_name = f"jogador{user_id}"
+        self.name = self.display_name
+        self.avatar = None
+        self.roles = []
+        self.guild = guild
+
+    async def add_roles(self, *roles, reason=None):
+        self.roles.extend(roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        for role in roles:
+            if role in self.roles:
+                self.roles.remove(role)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 1):
+        self.id = guild_id
+        self.roles = []
+        self.chunked = True
+        self._members = {}
+
+    def get_member(self, user_id: int):
+        member = self._members.get(user_id)
+        if member is None:
+            member = self._members[user_id] = FakeMember(user_id, self)
+        return member
+
+    def get_role(self, role_id):
+        return None
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+
+class FakeContext:
+    def __init__(self, author: FakeMember, guild: FakeGuild):
+        self.author = author
+        self.guild = guild
+        self.enviadas = 0
+
+    async def send(self, content=None, **kwargs):
+        self.enviadas += 1
+        return FakeMessage(content, kwargs.get("embed"))
+
+
+# ---------------------------------------------------------
+# Base sintética
+# ---------------------------------------------------------
+def gerar_registros(usuarios: int, com_cartas: int, min_cartas: int, max_cartas: int,
+                    ids_cartas, rng: random.Random):
+    # saldos/vitórias/gastos para todos; inventário para os primeiros
+    # "com_cartas" usuários, com tamanho log-uniforme entre min e max cópias
+    records = []
+    for uid in range(1, usuarios + 1):
+        records.append(("set", "balances", str(uid), 10 ** 9))
+        if rng.random() < 0.5:
+            records.append(("set", "wins", str(uid), rng.randint(1, 500)))
+        if rng.random() < 0.7:
+            records.append(("set", "spent", str(uid), rng.randint(1, 50_000)))
+    for uid in range(1, com_cartas + 1):
+        tamanho = int(math.exp(rng.uniform(math.log(min_cartas), math.log(max_cartas))))
+        inv = {}
+        for card_id in rng.choices(ids_cartas, k=tamanho):
+            inv[str(card_id)] = inv.get(str(card_id), 0) + 1
+        records.append(("set", "cards", str(uid), inv))
+    return records
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def tamanho_arquivos(data_dir: Path):
+    return {p.name: p.stat().st_size for p in sorted(data_dir.iterdir()) if p.is_file()}
+
+
+# ---------------------------------------------------------
+# Execução
+# ---------------------------------------------------------
+async def medir(nome: str, ops: int, rodar):
+    amostras = []
+    inicio = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        await rodar(i)
+        amostras.append(time.perf_counter() - t0)
+    total = time.perf_counter() - inicio
+    return nome, amostras, total, rss_mb()
+
+
+def percentil(ordenadas, p: float) -> float:
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+async def rodar(args, main, rng: random.Random):
+    guild = FakeGuild()
+    com_cartas = max(2, args.com_cartas)
+
+    def ctx(uid: int):
+        return FakeContext(guild.get_member(uid), guild)
+
+    def jogador():
+        return rng.randint(1, com_cartas)
+
+    async def abrirpack(i):
+        await main.abrirpack.callback(ctx(jogador()))
+
+    async def kitdiario(i):
+        await main.kitdiario.callback(ctx(rng.randint(1, args.users)))
+
+    # duelos: cada aceitar consome um desafio criado na fase do duelar
+    pares = []
+
+    async def duelar(i):
+        a = jogador()
+        b = a % com_cartas + 1
+        pares.append((a, b))
+        await main.duelar.callback(ctx(a), guild.get_member(b), 10)
+
+    async def aceitar(i):
+        a, b = pares[i % len(pares)]
+        await main.aceitar.callback(ctx(b), guild.get_member(a))
+
+    async def fusao(i):
+        await main.fusao_cmd.callback(ctx(jogador()), rng.choice(["comum", "rara", "épica"]))
+
+    async def ranking(i):
+        await main.ranking.callback(ctx(jogador()))
+
+    async def minhacolecao(i):
+        await main.minhacolecao.callback(ctx(jogador()))
+
+    async def meuscards(i):
+        await main.meuscards.callback(ctx(jogador()))
+
+    funcoes = {
+        "abrirpack": abrirpack,
+        "kitdiario": kitdiario,
+        "duelar": duelar,
+        "aceitar": aceitar,
+        "fusao": fusao,
+        "ranking": ranking,
+        "minhacolecao": minhacolecao,
+        "meuscards": meuscards,
+    }
+    resultados = []
+    for nome in args.comandos:
+        if nome == "aceitar" and not pares:
+            await medir("duelar", args.ops, duelar)  # precisa de desafios pendentes
+        resultados.append(await medir(nome, args.ops, funcoes[nome]))
+    return resultados
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--com-cartas", type=int, default=None,
+                        help="usuários com inventário (padrão: todos, até 20000)")
+    parser.add_argument("--min-cartas", type=int, default=10)
+    parser.add_argument("--max-cartas", type=int, default=2000)
+    parser.add_argument("--backend", default="json", choices=["json", "journal", "shared", "sqlite"])
+    parser.add_argument("--ops", type=int, default=500, help="execuções por comando")
+    parser.add_argument("--comandos", default=",".join(COMANDOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="saida_json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    args.comandos = [c.strip() for c in args.comandos.split(",") if c.strip()]
+    if args.com_cartas is None:
+        args.com_cartas = min(args.users, 20_000)
+    args.com_cartas = min(args.com_cartas, args.users)
+    desconhecidos = set(args.comandos) - set(COMANDOS)
+    if desconhecidos:
+        parser.error(f"comandos desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        os.environ.update({
+            "DATA_DIR": str(data_dir),
+            "STORAGE_BACKEND": args.backend,
+            "FLUSH_INTERVAL": "3600",
+            "METRICS_PORT": "0",
+        })
+        os.environ.pop("ASSET_CHANNEL_ID", None)
+
+        rss_inicio = rss_mb()
+        import main  # noqa: E402  (lê o ambiente acima; começa com a base vazia)
+
+        # A base entra pelo próprio store (vale para qualquer backend) e é
+        # gravada; depois mede quanto um processo novo leva para carregá-la.
+        t0 = time.perf_counter()
+        ids_cartas = list(main.catalogo.by_id)
+        main.store.apply(gerar_registros(
+            args.users, args.com_cartas, args.min_cartas, args.max_cartas, ids_cartas, rng
+        ))
+        main.store.flush()
+        geracao = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        main.open_store(args.backend, main.store.files, data_dir, flush_interval=3600)
+        carga = time.perf_counter() - t0
+        rss_carregado = rss_mb()
+
+        print(f"base: {args.users} usuários, {args.com_cartas} com {args.min_cartas}-{args.max_cartas} cartas, "
+              f"backend {args.backend} (gerada em {geracao:.1f}s, carregada em {carga:.2f}s)")
+
+        resultados = asyncio.run(rodar(args, main, rng))
+
+        t0 = time.perf_counter()
+        main.store.flush()
+        flush = time.perf_counter() - t0
+        arquivos = tamanho_arquivos(data_dir)
+
+    print(f"\n{'comando':<13} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'RSS MiB':>8}")
+    saida = {"args": vars(args), "comandos": {}}
+    for nome, amostras, total, rss in resultados:
+        ordenadas = sorted(amostras)
+        linha = {
+            "ops": len(amostras),
+            "ops_s": len(amostras) / total if total else 0.0,
+            "p50_ms": statistics.median(ordenadas) * 1000,
+            "p95_ms": percentil(ordenadas, 0.95) * 1000,
+            "p99_ms": percentil(ordenadas, 0.99) * 1000,
+            "max_ms": ordenadas[-1] * 1000,
+            "rss_mb": rss,
+        }
+        saida["comandos"][nome] = linha
+        print(f"{nome:<13} {linha['ops_s']:>9.0f} {linha['p50_ms']:>8.3f} {linha['p95_ms']:>8.3f} "
+              f"{linha['p99_ms']:>8.3f} {linha['max_ms']:>8.3f} {rss:>8.0f}")
+
+    rss_fim = rss_mb()
+    print(f"\nflush final: {flush * 1000:.1f} ms")
+    print("arquivos:")
+    for nome, tamanho in arquivos.items():
+        print(f"  {nome:<28} {tamanho / 1024:>10.1f} KiB")
+    print(f"memória (RSS): início {rss_inicio:.0f} MiB, base carregada {rss_carregado:.0f} MiB, "
+          f"fim {rss_fim:.0f} MiB")
+
+    saida.update({
+        "carga_s": carga,
+        "flush_s": flush,
+        "arquivos": arquivos,
+        "rss_mb": {"inicio": rss_inicio, "carregado": rss_carregado, "fim": rss_fim},
+    })
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump(saida, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,323 @@
+# Vários processos no mesmo DATA_DIR com STORAGE_BACKEND=shared, cada um
+# transferindo parte do saldo entre usuários de um conjunto pequeno
+# (quanto menor, mais disputa pelas mesmas chaves):
+#
+#     python benchmarks/bench_contention.py --processos 4 --ops 2000 --usuarios 50
+#     python benchmarks/bench_contention.py --processos 8 --usuarios 4 --fsync
+#     python benchmarks/bench_contention.py --processos 4 --usuarios 4 --sem-cas
+#     python benchmarks/bench_contention.py --cenario premios --processos 2 --usuarios 2000
+#
+# Relata vazão, latência da transação, conflitos (transações refeitas) e
+# quanto tempo a trava do diário fica presa e é esperada. No fim confere
+# que nenhuma moeda sumiu ou apareceu, que nenhum saldo ficou negativo e
+# que todos os processos (e uma carga nova do disco) veem o mesmo estado;
+# cada processo também olha o saldo de quem pagou logo após cada commit.
+# --sem-cas desliga a conferência de versões, para ver o que ela evita.
+#
+# --cenario premios: cada processo roda um JoinAwardScheduler sobre os
+# mesmos membros e todos chamam tick() ao mesmo tempo, rodada após rodada
+# (a hora é simulada). Cada membro tem que receber exatamente uma
+# recompensa por rodada, não importa quantos processos tentaram pagar.
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+SALDO_INICIAL = 1000
+PREMIO = 100
+PREMIO_SEGUNDOS = 3600
+INICIO_PREMIOS = 1_700_000_000.0
+
+
+def arquivos(data_dir: Path) -> dict:
+    nomes = ("balances", "last_claims", "cards", "join_times", "wins", "spent", "duels")
+    return {nome: data_dir / f"{nome}.json" for nome in nomes}
+
+
+def abrir(data_dir: Path, compactar_a_cada: int, fsync: bool):
+    import storage
+    if storage.fcntl is None:
+        sys.exit("flock indisponível neste sistema")
+    return storage.SharedJournalStore(arquivos(data_dir), data_dir, flush_interval=1,
+                                      compact_every=compactar_a_cada, fsync=fsync)
+
+
+def resumo(store) -> str:
+    saldos = json.dumps(store.table("balances"), sort_keys=True)
+    return hashlib.sha1(saldos.encode()).hexdigest()[:12]
+
+
+def percentil(ordenadas, p: float) -> float:
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+def media_hist(metrica, **labels) -> float:
+    estado = metrica._valores.get(metrica._chave(labels))
+    return estado[2] / estado[1] if estado and estado[1] else 0.0
+
+
+def max_hist(metrica, **labels) -> float:
+    # limite do maior bucket com amostras
+    estado = metrica._valores.get(metrica._chave(labels))
+    if not estado:
+        return 0.0
+    for limite, qtd in reversed(list(zip(metrica.buckets, estado[0]))):
+        if qtd:
+            return limite
+    return float("inf") if estado[1] else 0.0
+
+
+def agora_da_rodada(rodada: int) -> float:
+    # um segundo depois do prazo criado pela rodada anterior
+    return INICIO_PREMIOS + rodada * (PREMIO_SEGUNDOS + 1)
+
+
+# ---------------------------------------------------------
+# Processos de carga
+# ---------------------------------------------------------
+def trabalhador_premios(n: int, args, data_dir: str, largada, saida):
+    from scheduler import JoinAwardScheduler
+
+    async def rodar():
+        store = abrir(Path(data_dir), args.compactar_a_cada, args.fsync)
+        agenda = JoinAwardScheduler(store, lambda gid, uid: True,
+                                    award_seconds=PREMIO_SEGUNDOS, amount=PREMIO)
+        agenda.load(store.table("join_times"))
+        pagos = []
+        inicio = time.perf_counter()
+        for rodada in range(args.rodadas):
+            largada.wait()  # todos pagam a mesma rodada juntos
+            records = agenda.tick(now=agora_da_rodada(rodada))
+            pagos.append(sum(1 for op, nome, _, _ in records if op == "incr"))
+        total = time.perf_counter() - inicio
+        await store.aflush()
+        return store, pagos, total
+
+    store, pagos, total = asyncio.run(rodar())
+    largada.wait()
+    store._acompanhar()
+    saida.put({"processo": n, "pagos": pagos, "total_s": total, "resumo": resumo(store), "seq": store.seq})
+
+
+def trabalhador(n: int, args, data_dir: str, largada, saida):
+    import metrics
+
+    store = abrir(Path(data_dir), args.compactar_a_cada, args.fsync)
+    if args.sem_cas:
+        store.versionado = False
+    rng = random.Random(args.seed * 1000 + n)
+    usuarios = [str(u) for u in range(1, args.usuarios + 1)]
+    tentativas = [0]
+    latencias = []
+    recusadas = [0]
+    negativos = [0]
+
+    def transferir(de: str, para: str, fracao: float):
+        # o valor depende do saldo lido: uma leitura velha vira saldo negativo
+        def fn(tx):
+            tentativas[0] += 1
+            saldo = int(tx.get("balances", de, 0))
+            if saldo < 1:
+                return False
+            valor = max(1, int(saldo * fracao))
+            tx.incr("balances", de, -valor)
+            tx.incr("balances", para, valor)
+            return True
+        return fn
+
+    async def cliente(ops: int):
+        for _ in range(ops):
+            de, para = rng.sample(usuarios, 2)
+            fracao = rng.uniform(0.5, 1.0)
+            t0 = time.perf_counter()
+            if not await store.atomic(transferir(de, para, fracao), de, para, tentativas=1000):
+                recusadas[0] += 1
+            # logo depois do commit: mais tarde outra transferência pode cobrir o buraco
+            elif int(store.get("balances", de, 0)) < 0:
+                negativos[0] += 1
+            latencias.append(time.perf_counter() - t0)
+
+    async def rodar():
+        largada.wait()
+        inicio = time.perf_counter()
+        por_cliente = args.ops // args.concorrencia
+        await asyncio.gather(*(cliente(por_cliente) for _ in range(args.concorrencia)))
+        total = time.perf_counter() - inicio
+        # espera os outros terminarem e lê o que falta do diário
+        await store.aflush()
+        return total
+
+    total = asyncio.run(rodar())
+    largada.wait()
+    store._acompanhar()
+    saida.put({
+        "processo": n,
+        "ops": len(latencias),
+        "total_s": total,
+        "latencias": latencias,
+        "conflitos": tentativas[0] - len(latencias),
+        "recusadas": recusadas[0],
+        "negativos": negativos[0],
+        "trava_presa_media": media_hist(metrics.STORAGE_SEGUNDOS, backend="shared", op="lock_hold"),
+        "trava_presa_max": max_hist(metrics.STORAGE_SEGUNDOS, backend="shared", op="lock_hold"),
+        "espera_media": media_hist(metrics.STORAGE_SEGUNDOS, backend="shared", op="lock_wait"),
+        "espera_max": max_hist(metrics.STORAGE_SEGUNDOS, backend="shared", op="lock_wait"),
+        "resumo": resumo(store),
+        "seq": store.seq,
+    })
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cenario", default="transferencias", choices=["transferencias", "premios"])
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--rodadas", type=int, default=5, help="rodadas de recompensa (--cenario premios)")
+    parser.add_argument("--ops", type=int, default=2000, help="transferências por processo")
+    parser.add_argument("--concorrencia", type=int, default=8, help="transações em paralelo por processo")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--compactar-a-cada", type=int, default=1000)
+    parser.add_argument("--fsync", action="store_true", help="fsync a cada linha do diário")
+    parser.add_argument("--sem-cas", action="store_true", help="não confere as versões lidas")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="saida_json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    if args.usuarios < 2:
+        parser.error("--usuarios precisa ser pelo menos 2")
+    args.concorrencia = max(1, min(args.concorrencia, args.ops))
+
+    if args.cenario == "premios":
+        return main_premios(args)
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        base = abrir(data_dir, args.compactar_a_cada, args.fsync)
+        base.apply([("set", "balances", str(u), SALDO_INICIAL) for u in range(1, args.usuarios + 1)])
+        base.flush()
+
+        # a barreira solta todos juntos e, no fim, só deixa ler o estado
+        # final depois que todos terminaram de escrever
+        largada = ctx.Barrier(args.processos)
+        saida = ctx.Queue()
+        processos = [ctx.Process(target=trabalhador, args=(n, args, tmp, largada, saida))
+                     for n in range(args.processos)]
+        for p in processos:
+            p.start()
+        resultados = sorted((saida.get() for _ in processos), key=lambda r: r["processo"])
+        for p in processos:
+            p.join()
+
+        fresco = abrir(data_dir, args.compactar_a_cada, args.fsync)
+        saldos = {k: int(v) for k, v in fresco.table("balances").items()}
+        arquivos_finais = {p.name: p.stat().st_size for p in sorted(data_dir.iterdir()) if p.is_file()}
+        resumo_disco = resumo(fresco)
+
+    total_ops = sum(r["ops"] for r in resultados)
+    duracao = max(r["total_s"] for r in resultados)
+    latencias = sorted(l for r in resultados for l in r["latencias"])
+    conflitos = sum(r["conflitos"] for r in resultados)
+
+    print(f"{args.processos} processos x {args.ops} transferências, {args.concorrencia} em paralelo cada, "
+          f"{args.usuarios} usuários, fsync {'sim' if args.fsync else 'não'}"
+          f"{', SEM CAS' if args.sem_cas else ''}")
+    print(f"vazão: {total_ops / duracao:.0f} transações/s ({total_ops} em {duracao:.2f}s)")
+    print(f"latência da transação: p50 {statistics.median(latencias) * 1000:.2f} ms, "
+          f"p99 {percentil(latencias, 0.99) * 1000:.2f} ms, máx {latencias[-1] * 1000:.2f} ms")
+    print(f"conflitos (transações refeitas): {conflitos} ({conflitos / total_ops:.1%} das transações)")
+
+    print(f"\n{'processo':>8} {'ops/s':>8} {'conflitos':>10} {'recusadas':>10} {'presa ms':>9} "
+          f"{'presa máx':>10} {'espera ms':>10} {'espera máx':>11}")
+    for r in resultados:
+        print(f"{r['processo']:>8} {r['ops'] / r['total_s']:>8.0f} {r['conflitos']:>10} {r['recusadas']:>10} "
+              f"{r['trava_presa_media'] * 1000:>9.3f} {'≤' + format(r['trava_presa_max'] * 1000, 'g'):>10} "
+              f"{r['espera_media'] * 1000:>10.3f} {'≤' + format(r['espera_max'] * 1000, 'g'):>11}")
+
+    esperado = SALDO_INICIAL * args.usuarios
+    negativos = sorted(uid for uid, v in saldos.items() if v < 0)
+    negativos_vistos = sum(r["negativos"] for r in resultados)
+    resumos = {r["resumo"] for r in resultados} | {resumo_disco}
+    print(f"\nmoedas: {sum(saldos.values())} (esperado {esperado}); saldos negativos: {len(negativos)} "
+          f"no fim, {negativos_vistos} logo após uma transferência")
+    print(f"estado igual em todos os processos e no disco: {'sim' if len(resumos) == 1 else 'NÃO'} "
+          f"(seq final {max(r['seq'] for r in resultados)})")
+    print("arquivos:", ", ".join(f"{nome} {tamanho / 1024:.1f} KiB" for nome, tamanho in arquivos_finais.items()))
+    ok = sum(saldos.values()) == esperado and not negativos and not negativos_vistos and len(resumos) == 1
+
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump({
+                "args": vars(args),
+                "transacoes_s": total_ops / duracao,
+                "p50_ms": statistics.median(latencias) * 1000,
+                "p99_ms": percentil(latencias, 0.99) * 1000,
+                "conflitos": conflitos,
+                "processos": [{k: v for k, v in r.items() if k != "latencias"} for r in resultados],
+                "moedas": sum(saldos.values()),
+                "saldos_negativos": len(negativos),
+                "negativos_vistos": negativos_vistos,
+                "consistente": ok,
+            }, f, indent=2, ensure_ascii=False)
+    if not ok:
+        sys.exit(1)
+
+
+def main_premios(args):
+    ctx = multiprocessing.get_context("spawn")
+    usuarios = [str(u) for u in range(1, args.usuarios + 1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        base = abrir(data_dir, args.compactar_a_cada, args.fsync)
+        # todos vencem exatamente na primeira rodada
+        base.apply([("set", "balances", uid, 0) for uid in usuarios]
+                   + [("join", "join_times", ["1", uid], INICIO_PREMIOS - PREMIO_SEGUNDOS) for uid in usuarios])
+        base.flush()
+
+        largada = ctx.Barrier(args.processos)
+        saida = ctx.Queue()
+        processos = [ctx.Process(target=trabalhador_premios, args=(n, args, tmp, largada, saida))
+                     for n in range(args.processos)]
+        for p in processos:
+            p.start()
+        resultados = sorted((saida.get() for _ in processos), key=lambda r: r["processo"])
+        for p in processos:
+            p.join()
+
+        fresco = abrir(data_dir, args.compactar_a_cada, args.fsync)
+        saldos = {uid: int(fresco.table("balances").get(uid, 0)) for uid in usuarios}
+        resumo_disco = resumo(fresco)
+
+    esperado = args.rodadas * PREMIO
+    errados = sorted(uid for uid, v in saldos.items() if v != esperado)
+    pagos = [sum(r["pagos"][rodada] for r in resultados) for rodada in range(args.rodadas)]
+    resumos = {r["resumo"] for r in resultados} | {resumo_disco}
+
+    print(f"{args.processos} processos pagando {args.usuarios} membros por {args.rodadas} rodadas")
+    print(f"\n{'processo':>8}  pagos por rodada")
+    for r in resultados:
+        print(f"{r['processo']:>8}  {' '.join(f'{p:>6}' for p in r['pagos'])}")
+    print(f"{'total':>8}  {' '.join(f'{p:>6}' for p in pagos)}  (esperado {args.usuarios} por rodada)")
+    print(f"\nsaldos diferentes de {esperado}: {len(errados)}"
+          + (f" (ex.: {errados[0]} com {saldos[errados[0]]})" if errados else ""))
+    print(f"estado igual em todos os processos e no disco: {'sim' if len(resumos) == 1 else 'NÃO'}")
+    ok = not errados and all(p == args.usuarios for p in pagos) and len(resumos) == 1
+
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "pagos_por_rodada": pagos, "saldos_errados": len(errados),
+                       "processos": resultados, "consistente": ok}, f, indent=2, ensure_ascii=False)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_bench()
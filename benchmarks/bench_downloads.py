@@ -0,0 +1,229 @@
+# Compara o servidor de downloads antigo (HTTPServer + SimpleHTTPRequestHandler,
+# uma requisição por vez) com o download_server.py atual, servindo a mesma
+# pasta temporária com uma cópia de imagens/ e exportações .json sintéticas:
+#
+#     python benchmarks/bench_downloads.py
+#     python benchmarks/bench_downloads.py --clientes 32 --duracao 5 --json saida.json
+#
+# Cenários (cada servidor roda num processo separado dos clientes):
+#   imagens     N clientes baixando imagens ao acaso
+#   json        N clientes baixando as exportações com Accept-Encoding: gzip
+#   lento       os mesmos downloads de imagens com uma conexão parada no meio
+#               da requisição (cliente lento); conta o que passa de 2s
+#   revalidar   GET repetido com If-None-Match/If-Modified-Since
+#   retomar     download continuado do meio com Range
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+CENARIOS = ["imagens", "json", "lento", "revalidar", "retomar"]
+TIMEOUT = 2.0
+
+
+def preparar(pasta: Path, rng: random.Random):
+    shutil.copytree(RAIZ / "imagens", pasta / "imagens")
+    exports = pasta / "exports"
+    exports.mkdir()
+    ranking = [{"posicao": i + 1, "user_id": str(rng.getrandbits(60)), "nome": f"jogador{i}",
+                "vitorias": rng.randint(0, 5000), "moedas": rng.randint(0, 10 ** 6)} for i in range(20000)]
+    (exports / "ranking.json").write_text(json.dumps(ranking, ensure_ascii=False), encoding="utf-8")
+    colecoes = {str(u): {str(c): rng.randint(1, 5) for c in rng.sample(range(1, 60), 20)} for u in range(3000)}
+    (exports / "colecoes.json").write_text(json.dumps(colecoes), encoding="utf-8")
+    imagens = sorted("/imagens/" + p.name for p in (pasta / "imagens").iterdir())
+    jsons = sorted("/exports/" + p.name for p in exports.iterdir())
+    return imagens, jsons
+
+
+# ---------------------------------------------------------
+# Servidores (processos separados)
+# ---------------------------------------------------------
+def servir(qual: str, pasta: str, portas):
+    if qual == "antigo":
+        from functools import partial
+        from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+        class Quieto(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        class Servidor(HTTPServer):
+            def handle_error(self, *args):
+                pass  # cliente que desistiu por timeout
+
+        servidor = Servidor(("127.0.0.1", 0), partial(Quieto, directory=pasta))
+    else:
+        import download_server
+        servidor = download_server.criar_servidor("127.0.0.1", 0, raiz=pasta, registrar=False)
+    portas.put(servidor.server_address[1])
+    servidor.serve_forever()
+
+
+def iniciar(ctx, qual: str, pasta: Path):
+    portas = ctx.Queue()
+    processo = ctx.Process(target=servir, args=(qual, str(pasta), portas), daemon=True)
+    processo.start()
+    return processo, portas.get(timeout=30)
+
+
+# ---------------------------------------------------------
+# Clientes
+# ---------------------------------------------------------
+class Medidas:
+    def __init__(self):
+        self.latencias = []
+        self.bytes = 0
+        self.erros = 0
+        self.status = {}
+        self._lock = threading.Lock()
+
+    def somar(self, latencias, nbytes, erros, status):
+        with self._lock:
+            self.latencias.extend(latencias)
+            self.bytes += nbytes
+            self.erros += erros
+            for codigo, qtd in status.items():
+                self.status[codigo] = self.status.get(codigo, 0) + qtd
+
+
+def cliente(porta: int, caminhos, cabecalhos, ate: float, medidas: Medidas, rng: random.Random):
+    # http.client reabre a conexão sozinho quando o servidor a fecha (HTTP/1.0)
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=TIMEOUT)
+    latencias, nbytes, erros, status = [], 0, 0, {}
+    while time.perf_counter() < ate:
+        caminho = rng.choice(caminhos)
+        extra = cabecalhos(caminho) if callable(cabecalhos) else cabecalhos
+        t0 = time.perf_counter()
+        try:
+            conexao.request("GET", caminho, headers=extra)
+            resposta = conexao.getresponse()
+            nbytes += len(resposta.read())
+        except (OSError, http.client.HTTPException):
+            erros += 1
+            conexao.close()
+            continue
+        latencias.append(time.perf_counter() - t0)
+        status[resposta.status] = status.get(resposta.status, 0) + 1
+    conexao.close()
+    medidas.somar(latencias, nbytes, erros, status)
+
+
+def carga(porta: int, caminhos, cabecalhos, clientes: int, duracao: float, seed: int) -> dict:
+    medidas = Medidas()
+    ate = time.perf_counter() + duracao
+    threads = [threading.Thread(target=cliente, args=(porta, caminhos, cabecalhos, ate, medidas,
+                                                       random.Random(seed + i)))
+               for i in range(clientes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+    lat = sorted(medidas.latencias) or [float("nan")]
+    return {
+        "req_s": len(medidas.latencias) / total,
+        "mb_s": medidas.bytes / total / 2 ** 20,
+        "p50_ms": statistics.median(lat) * 1000,
+        "p99_ms": lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000,
+        "erros": medidas.erros,
+        "bytes_req": medidas.bytes / max(1, len(medidas.latencias)),
+        "status": medidas.status,
+    }
+
+
+def cenario(nome: str, porta: int, imagens, jsons, args) -> dict:
+    if nome == "imagens":
+        return carga(porta, imagens, {}, args.clientes, args.duracao, args.seed)
+    if nome == "json":
+        return carga(porta, jsons, {"Accept-Encoding": "gzip"}, args.clientes, args.duracao, args.seed)
+    if nome == "lento":
+        # manda metade da linha de requisição e para
+        parado = socket.create_connection(("127.0.0.1", porta))
+        parado.sendall(b"GET /imagens/")
+        try:
+            return carga(porta, imagens, {}, args.clientes, args.duracao, args.seed)
+        finally:
+            parado.close()
+    if nome == "revalidar":
+        # o que o navegador guardou do primeiro download
+        guardado = {}
+        for caminho in imagens:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=TIMEOUT)
+            conexao.request("GET", caminho)
+            resposta = conexao.getresponse()
+            resposta.read()
+            guardado[caminho] = {k: v for k, v in (("If-None-Match", resposta.getheader("ETag")),
+                                                   ("If-Modified-Since", resposta.getheader("Last-Modified")))
+                                 if v}
+            conexao.close()
+        return carga(porta, imagens, guardado.get, args.clientes, args.duracao, args.seed)
+    if nome == "retomar":
+        # download interrompido na metade: pede só o resto de cada imagem
+        tamanhos = {c: (RAIZ / c.lstrip("/")).stat().st_size for c in imagens}
+        return carga(porta, imagens, lambda c: {"Range": f"bytes={tamanhos[c] // 2}-"},
+                     args.clientes, args.duracao, args.seed)
+    raise ValueError(nome)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, default=16, help="downloads simultâneos")
+    parser.add_argument("--duracao", type=float, default=3.0, help="segundos por cenário")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="saida_json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    for c in cenarios:
+        if c not in CENARIOS:
+            parser.error(f"cenário desconhecido: {c} (use {', '.join(CENARIOS)})")
+
+    ctx = multiprocessing.get_context("spawn")
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = Path(tmp)
+        imagens, jsons = preparar(pasta, random.Random(args.seed))
+        tamanho = sum((pasta / c.lstrip("/")).stat().st_size for c in imagens + jsons)
+        print(f"{len(imagens)} imagens e {len(jsons)} .json ({tamanho / 2 ** 20:.1f} MiB), "
+              f"{args.clientes} clientes, {args.duracao:g}s por cenário")
+        for cen in cenarios:
+            for qual in ("antigo", "novo"):
+                # servidor novo a cada cenário: o antigo pode ficar preso no "lento"
+                processo, porta = iniciar(ctx, qual, pasta)
+                try:
+                    resultados.setdefault(cen, {})[qual] = cenario(cen, porta, imagens, jsons, args)
+                finally:
+                    processo.terminate()
+                    processo.join()
+
+    print(f"\n{'cenário':<10} {'servidor':<8} {'req/s':>8} {'MiB/s':>8} {'p50 ms':>8} {'p99 ms':>9} "
+          f"{'erros':>6} {'KiB/req':>8}  status")
+    for cen, porqual in resultados.items():
+        for qual, r in porqual.items():
+            status = " ".join(f"{k}x{v}" for k, v in sorted(r["status"].items()))
+            print(f"{cen:<10} {qual:<8} {r['req_s']:>8.0f} {r['mb_s']:>8.1f} {r['p50_ms']:>8.2f} "
+                  f"{r['p99_ms']:>9.2f} {r['erros']:>6} {r['bytes_req'] / 1024:>8.1f}  {status}")
+        antigo, novo = porqual.get("antigo"), porqual.get("novo")
+        if antigo and novo and antigo["req_s"]:
+            print(f"{'':<10} {'':<8} {novo['req_s'] / antigo['req_s']:>7.1f}x")
+
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_bench()
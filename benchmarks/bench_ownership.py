@@ -0,0 +1,100 @@
+# Latência de abrir pack (checagem de duplicata + commit) conforme o
+# inventário cresce. Roda offline, em um diretório temporário:
+#
+#     python benchmarks/bench_ownership.py [--packs 2000]
+#
+# A coluna "legado" mede a varredura linear antiga (card_already_exists
+# sobre a lista de dicts) para comparação.
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import open_store  # noqa: E402
+
+TAMANHOS = [10, 100, 1000, 2000]
+FILES = ["balances", "last_claims", "cards", "join_times", "wins", "spent"]
+
+
+def abrir_store(backend: str, data_dir: Path):
+    files = {nome: data_dir / f"{nome}.json" for nome in FILES}
+    return open_store(backend, files, data_dir, flush_interval=3600)
+
+
+async def abrir_pack(store, user_id: str, card_id: int):
+    async with store.transaction(user_id) as tx:
+        tx.incr("balances", user_id, -50)
+        tx.incr("spent", user_id, 50)
+        if tx.owns(user_id, card_id):
+            tx.incr("balances", user_id, 32)
+        else:
+            tx.add_card(user_id, card_id)
+
+
+def legado(tamanho: int, packs: int):
+    lista = [
+        {"nome": f"carta {i}", "ataque": i, "vida": i, "raridade": "Comum", "imagem": "x" * 100}
+        for i in range(tamanho)
+    ]
+    amostras = []
+    for _ in range(packs):
+        alvo = random.choice(lista)
+        t0 = time.perf_counter()
+        any(
+            c["nome"] == alvo["nome"] and c["ataque"] == alvo["ataque"]
+            and c["vida"] == alvo["vida"] and c["raridade"] == alvo["raridade"]
+            for c in lista
+        )
+        amostras.append(time.perf_counter() - t0)
+    return amostras
+
+
+async def medir(backend: str, tamanho: int, packs: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = abrir_store(backend, Path(tmp))
+        user_id = "1"
+        store.apply([("set", "balances", user_id, 10 ** 9)])
+        store.apply([("card+", "cards", user_id, cid) for cid in range(1, tamanho + 1)])
+
+        amostras = []
+        for _ in range(packs):
+            card_id = random.randint(1, tamanho * 2)
+            t0 = time.perf_counter()
+            await abrir_pack(store, user_id, card_id)
+            amostras.append(time.perf_counter() - t0)
+        store.flush()
+        return amostras
+
+
+def resumo(amostras):
+    amostras = sorted(amostras)
+    p50 = statistics.median(amostras) * 1e6
+    p95 = amostras[int(len(amostras) * 0.95)] * 1e6
+    return f"{p50:8.1f} {p95:8.1f}"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packs", type=int, default=2000)
+    parser.add_argument("--backends", default="json,journal,sqlite")
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    print("p50/p95 em µs por pack")
+    print(f"{'cartas':>7} | " + " | ".join(f"{b:^17}" for b in backends + ["legado"]))
+    for tamanho in TAMANHOS:
+        colunas = []
+        for backend in backends:
+            colunas.append(resumo(await medir(backend, tamanho, args.packs)))
+        colunas.append(resumo(legado(tamanho, args.packs)))
+        print(f"{tamanho:>7} | " + " | ".join(colunas))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,508 @@
+# Reproduz um fluxo de comandos (gravado ou sintético) pelo caminho real
+# do bot: mensagem -> bot.process_commands -> conversores -> comando.
+# Nada sai para a rede: ctx.send/reply e os edit/delete/reações das
+# mensagens enviadas são só contados, e qualquer request HTTP que escape
+# é registrado e recusado.
+#
+#     # noite de evento: 300 jogadores, 200 comandos/s por 30 s
+#     python benchmarks/replay.py --usuarios 300 --taxa 200 --duracao 30
+#
+#     # o mesmo fluxo, gravado e reproduzido com no máximo 50 em paralelo
+#     python benchmarks/replay.py --usuarios 300 --taxa 200 --gravar noite.jsonl
+#     python benchmarks/replay.py --trace noite.jsonl --concorrencia 50
+#
+#     # vazão máxima: tudo chega de uma vez (--taxa 0 ignora os horários)
+#     python benchmarks/replay.py --trace noite.jsonl --taxa 0
+#
+# O trace é JSONL, uma linha por mensagem:
+#
+#     {"ts": 0.125, "user": 100000000000000001, "command": "duelar",
+#      "args": ["<@100000000000000002>", "10"], "guild": 1}
+#
+# "ts" em segundos (o primeiro vira zero; epoch também serve), "guild" é
+# opcional. Relata comandos/s sustentados, atraso de fila (chegada até o
+# comando começar), latência do comando, atraso do event loop e as
+# chamadas de saída capturadas, no geral e por comando.
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_commands import percentil, rss_mb  # noqa: E402
+
+# ids com cara de snowflake: os conversores só aceitam menções de 15+ dígitos
+BASE_ID = 10 ** 17
+BOT_ID = BASE_ID - 1
+
+MIX_PADRAO = "abrirpack=45,duelar=25,aceitar=15,kitdiario=5,ranking=4,minhacolecao=3,saldo=3"
+
+
+# ---------------------------------------------------------
+# Saída capturada
+# ---------------------------------------------------------
+class Captura:
+    # chamadas de saída por (comando, tipo)
+    def __init__(self):
+        self.chamadas = Counter()
+
+    def registrar(self, tipo: str):
+        import metrics
+        self.chamadas[(metrics.comando_atual.get() or "-", tipo)] += 1
+
+    def por_tipo(self, comando: str = None):
+        total = Counter()
+        for (nome, tipo), qtd in self.chamadas.items():
+            if comando is None or nome == comando:
+                total[tipo] += qtd
+        return total
+
+
+captura = Captura()
+
+
+class ReplayMessage:
+    # mensagem enviada pelo bot; guarda só o último conteúdo
+    _ids = 0
+
+    def __init__(self, channel, content=None, embed=None, view=None):
+        ReplayMessage._ids += 1
+        self.id = ReplayMessage._ids
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.attachments = []
+
+    async def edit(self, **kwargs):
+        captura.registrar("edit")
+        self.content = kwargs.get("content", self.content)
+        self.embed = kwargs.get("embed", self.embed)
+
+    async def delete(self, *, delay=None):
+        captura.registrar("delete")
+
+    async def add_reaction(self, emoji):
+        captura.registrar("reaction")
+
+    async def clear_reactions(self):
+        captura.registrar("reaction")
+
+
+class ReplayMember(discord.Member):
+    # O MemberConverter exige um discord.Member de verdade; os atributos
+    # que o bot lê são sobrescritos aqui para dispensar o estado da conexão.
+    id = 0
+    bot = False
+    avatar = None
+    guild = None
+    roles = ()
+
+    def __init__(self, user_id: int, guild):
+        self.id = user_id
+        self.guild = guild
+        self.roles = []
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<ReplayMember id={self.id}>"
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    @property
+    def display_name(self):
+        return f"jogador{self.id - BASE_ID}"
+
+    name = display_name
+
+    async def add_roles(self, *roles, reason=None, atomic=True):
+        captura.registrar("roles")
+
+    async def remove_roles(self, *roles, reason=None, atomic=True):
+        captura.registrar("roles")
+
+
+class ReplayChannel:
+    def __init__(self, channel_id: int, guild):
+        self.id = channel_id
+        self.guild = guild
+
+
+class ReplayGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"servidor{guild_id}"
+        self.chunked = True
+        self.roles = []
+        self.channel = ReplayChannel(guild_id * 10, self)
+        self._members = {}
+
+    def get_member(self, user_id: int):
+        member = self._members.get(user_id)
+        if member is None:
+            member = self._members[user_id] = ReplayMember(user_id, self)
+        return member
+
+    def get_member_named(self, nome: str):
+        return None
+
+    def get_role(self, role_id):
+        return None
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+
+class ReplayIncoming:
+    # o que chega do gateway: só o que get_context e os comandos leem
+    _ids = 0
+    _state = None
+
+    def __init__(self, author: ReplayMember, content: str):
+        ReplayIncoming._ids += 1
+        self.id = ReplayIncoming._ids
+        self.author = author
+        self.guild = author.guild
+        self.channel = author.guild.channel
+        self.content = content
+        self.mentions = []
+        self.attachments = []
+
+
+class ReplayContext(commands.Context):
+    async def send(self, content=None, **kwargs):
+        captura.registrar("send")
+        return ReplayMessage(self.channel, content, kwargs.get("embed"), kwargs.get("view"))
+
+    async def reply(self, content=None, **kwargs):
+        captura.registrar("send")
+        return ReplayMessage(self.channel, content, kwargs.get("embed"), kwargs.get("view"))
+
+
+# ---------------------------------------------------------
+# Traces
+# ---------------------------------------------------------
+def ler_trace(caminho: str):
+    eventos = []
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            ev = json.loads(linha)
+            args = ev.get("args") or []
+            if isinstance(args, str):
+                args = args.split()
+            eventos.append({
+                "ts": float(ev.get("ts", 0.0)),
+                "user": int(ev["user"]),
+                "guild": int(ev.get("guild", 1)),
+                "command": str(ev["command"]),
+                "args": [str(a) for a in args],
+            })
+    eventos.sort(key=lambda e: e["ts"])
+    if eventos:
+        inicio = eventos[0]["ts"]
+        for ev in eventos:
+            ev["ts"] -= inicio
+    return eventos
+
+
+def gravar_trace(caminho: str, eventos):
+    with open(caminho, "w", encoding="utf-8") as f:
+        for ev in eventos:
+            f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+
+
+def ler_mix(texto: str):
+    mix = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        if nome.strip():
+            mix[nome.strip()] = float(peso or 1)
+    return mix
+
+
+def gerar_trace(usuarios: int, taxa: float, duracao: float, mix: dict, guilds: int,
+                rng: random.Random):
+    # Chegadas de Poisson na taxa pedida. Cada aceitar responde a um
+    # duelar anterior do mesmo servidor (sem desafio aberto vira abrirpack).
+    nomes = list(mix)
+    pesos = [mix[n] for n in nomes]
+    total = max(1, int(taxa * duracao)) if taxa > 0 else usuarios * 10
+    ids = [BASE_ID + i for i in range(1, usuarios + 1)]
+    abertos = []
+    eventos = []
+    ts = 0.0
+    for _ in range(total):
+        if taxa > 0:
+            ts += rng.expovariate(taxa)
+        comando = rng.choices(nomes, pesos)[0]
+        user = rng.choice(ids)
+        guild = 1 + (user % guilds)
+        args = []
+        if comando in ("duelar", "chances"):
+            outros = [u for u in rng.sample(ids, min(3, len(ids))) if u != user and 1 + (u % guilds) == guild]
+            if not outros:
+                comando = "abrirpack"
+            else:
+                args = [f"<@{outros[0]}>"]
+                if comando == "duelar":
+                    args.append(str(rng.randint(1, 100)))
+                    abertos.append((user, outros[0]))
+        elif comando == "aceitar":
+            if abertos:
+                desafiante, user = abertos.pop(rng.randrange(len(abertos)))
+                guild = 1 + (user % guilds)
+                args = [f"<@{desafiante}>"]
+            else:
+                comando = "abrirpack"
+        eventos.append({"ts": round(ts, 6), "user": user, "guild": guild, "command": comando, "args": args})
+    return eventos
+
+
+def semear(main, eventos, cartas_iniciais: int, rng: random.Random):
+    # saldo alto e um inventário inicial para quem aparece no trace, na
+    # economia do servidor em que aparece (no modo global é uma só)
+    ids_cartas = list(main.catalogo.by_id)
+    por_particao = {}
+    for ev in eventos:
+        particao = main.economias.particao(ev["guild"])
+        por_particao.setdefault(id(particao), (particao, set()))[1].add(ev["user"])
+    for particao, usuarios in por_particao.values():
+        records = []
+        for uid in sorted(usuarios):
+            records.append(("set", "balances", str(uid), 10 ** 9))
+            inv = {}
+            for card_id in rng.choices(ids_cartas, k=cartas_iniciais):
+                inv[str(card_id)] = inv.get(str(card_id), 0) + 1
+            records.append(("set", "cards", str(uid), inv))
+        particao.store.apply(records)
+        particao.store.flush()
+
+
+# ---------------------------------------------------------
+# Execução
+# ---------------------------------------------------------
+async def medir_lag(amostras, intervalo: float = 0.01):
+    while True:
+        inicio = time.perf_counter()
+        try:
+            await asyncio.sleep(intervalo)
+        finally:
+            # cancelada no fim: um bloqueio que durou até ali também conta
+            amostras.append(max(0.0, time.perf_counter() - inicio - intervalo))
+
+
+async def preparar_bot(bot):
+    # o bastante do login para o bot rodar comandos: loop, usuário e HTTP
+    # desviado (o setup_hook instrumenta por cima, então /metrics conta)
+    await bot._async_setup_hook()
+    bot._connection.user = types.SimpleNamespace(id=BOT_ID, bot=True, name="replay")
+
+    async def request(route, *args, **kwargs):
+        captura.registrar(f"http {route.method} {route.path}")
+        raise RuntimeError("replay: request HTTP bloqueado")
+
+    bot.http.request = request
+    await bot.setup_hook()
+
+    erros = Counter()
+
+    async def on_command_error(ctx, error):
+        nome = ctx.command.qualified_name if ctx.command else "-"
+        erros[(nome, type(getattr(error, "original", error)).__name__)] += 1
+
+    bot.on_command_error = on_command_error
+    return erros
+
+
+async def reproduzir(bot, eventos, taxa_original: bool, velocidade: float, concorrencia: int):
+    guilds = {}
+    limite = asyncio.Semaphore(concorrencia) if concorrencia > 0 else None
+    resultados = []  # (comando, fila, latência)
+    lag = []
+    sonda = asyncio.create_task(medir_lag(lag))
+    pendentes = set()
+
+    async def executar(ev, chegada):
+        if limite is not None:
+            await limite.acquire()
+        try:
+            inicio = time.perf_counter()
+            guild = guilds.get(ev["guild"])
+            if guild is None:
+                guild = guilds[ev["guild"]] = ReplayGuild(ev["guild"])
+            conteudo = " ".join([bot.command_prefix + ev["command"], *ev["args"]])
+            msg = ReplayIncoming(guild.get_member(ev["user"]), conteudo)
+            ctx = await bot.get_context(msg, cls=ReplayContext)
+            await bot.invoke(ctx)
+            fim = time.perf_counter()
+            resultados.append((ev["command"], inicio - chegada, fim - inicio))
+        finally:
+            if limite is not None:
+                limite.release()
+
+    t0 = time.perf_counter()
+    for ev in eventos:
+        chegada = t0
+        if taxa_original:
+            chegada = t0 + ev["ts"] / velocidade
+            espera = chegada - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+        task = asyncio.create_task(executar(ev, chegada))
+        pendentes.add(task)
+        task.add_done_callback(pendentes.discard)
+    if pendentes:
+        await asyncio.gather(*pendentes, return_exceptions=True)
+    total = time.perf_counter() - t0
+    sonda.cancel()
+    await asyncio.gather(sonda, return_exceptions=True)
+    return resultados, total, lag
+
+
+def resumo_ms(valores):
+    if not valores:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordenadas = sorted(valores)
+    return {
+        "p50": statistics.median(ordenadas) * 1000,
+        "p95": percentil(ordenadas, 0.95) * 1000,
+        "p99": percentil(ordenadas, 0.99) * 1000,
+        "max": ordenadas[-1] * 1000,
+    }
+
+
+def main_replay():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trace", help="arquivo JSONL para reproduzir (sem ele, gera um sintético)")
+    parser.add_argument("--gravar", help="grava o trace usado neste arquivo")
+    parser.add_argument("--usuarios", type=int, default=300)
+    parser.add_argument("--guilds", type=int, default=1)
+    parser.add_argument("--taxa", type=float, default=200.0,
+                        help="comandos/s do trace sintético; 0 dispara tudo de uma vez")
+    parser.add_argument("--duracao", type=float, default=30.0, help="segundos de trace sintético")
+    parser.add_argument("--mix", default=MIX_PADRAO, help="comando=peso,... do trace sintético")
+    parser.add_argument("--velocidade", type=float, default=1.0,
+                        help="multiplica o ritmo do trace (2 = duas vezes mais rápido)")
+    parser.add_argument("--concorrencia", type=int, default=0,
+                        help="máximo de comandos em paralelo (0 = sem limite, como o gateway)")
+    parser.add_argument("--cartas-iniciais", type=int, default=50)
+    parser.add_argument("--backend", default="json", choices=["json", "journal", "shared", "sqlite"])
+    parser.add_argument("--economia", default="global", choices=["global", "guild"],
+                        help="ECONOMY_MODE do bot (guild: uma economia por servidor)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="saida_json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    if args.velocidade <= 0:
+        parser.error("--velocidade precisa ser positiva")
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    if args.trace:
+        eventos = ler_trace(args.trace)
+    else:
+        eventos = gerar_trace(args.usuarios, args.taxa, args.duracao, ler_mix(args.mix),
+                              max(1, args.guilds), rng)
+    if args.gravar:
+        gravar_trace(args.gravar, eventos)
+    if not eventos:
+        parser.error("trace vazio")
+    # --taxa 0 num trace gravado também ignora os horários
+    taxa_original = args.taxa > 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "DATA_DIR": tmp,
+            "STORAGE_BACKEND": args.backend,
+            "ECONOMY_MODE": args.economia,
+            "FLUSH_INTERVAL": "5",
+            "METRICS_PORT": "0",
+        })
+        os.environ.pop("ASSET_CHANNEL_ID", None)
+        import main  # noqa: E402  (lê o ambiente acima)
+
+        semear(main, eventos, args.cartas_iniciais, rng)
+        desconhecidos = {ev["command"] for ev in eventos} - set(main.bot.all_commands)
+        if desconhecidos:
+            print(f"aviso: comandos fora do bot no trace: {', '.join(sorted(desconhecidos))}")
+
+        async def rodar():
+            erros = await preparar_bot(main.bot)
+            resultado = await reproduzir(main.bot, eventos, taxa_original, args.velocidade,
+                                         args.concorrencia)
+            for particao in main.economias.abertas():
+                await particao.store.aflush()
+            return (*resultado, erros)
+
+        resultados, total, lag, erros = asyncio.run(rodar())
+
+    duracao_trace = eventos[-1]["ts"] / args.velocidade if taxa_original else 0.0
+    print(f"trace: {len(eventos)} mensagens, {len({e['user'] for e in eventos})} usuários, "
+          f"{duracao_trace:.1f}s de trace, backend {args.backend}, "
+          f"economia {args.economia}, concorrência {args.concorrencia or 'livre'}")
+    print(f"executados: {len(resultados)} em {total:.2f}s -> {len(resultados) / total:.1f} comandos/s sustentados")
+
+    saida = {"args": vars(args), "total_s": total, "comandos": {}}
+    grupos = {}
+    for comando, fila, latencia in resultados:
+        grupos.setdefault(comando, ([], []))
+        grupos[comando][0].append(fila)
+        grupos[comando][1].append(latencia)
+    grupos["(todos)"] = ([r[1] for r in resultados], [r[2] for r in resultados])
+
+    print(f"\n{'comando':<13} {'qtd':>6} {'fila p50':>9} {'fila p99':>9} {'cmd p50':>8} "
+          f"{'cmd p95':>8} {'cmd p99':>8} {'máx ms':>8} {'erros':>6} {'saídas':>7}")
+    for comando in sorted(grupos, key=lambda c: (c == "(todos)", c)):
+        filas, latencias = grupos[comando]
+        f, l = resumo_ms(filas), resumo_ms(latencias)
+        nome_erros = None if comando == "(todos)" else comando
+        qtd_erros = sum(q for (c, _), q in erros.items() if nome_erros in (None, c))
+        saidas = captura.por_tipo(nome_erros)
+        print(f"{comando:<13} {len(latencias):>6} {f['p50']:>9.2f} {f['p99']:>9.2f} {l['p50']:>8.2f} "
+              f"{l['p95']:>8.2f} {l['p99']:>8.2f} {l['max']:>8.2f} {qtd_erros:>6} {sum(saidas.values()):>7}")
+        saida["comandos"][comando] = {
+            "qtd": len(latencias), "fila_ms": f, "comando_ms": l,
+            "erros": qtd_erros, "saidas": dict(saidas),
+        }
+
+    lag_ms = resumo_ms(lag)
+    print(f"\nevent loop (sonda a cada 10 ms): atraso p50 {lag_ms['p50']:.2f} ms, "
+          f"p99 {lag_ms['p99']:.2f} ms, máx {lag_ms['max']:.2f} ms")
+    tipos = captura.por_tipo()
+    print("saídas capturadas: " + (", ".join(f"{t}={q}" for t, q in sorted(tipos.items())) or "nenhuma"))
+    if erros:
+        print("erros: " + ", ".join(f"{c}/{e}={q}" for (c, e), q in sorted(erros.items())))
+    print(f"memória (RSS): {rss_mb():.0f} MiB")
+
+    saida.update({
+        "comandos_s": len(resultados) / total if total else 0.0,
+        "loop_lag_ms": lag_ms,
+        "saidas": dict(tipos),
+        "erros": {f"{c}/{e}": q for (c, e), q in erros.items()},
+    })
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump(saida, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main_replay()
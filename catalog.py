@@ -0,0 +1,91 @@
+import itertools
+import random
+import unicodedata
+from typing import List, Optional
+
+
+def normalizar_nome(nome: str) -> str:
+    # "Noia do K9 " == "NOIA DO K9"; acentos são mantidos
+    return " ".join(unicodedata.normalize("NFC", str(nome)).split()).casefold()
+
+
+class CardCatalog:
+    # Índice do dicionário "cartas" por id estável. Inventários guardam só
+    # {card_id: quantidade}; nome, imagem, ataque, vida e raridade sempre vêm
+    # daqui, então mudar o catálogo atualiza as cartas de todo mundo.
+
+    def __init__(self, cartas: dict):
+        self.by_id = {}
+        self.by_key = {}
+        self.by_name = {}
+        self.ids_by_rarity = {}
+        for raridade, lista in cartas.items():
+            self.ids_by_rarity[raridade] = []
+            for carta in lista:
+                card_id = int(carta["id"])
+                if card_id in self.by_id:
+                    raise ValueError(
+                        f"id de carta repetido: {card_id} "
+                        f"({self.by_id[card_id]['nome']} / {carta['nome']})"
+                    )
+                entry = dict(carta)
+                entry["raridade"] = raridade
+                self.by_id[card_id] = entry
+                self.by_key[(normalizar_nome(carta["nome"]), raridade)] = card_id
+                self.by_name.setdefault(normalizar_nome(carta["nome"]), []).append(card_id)
+                self.ids_by_rarity[raridade].append(card_id)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, card_id) -> bool:
+        return int(card_id) in self.by_id
+
+    def get(self, card_id) -> Optional[dict]:
+        return self.by_id.get(int(card_id))
+
+    def resolve(self, nome: str, raridade: str = None) -> Optional[int]:
+        nome = normalizar_nome(nome)
+        if raridade is not None and (nome, raridade) in self.by_key:
+            return self.by_key[(nome, raridade)]
+        ids = self.by_name.get(nome, [])
+        if len(ids) == 1:
+            return ids[0]
+        return None
+
+    def resolve_entry(self, entry: dict) -> Optional[int]:
+        # Converte uma carta no formato antigo (dict completo) para o id.
+        if "id" in entry and int(entry["id"]) in self.by_id:
+            return int(entry["id"])
+        return self.resolve(entry.get("nome", ""), entry.get("raridade"))
+
+
+class CardSampler:
+    # Sorteio de pack pré-computado: o peso de cada carta é o peso da
+    # raridade dividido pelo número de cartas dela, então sortear uma carta
+    # direto equivale a sortear raridade e depois carta. Os pesos
+    # acumulados são montados uma vez; cada sorteio é um bisect.
+
+    def __init__(self, catalog: CardCatalog, pesos: dict):
+        self.catalog = catalog
+        self.ids = []
+        pesos_cartas = []
+        for raridade, peso in pesos.items():
+            ids = catalog.ids_by_rarity.get(raridade, [])
+            for card_id in ids:
+                self.ids.append(card_id)
+                pesos_cartas.append(peso / len(ids))
+        self.cum_weights = list(itertools.accumulate(pesos_cartas))
+
+    def sortear(self, k: int = 1, rng=random) -> List[int]:
+        return rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+    def probabilidades(self) -> List[float]:
+        total = self.cum_weights[-1]
+        anteriores = [0.0] + self.cum_weights[:-1]
+        return [(c - a) / total for c, a in zip(self.cum_weights, anteriores)]
+
+    def probabilidade(self, card_id: int) -> float:
+        i = self.ids.index(card_id)
+        anterior = self.cum_weights[i - 1] if i else 0.0
+        return (self.cum_weights[i] - anterior) / self.cum_weights[-1]
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+
+class ResumoColecao:
+    # Contagens de um usuário por raridade -> {card_id: quantidade}, mais
+    # os totais. Ajustado carta a carta, então nunca relê o inventário.
+
+    def __init__(self, catalogo, inventario: dict):
+        self.catalogo = catalogo
+        self.por_raridade = {rar: {} for rar in catalogo.ids_by_rarity}
+        self.total = 0
+        self.paginas = None  # layout renderizado; limpo a cada mudança
+        for card_id, qtd in inventario.items():
+            self.ajustar(card_id, qtd)
+
+    def ajustar(self, card_id, delta: int):
+        carta = self.catalogo.get(card_id)
+        if carta is None:
+            return
+        contagens = self.por_raridade.setdefault(carta["raridade"], {})
+        qtd = contagens.get(carta["id"], 0) + delta
+        if qtd > 0:
+            contagens[carta["id"]] = qtd
+        else:
+            contagens.pop(carta["id"], None)
+        self.total += delta
+        self.paginas = None
+
+    def completude(self, raridade: str):
+        # (cartas distintas que possui, cartas da raridade no catálogo)
+        return len(self.por_raridade.get(raridade, {})), len(self.catalogo.ids_by_rarity.get(raridade, []))
+
+    def cartas(self, raridade: str):
+        # [(carta do catálogo, quantidade)] na ordem do catálogo
+        contagens = self.por_raridade.get(raridade, {})
+        return [(self.catalogo.get(cid), contagens[cid]) for cid in sorted(contagens)]
+
+
+class ColecoesCache:
+    # Resumos de coleção por usuário, montados na primeira consulta e
+    # mantidos pelos registros do store (store.subscribe). Só os últimos
+    # "max_usuarios" ficam em memória; os demais são remontados sob demanda.
+
+    def __init__(self, catalogo, carregar, max_usuarios: int = 1024):
+        self.catalogo = catalogo
+        self.carregar = carregar  # user_id -> {card_id: quantidade}
+        self.max_usuarios = max_usuarios
+        self._resumos = OrderedDict()
+
+    def get(self, user_id: str) -> ResumoColecao:
+        resumo = self._resumos.get(user_id)
+        if resumo is None:
+            resumo = self._resumos[user_id] = ResumoColecao(self.catalogo, self.carregar(user_id))
+            if len(self._resumos) > self.max_usuarios:
+                self._resumos.popitem(last=False)
+        self._resumos.move_to_end(user_id)
+        return resumo
+
+    def on_records(self, records):
+        for op, nome, key, value in records:
+            if nome != "cards" or key not in self._resumos:
+                continue
+            if op == "card+":
+                self._resumos[key].ajustar(value, 1)
+            elif op == "card-":
+                self._resumos[key].ajustar(value, -1)
+            else:
+                del self._resumos[key]  # inventário trocado inteiro: remonta depois
@@ -1,10 +1,322 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import gzip
+import html
+import mimetypes
 import os
+import sys
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+# Servidor de downloads das imagens e exportações.
+#
+# Uma thread por conexão (um cliente lento não segura os outros), arquivo
+# enviado com sendfile direto do cache de páginas do kernel, Range para
+# retomar downloads grandes, ETag/Last-Modified para o navegador revalidar
+# sem baixar de novo e gzip nos .json (comprimido uma vez por versão do
+# arquivo). Só o que está em DOWNLOAD_PATHS é servido; o resto do projeto
+# (dados da economia, token...) fica de fora.
 
-print("Servidor de download iniciado!")
-print("Acesse a URL do projeto para baixar os arquivos.")
-print("Clique nos arquivos para baixar.")
+RAIZ = Path(__file__).resolve().parent
+HOST = os.environ.get("DOWNLOAD_HOST", "0.0.0.0")
+PORTA = int(os.environ.get("DOWNLOAD_PORT", "5000"))
+# caminhos relativos à raiz, separados por vírgula (pastas ou arquivos)
+PERMITIDOS = os.environ.get("DOWNLOAD_PATHS", "imagens,exports")
+CACHE_MAX_AGE = int(os.environ.get("DOWNLOAD_MAX_AGE", "3600"))
 
-HTTPServer(("0.0.0.0", 5000), SimpleHTTPRequestHandler).serve_forever()
+GZIP_MINIMO = 1024            # abaixo disso o cabeçalho come o ganho
+GZIP_CACHE_BYTES = 32 << 20   # total de .json comprimidos guardados em memória
+
+
+def _aceita_gzip(cabecalho: str) -> bool:
+    for item in (cabecalho or "").split(","):
+        nome, _, params = item.strip().partition(";")
+        if nome.strip().lower() not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            chave, _, valor = param.partition("=")
+            if chave.strip().lower() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+def _intervalo(cabecalho: str, tamanho: int):
+    # (início, fim) inclusivo; None = ignorar e mandar tudo; False = 416.
+    # Vários intervalos (multipart) não valem o trabalho: manda tudo.
+    unidade, _, spec = (cabecalho or "").partition("=")
+    if unidade.strip().lower() != "bytes" or "," in spec or tamanho == 0:
+        return None
+    inicio, _, fim = spec.strip().partition("-")
+    try:
+        if not inicio:
+            sufixo = int(fim)
+            if sufixo <= 0:
+                return False
+            return max(0, tamanho - sufixo), tamanho - 1
+        inicio = int(inicio)
+        fim = int(fim) if fim else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho:
+        return False
+    if fim < inicio:
+        return None
+    return inicio, min(fim, tamanho - 1)
+
+
+class _CacheGzip:
+    # caminho -> (tamanho, mtime_ns, bytes comprimidos), LRU por bytes
+
+    def __init__(self, limite: int = GZIP_CACHE_BYTES):
+        self.limite = limite
+        self.total = 0
+        self._itens = OrderedDict()
+        self._comprimindo = {}
+        self._lock = threading.Lock()
+
+    def _achar(self, chave: str, st):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item and item[0] == st.st_size and item[1] == st.st_mtime_ns:
+                self._itens.move_to_end(chave)
+                return item[2]
+            return None
+
+    def obter(self, caminho: Path, f, st) -> bytes:
+        chave = str(caminho)
+        dados = self._achar(chave, st)
+        if dados is not None:
+            return dados
+        with self._lock:
+            trava = self._comprimindo.setdefault(chave, threading.Lock())
+        # um arquivo é comprimido por uma thread só; as outras esperam o resultado
+        with trava:
+            dados = self._achar(chave, st)
+            if dados is not None:
+                return dados
+            dados = gzip.compress(f.read(), compresslevel=6, mtime=0)
+            self._guardar(chave, st, dados)
+        return dados
+
+    def _guardar(self, chave: str, st, dados: bytes):
+        with self._lock:
+            antigo = self._itens.pop(chave, None)
+            if antigo:
+                self.total -= len(antigo[2])
+            if len(dados) <= self.limite:
+                self._itens[chave] = (st.st_size, st.st_mtime_ns, dados)
+                self.total += len(dados)
+            while self.total > self.limite:
+                _, (_, _, velho) = self._itens.popitem(last=False)
+                self.total -= len(velho)
+
+
+class DownloadServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, endereco, raiz: Path = RAIZ, permitidos=PERMITIDOS, registrar: bool = True):
+        self.raiz = Path(raiz).resolve()
+        if isinstance(permitidos, str):
+            permitidos = permitidos.split(",")
+        self.permitidos = [tuple(p for p in item.strip().split("/") if p) for item in permitidos]
+        self.permitidos = [p for p in self.permitidos if p]
+        self.registrar = registrar
+        self.gzip = _CacheGzip()
+        super().__init__(endereco, DownloadHandler)
+
+    def handle_error(self, request, client_address):
+        # cliente que pausou o download ou sumiu não é erro do servidor
+        if isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class DownloadHandler(BaseHTTPRequestHandler):
+    server_version = "DownloadServer/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive: tudo sai com Content-Length
+    timeout = 60                    # conexão parada não prende a thread para sempre
+
+    def do_GET(self):
+        self._servir(corpo=True)
+
+    def do_HEAD(self):
+        self._servir(corpo=False)
+
+    def log_message(self, formato, *args):
+        if self.server.registrar:
+            super().log_message(formato, *args)
+
+    # ----- caminhos -----
+    def _resolver(self, partes):
+        # None se o caminho não está liberado (ou tenta sair dele)
+        if any(p.startswith(".") or "\\" in p or "\0" in p for p in partes):
+            return None
+        for permitido in self.server.permitidos:
+            if tuple(partes[:len(permitido)]) != permitido:
+                continue
+            base = self.server.raiz.joinpath(*permitido).resolve()
+            alvo = self.server.raiz.joinpath(*partes).resolve()
+            if alvo == base or alvo.is_relative_to(base):
+                return alvo
+        return None
+
+    def _servir(self, corpo: bool):
+        caminho = unquote(urlsplit(self.path).path)
+        partes = [p for p in caminho.split("/") if p]
+        if not partes:
+            return self._listar(None, "/", corpo)
+        alvo = self._resolver(partes)
+        if alvo is None or not alvo.exists():
+            return self.send_error(HTTPStatus.NOT_FOUND)
+        if alvo.is_dir():
+            if not caminho.endswith("/"):
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header("Location", quote(caminho) + "/")
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+            return self._listar(alvo, caminho, corpo)
+        self._arquivo(alvo, corpo)
+
+    def _listar(self, pasta, caminho: str, corpo: bool):
+        if pasta is None:
+            itens = []
+            for permitido in self.server.permitidos:
+                alvo = self.server.raiz.joinpath(*permitido)
+                if alvo.exists():
+                    nome = "/".join(permitido) + ("/" if alvo.is_dir() else "")
+                    itens.append((nome, "/" + nome))
+        else:
+            itens = []
+            for f in sorted(pasta.iterdir(), key=lambda f: f.name.lower()):
+                if not f.name.startswith("."):
+                    nome = f.name + ("/" if f.is_dir() else "")
+                    itens.append((nome, caminho + nome))
+        linhas = [f'<li><a href="{quote(href)}">{html.escape(nome)}</a></li>' for nome, href in itens]
+        pagina = (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(caminho)}</title>"
+                  f"</head><body><h1>{html.escape(caminho)}</h1><ul>{''.join(linhas)}</ul></body></html>")
+        dados = pagina.encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if corpo:
+            self.wfile.write(dados)
+
+    # ----- arquivos -----
+    def _arquivo(self, alvo: Path, corpo: bool):
+        try:
+            f = alvo.open("rb")
+        except OSError:
+            return self.send_error(HTTPStatus.NOT_FOUND)
+        with f:
+            st = os.fstat(f.fileno())
+            etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+            tipo = mimetypes.guess_type(alvo.name)[0] or "application/octet-stream"
+            json_ = alvo.suffix.lower() == ".json"
+            comprimir = (json_ and st.st_size >= GZIP_MINIMO
+                         and _aceita_gzip(self.headers.get("Accept-Encoding")))
+            if comprimir:
+                etag = etag[:-1] + '-gz"'
+
+            if self._nao_modificado(etag, st.st_mtime):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._cabecalhos_cache(etag, st, json_)
+                return self.end_headers()
+
+            if comprimir:
+                dados = self.server.gzip.obter(alvo, f, st)
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(dados)))
+                self._cabecalhos_cache(etag, st, json_)
+                self.end_headers()
+                if corpo:
+                    self.wfile.write(dados)
+                return
+
+            intervalo = None
+            if self._vale_range(etag, st.st_mtime):
+                intervalo = _intervalo(self.headers.get("Range"), st.st_size)
+            if intervalo is False:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{st.st_size}")
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+            if intervalo:
+                inicio, fim = intervalo
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {inicio}-{fim}/{st.st_size}")
+            else:
+                inicio, fim = 0, st.st_size - 1
+                self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(fim - inicio + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self._cabecalhos_cache(etag, st, json_)
+            self.end_headers()
+            if corpo and fim >= inicio:
+                # os cabeçalhos já saíram (wfile sem buffer); o corpo vai do
+                # arquivo para o socket sem passar pelo Python
+                self.connection.sendfile(f, inicio, fim - inicio + 1)
+
+    def _cabecalhos_cache(self, etag: str, st, json_: bool):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", f"public, max-age={CACHE_MAX_AGE}")
+        if json_:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def _nao_modificado(self, etag: str, mtime: float) -> bool:
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            # comparação fraca: W/"x" vale o mesmo que "x"
+            tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+            return "*" in tags or etag in tags
+        return self._data_ate(self.headers.get("If-Modified-Since"), mtime)
+
+    def _vale_range(self, etag: str, mtime: float) -> bool:
+        # If-Range: só continua de onde parou se o arquivo não mudou
+        if_range = self.headers.get("If-Range")
+        if if_range is None:
+            return True
+        if if_range.strip().startswith(('"', "W/")):
+            return if_range.strip() == etag
+        return self._data_ate(if_range, mtime)
+
+    @staticmethod
+    def _data_ate(valor: str, mtime: float) -> bool:
+        if not valor:
+            return False
+        try:
+            data = parsedate_to_datetime(valor)
+        except (TypeError, ValueError, IndexError):
+            return False
+        return data.tzinfo is not None and int(mtime) <= data.timestamp()
+
+
+def criar_servidor(host: str = HOST, porta: int = PORTA, **kwargs) -> DownloadServer:
+    return DownloadServer((host, porta), **kwargs)
+
+
+if __name__ == "__main__":
+    servidor = criar_servidor()
+    print("Servidor de download iniciado!")
+    print(f"Servindo {', '.join('/'.join(p) for p in servidor.permitidos)} em http://{HOST}:{PORTA}/")
+    print("Clique nos arquivos para baixar.")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,243 @@
+import asyncio
+import bisect
+import functools
+import itertools
+import math
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # sem numpy a amostragem cai para random.sample
+    np = None
+
+# Chances de vitória no duelo. O resultado do !aceitar vem de 5 cartas
+# sorteadas de cada inventário:
+#   total = int((soma ataque + soma vida) * round(1 + soma multiplicadores, 2))
+# Cada carta contribui com uma base (int(ataque) + int(vida)) e um termo de
+# multiplicador (em centésimos, para somar sem erro de ponto flutuante).
+# A distribuição dos totais é exata quando o número de combinações é pequeno
+# e amostrada (vetorizada) quando não é. Com numpy as duas ficam em poucos
+# ms; mesmo assim o bot calcula fora do loop (DuelOddsCache.adistribuicao).
+
+TAMANHO_MAO = 5
+
+
+def _contribuicao(carta: dict, multiplicadores: dict):
+    base = int(carta.get("ataque", 0)) + int(carta.get("vida", 0))
+    termo = round(multiplicadores.get(carta.get("raridade"), 0) * 100)
+    return base, termo
+
+
+def _total(base: int, termos: int) -> int:
+    return int(base * round(1.0 + termos / 100, 2))
+
+
+def _distribuicao_exata(tipos, k: int):
+    # DP sobre os tipos de carta (com multiplicidade): estado
+    # (cartas escolhidas, soma dos termos, soma das bases) -> nº de mãos.
+    estados = {(0, 0, 0): 1}
+    for (base, termo), qtd in tipos.items():
+        novos = dict(estados)
+        for (n, t, b), ways in estados.items():
+            for pega in range(1, min(qtd, k - n) + 1):
+                chave = (n + pega, t + termo * pega, b + base * pega)
+                novos[chave] = novos.get(chave, 0) + ways * math.comb(qtd, pega)
+        estados = novos
+    totais = {}
+    for (n, t, b), ways in estados.items():
+        if n == k:
+            total = _total(b, t)
+            totais[total] = totais.get(total, 0) + ways
+    return totais
+
+
+@functools.lru_cache(maxsize=32)
+def _combinacoes(n: int, k: int):
+    # todas as mãos (C(n, k) x k índices), montadas uma vez por tamanho de inventário
+    pares = itertools.chain.from_iterable(itertools.combinations(range(n), k))
+    return np.fromiter(pares, dtype=np.int16, count=math.comb(n, k) * k).reshape(-1, k)
+
+
+def _totais_np(bases, termos, maos):
+    soma_base = bases[maos].sum(axis=1)
+    soma_termo = termos[maos].sum(axis=1)
+    mult = np.round(1.0 + soma_termo / 100, 2)
+    return (soma_base * mult).astype(np.int64)  # trunca como int()
+
+
+def _distribuicao_exata_np(bases, termos, k: int):
+    maos = _combinacoes(len(bases), k)
+    totais = _totais_np(np.asarray(bases, dtype=np.int64), np.asarray(termos, dtype=np.int64), maos)
+    return np.unique(totais, return_counts=True)
+
+
+def _distribuicao_amostrada(bases, termos, k: int, amostras: int, rng):
+    if np is None:
+        idx = list(range(len(bases)))
+        totais = {}
+        for _ in range(amostras):
+            mao = rng.sample(idx, k)
+            total = _total(sum(bases[i] for i in mao), sum(termos[i] for i in mao))
+            totais[total] = totais.get(total, 0) + 1
+        valores = sorted(totais)
+        return valores, [totais[v] for v in valores]
+
+    gen = np.random.default_rng(rng.getrandbits(64))
+    bases = np.asarray(bases, dtype=np.int64)
+    termos = np.asarray(termos, dtype=np.int64)
+    n = len(bases)
+    # sorteia com reposição e refaz só as linhas que repetiram carta
+    # (raro para inventários grandes) -> mãos uniformes sem reposição;
+    # cada passada só confere as linhas refeitas na anterior
+    maos = gen.integers(0, n, size=(amostras, k))
+    linhas = np.arange(amostras)
+    while linhas.size:
+        ordenadas = np.sort(maos[linhas], axis=1)
+        linhas = linhas[(np.diff(ordenadas, axis=1) == 0).any(axis=1)]
+        maos[linhas] = gen.integers(0, n, size=(linhas.size, k))
+    return np.unique(_totais_np(bases, termos, maos), return_counts=True)
+
+
+class Distribuicao:
+    # Totais possíveis (ordenados) e a probabilidade acumulada:
+    # acumulado[i] = P(total < valores[i]) e acumulado[-1] = 1.
+    # Com numpy fica tudo em arrays (8 bytes por valor no cache).
+
+    def __init__(self, valores, pesos, exata: bool):
+        self.exata = exata
+        if np is not None:
+            self.valores = np.asarray(valores, dtype=np.int64)
+            pesos = np.asarray(pesos, dtype=np.float64)
+            self.acumulado = np.concatenate(([0.0], np.cumsum(pesos))) / pesos.sum()
+        else:
+            self.valores = list(valores)
+            total = sum(pesos)
+            self.acumulado = [0.0]
+            soma = 0
+            for p in pesos:
+                soma += p
+                self.acumulado.append(soma / total)
+
+    def __len__(self):
+        return len(self.valores)
+
+    def _posicao(self, valor, lado: str) -> int:
+        if np is not None:
+            return int(np.searchsorted(self.valores, valor, side=lado))
+        busca = bisect.bisect_left if lado == "left" else bisect.bisect_right
+        return busca(self.valores, valor)
+
+    def prob_menor_que(self, valor) -> float:
+        return float(self.acumulado[self._posicao(valor, "left")])
+
+    def prob_igual(self, valor) -> float:
+        return float(self.acumulado[self._posicao(valor, "right")] - self.acumulado[self._posicao(valor, "left")])
+
+    def media(self) -> float:
+        return sum(
+            float(v) * float(self.acumulado[i + 1] - self.acumulado[i])
+            for i, v in enumerate(self.valores)
+        )
+
+
+def distribuicao(cartas, multiplicadores: dict, limite_exato: int = 50_000,
+                 amostras: int = 20_000, rng=None) -> Distribuicao:
+    rng = rng or random
+    contrib = [_contribuicao(c, multiplicadores) for c in cartas]
+    k = min(TAMANHO_MAO, len(contrib))
+    if math.comb(len(contrib), k) <= limite_exato and np is not None and k:
+        valores, pesos = _distribuicao_exata_np([b for b, _ in contrib], [t for _, t in contrib], k)
+        return Distribuicao(valores, pesos, exata=True)
+    if math.comb(len(contrib), k) <= limite_exato:
+        tipos = {}
+        for par in contrib:
+            tipos[par] = tipos.get(par, 0) + 1
+        totais = _distribuicao_exata(tipos, k)
+        valores = sorted(totais)
+        return Distribuicao(valores, [totais[v] for v in valores], exata=True)
+    bases = [b for b, _ in contrib]
+    termos = [t for _, t in contrib]
+    valores, pesos = _distribuicao_amostrada(bases, termos, k, amostras, rng)
+    return Distribuicao(valores, pesos, exata=False)
+
+
+def _chances_np(a: Distribuicao, b: Distribuicao):
+    pa = np.diff(a.acumulado)
+    menores = b.acumulado[np.searchsorted(b.valores, a.valores, side="left")]
+    ate_igual = b.acumulado[np.searchsorted(b.valores, a.valores, side="right")]
+    vitoria = float((pa * menores).sum())
+    empate = float((pa * (ate_igual - menores)).sum())
+    return vitoria, empate, max(0.0, 1.0 - vitoria - empate)
+
+
+def chances(a: Distribuicao, b: Distribuicao):
+    # (vitória de A, empate, derrota de A)
+    if np is not None:
+        return _chances_np(a, b)
+    if len(a) > len(b):
+        derrota, empate, vitoria = chances(b, a)
+        return vitoria, empate, derrota
+    vitoria = empate = 0.0
+    for i, valor in enumerate(a.valores):
+        p = a.acumulado[i + 1] - a.acumulado[i]
+        vitoria += p * b.prob_menor_que(valor)
+        empate += p * b.prob_igual(valor)
+    return vitoria, empate, max(0.0, 1.0 - vitoria - empate)
+
+
+class DuelOddsCache:
+    # Distribuições por (usuário, versão do inventário): enquanto o
+    # inventário não muda, repetir a prévia não recalcula nada. O cache é
+    # limitado em usuários e no total de valores guardados (uma
+    # distribuição amostrada pode ter dezenas de milhares de totais).
+
+    def __init__(self, multiplicadores: dict, max_itens: int = 512, max_valores: int = 2_000_000):
+        self.multiplicadores = multiplicadores
+        self.max_itens = max_itens
+        self.max_valores = max_valores
+        self.valores = 0
+        self._cache = OrderedDict()
+        # uma thread só: mais threads de cálculo disputam a CPU com o loop
+        self._executor = None
+
+    def _achar(self, user_id: str, versao):
+        item = self._cache.get(user_id)
+        if item is not None and item[0] == versao:
+            self._cache.move_to_end(user_id)
+            return item[1]
+        return None
+
+    def distribuicao(self, user_id: str, versao, cartas_fn) -> Distribuicao:
+        dist = self._achar(user_id, versao)
+        if dist is None:
+            dist = self._guardar(user_id, versao, distribuicao(cartas_fn(), self.multiplicadores))
+        return dist
+
+    async def adistribuicao(self, user_id: str, versao, cartas_fn, executor=None) -> Distribuicao:
+        # cartas_fn() roda no loop (lê o store); o cálculo vai para o executor
+        dist = self._achar(user_id, versao)
+        if dist is None:
+            cartas = cartas_fn()
+            if executor is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(1, thread_name_prefix="duel-odds")
+                executor = self._executor
+            dist = await asyncio.get_running_loop().run_in_executor(
+                executor, distribuicao, cartas, self.multiplicadores
+            )
+            dist = self._guardar(user_id, versao, dist)
+        return dist
+
+    def _guardar(self, user_id: str, versao, dist: Distribuicao) -> Distribuicao:
+        item = self._cache.get(user_id)
+        if item is not None:
+            self.valores -= len(item[1])
+        self._cache[user_id] = (versao, dist)
+        self._cache.move_to_end(user_id)
+        self.valores += len(dist)
+        while len(self._cache) > 1 and (len(self._cache) > self.max_itens or self.valores > self.max_valores):
+            _, (_, antiga) = self._cache.popitem(last=False)
+            self.valores -= len(antiga)
+        return dist
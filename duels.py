@@ -0,0 +1,119 @@
+import asyncio
+import heapq
+import time
+
+
+def _chave(desafiante: str, desafiado: str) -> str:
+    return f"{desafiante}:{desafiado}"
+
+
+class DuelRegistry:
+    # Desafios pendentes, guardados na tabela "duels" do store com chave
+    # "desafiante:desafiado" -> {"aposta", "expira"}. Assim cada par tem o
+    # seu desafio (vários pendentes por usuário) e sobrevivem a reinícios.
+    #
+    # O índice em memória acompanha os registros do store (subscribe),
+    # então criar/aceitar dentro de uma transação só mexe nele no commit.
+    # A expiração usa um min-heap de prazos, como o JoinAwardScheduler:
+    # run() dorme até o próximo prazo e apaga todos os vencidos num único
+    # apply(). Entradas antigas no heap são ignoradas ao sair dele. Os
+    # vencidos são escolhidos dentro de store.apply_fresh(): com o backend
+    # shared, um desafio renovado ou aceito em outro processo não é apagado.
+
+    def __init__(self, store, ttl: int = 5 * 60):
+        self.store = store
+        self.ttl = ttl
+        self.pendentes = {}       # (desafiante, desafiado) -> dados
+        self.por_desafiado = {}   # desafiado -> {desafiante}
+        self.heap = []
+        self._wake = asyncio.Event()
+        for key, dados in store.table("duels").items():
+            self._indexar(key, dados)
+        store.subscribe(self._on_records)
+
+    def _indexar(self, key: str, dados: dict):
+        desafiante, desafiado = key.split(":", 1)
+        par = (desafiante, desafiado)
+        self.pendentes[par] = dados
+        self.por_desafiado.setdefault(desafiado, set()).add(desafiante)
+        if not self.heap or dados["expira"] < self.heap[0][0]:
+            self._wake.set()
+        heapq.heappush(self.heap, (dados["expira"], desafiante, desafiado))
+
+    def _desindexar(self, key: str):
+        desafiante, desafiado = key.split(":", 1)
+        if self.pendentes.pop((desafiante, desafiado), None) is None:
+            return
+        desafiantes = self.por_desafiado.get(desafiado)
+        if desafiantes is not None:
+            desafiantes.discard(desafiante)
+            if not desafiantes:
+                del self.por_desafiado[desafiado]
+
+    def _on_records(self, records):
+        for op, nome, key, value in records:
+            if nome != "duels":
+                continue
+            if op == "set":
+                self._desindexar(key)
+                self._indexar(key, value)
+            elif op == "del":
+                self._desindexar(key)
+
+    # ----- consultas e alterações -----
+    def criar(self, desafiante: str, desafiado: str, aposta: int, db=None) -> dict:
+        # um novo desafio para o mesmo par substitui o anterior
+        dados = {"aposta": int(aposta), "expira": time.time() + self.ttl}
+        (db or self.store).set("duels", _chave(desafiante, desafiado), dados)
+        return dados
+
+    def get(self, desafiante: str, desafiado: str, db=None):
+        if db is not None:
+            dados = db.get("duels", _chave(desafiante, desafiado), None)
+        else:
+            dados = self.pendentes.get((desafiante, desafiado))
+        if dados is None or dados["expira"] <= time.time():
+            return None  # vencido e ainda não limpo pelo run()
+        return dados
+
+    def remover(self, desafiante: str, desafiado: str, db=None):
+        (db or self.store).delete("duels", _chave(desafiante, desafiado))
+
+    def desafios_para(self, desafiado: str):
+        # [(desafiante, dados)] ainda válidos, do que vence primeiro
+        agora = time.time()
+        lista = []
+        for desafiante in self.por_desafiado.get(desafiado, ()):
+            dados = self.pendentes[(desafiante, desafiado)]
+            if dados["expira"] > agora:
+                lista.append((desafiante, dados))
+        return sorted(lista, key=lambda x: x[1]["expira"])
+
+    # ----- expiração -----
+    def tick(self, now: float = None):
+        now = time.time() if now is None else now
+        return len(self.store.apply_fresh(lambda: self._vencidos(now)))
+
+    def _vencidos(self, now: float):
+        records = []
+        while self.heap and self.heap[0][0] <= now:
+            expira, desafiante, desafiado = heapq.heappop(self.heap)
+            dados = self.pendentes.get((desafiante, desafiado))
+            if dados is None or dados["expira"] != expira:
+                continue  # aceito, substituído ou já apagado
+            records.append(("del", "duels", _chave(desafiante, desafiado), None))
+        return records
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            delay = max(0.0, self.heap[0][0] - time.time()) if self.heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[duelos] falha ao expirar desafios: {e}")
@@ -0,0 +1,41 @@
+import bisect
+
+
+class Leaderboard:
+    # Ranking mantido a cada alteração em vez de ordenar a tabela inteira
+    # por consulta. Lista ordenada de (-valor, user_id): o topo é um corte
+    # da lista e a posição de alguém é um bisect. Empates ficam por
+    # user_id, igual ao ORDER BY do SQLite.
+
+    def __init__(self, valores: dict = None):
+        self.valores = {}
+        for uid, valor in (valores or {}).items():
+            if int(valor) > 0:
+                self.valores[uid] = int(valor)
+        self.ordem = sorted((-v, uid) for uid, v in self.valores.items())
+
+    def __len__(self):
+        return len(self.ordem)
+
+    def update(self, user_id: str, valor):
+        valor = int(valor)
+        antigo = self.valores.get(user_id)
+        if antigo == valor:
+            return
+        if antigo is not None:
+            i = bisect.bisect_left(self.ordem, (-antigo, user_id))
+            del self.ordem[i]
+            del self.valores[user_id]
+        if valor > 0:
+            self.valores[user_id] = valor
+            bisect.insort(self.ordem, (-valor, user_id))
+
+    def top(self, n: int = 10):
+        return [(uid, -neg) for neg, uid in self.ordem[:n]]
+
+    def rank(self, user_id: str):
+        # (posição começando em 1, valor) ou None se não está no ranking
+        valor = self.valores.get(user_id)
+        if valor is None:
+            return None
+        return bisect.bisect_left(self.ordem, (-valor, user_id)) + 1, valor
@@ -1,132 +1,194 @@
 import random
 import os
-import json
 import time
 import asyncio
+import concurrent.futures
+import multiprocessing
 from pathlib import Path
 import discord
 from discord.ext import commands
 from typing import List, Dict, Any, Optional
 
+from catalog import CardCatalog, CardSampler
+from storage import open_store
+from sharding import Economias, RankingGlobal, particao_atual
+import duel_odds
+import simulation
+from scheduler import JoinAwardScheduler
+from role_sync import RoleSync
+from asset_cache import AssetCache
+from paginator import Paginador
+from collection import ColecoesCache
+from duels import DuelRegistry
+import metrics
+
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-DATA_DIR = Path(__file__).parent
-BALANCES_FILE = DATA_DIR / "balances.json"
-LAST_CLAIM_FILE = DATA_DIR / "last_claims.json"
-CARDS_FILE = DATA_DIR / "cards.json"
-JOIN_TIMES_FILE = DATA_DIR / "join_times.json"
-WINS_FILE = DATA_DIR / "wins.json"
-SPENT_FILE = DATA_DIR / "spent_coins.json"
-
-def get_spent(user_id: str) -> int:
-    data = _load_json(SPENT_FILE)
-    return int(data.get(user_id, 0))
-
-def add_spent(user_id: str, amount: int):
-    data = _load_json(SPENT_FILE)
-    data[user_id] = int(data.get(user_id, 0)) + int(amount)
-    _save_json(SPENT_FILE, data)
-
-
-def _load_json(path: Path):
-    if not path.exists():
-        return {}
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
 
+class EconomyBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        metrics.instrumentar_http(self.http)
+        instrumentar_chunks(self._connection)
+        self.loop_lag_task = asyncio.create_task(metrics.medir_loop())
+        if METRICS_PORT:
+            try:
+                self.metrics_runner = await metrics.iniciar_servidor(port=METRICS_PORT)
+            except OSError as e:
+                print(f"[metrics] não foi possível abrir a porta {METRICS_PORT}: {e}")
+
+    async def invoke(self, ctx):
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        nome = ctx.command.qualified_name
+        inicio = time.perf_counter()
+        token = metrics.comando_atual.set(nome)
+        token_particao = None
+        ok = False
+        try:
+            try:
+                # a economia do servidor do comando (no modo global, sempre a mesma)
+                token_particao = economias.usar(ctx.guild.id if ctx.guild else None)
+            except LookupError:
+                pass  # DM no modo por servidor: a checagem recusa
+            await super().invoke(ctx)
+            ok = not ctx.command_failed
+        finally:
+            # falha ao abrir a partição também passa por aqui e conta como erro
+            if token_particao is not None:
+                particao_atual.reset(token_particao)
+            metrics.comando_atual.reset(token)
+            metrics.COMANDO_SEGUNDOS.observe(time.perf_counter() - inicio, command=nome)
+            metrics.COMANDOS.inc(command=nome, status="ok" if ok else "error")
+
+    async def close(self):
+        # garante que nada marcado como sujo fique só na memória
+        for particao in economias.abertas():
+            await particao.store.aflush()
+        # e o resto da fila de I/O (assets.json, ranking global)
+        await asyncio.wrap_future(economias.io.barrier())
+        if _pool_simulacao is not None:
+            _pool_simulacao.shutdown(wait=False, cancel_futures=True)
+        if getattr(self, "metrics_runner", None) is not None:
+            await self.metrics_runner.cleanup()
+        await super().close()
+
+
+# Shards: sem SHARD_COUNT o discord.py escolhe quantos e roda todos neste
+# processo. Para dividir entre processos, cada um recebe o mesmo
+# SHARD_COUNT e os seus SHARD_IDS (ex.: "0,1"); a economia então precisa
+# ser por servidor (ECONOMY_MODE=guild), para cada processo ter a sua parte.
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 0)) or None
+SHARD_IDS = [int(i) for i in os.environ.get("SHARD_IDS", "").split(",") if i.strip()] or None
+
+# Os membros de cada servidor são baixados em segundo plano por
+# registrar_membros(), em vez de segurar o on_ready até tudo chegar.
+bot = EconomyBot(command_prefix="!", intents=intents, chunk_guilds_at_startup=False,
+                 shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+_inicio_processo = time.perf_counter()
+
+# Os arquivos de dados ficam ao lado do main.py, a não ser que DATA_DIR
+# aponte para outro lugar (benchmarks e testes usam um diretório temporário)
+DATA_DIR = Path(os.environ.get("DATA_DIR") or Path(__file__).parent)
+
+
+def arquivos_economia(diretorio: Path) -> dict:
+    return {
+        "balances": diretorio / "balances.json",
+        "last_claims": diretorio / "last_claims.json",
+        "cards": diretorio / "cards.json",
+        "join_times": diretorio / "join_times.json",
+        "wins": diretorio / "wins.json",
+        "spent": diretorio / "spent_coins.json",
+        "duels": diretorio / "duels.json",
+    }
 
-def _save_json(path: Path, data):
-    try:
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
 
-def get_wins(user_id: str) -> int:
-    data = _load_json(WINS_FILE)
-    return int(data.get(user_id, 0))
+# Intervalo (segundos) para agrupar as gravações em disco
+FLUSH_INTERVAL = float(os.environ.get("FLUSH_INTERVAL", 5))
+# "json" (arquivos inteiros), "journal" (diário + snapshot), "shared" (o
+# diário dividido entre vários processos no mesmo DATA_DIR) ou "sqlite"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+# "global": uma economia para todos os servidores; "guild": uma por
+# servidor, em DATA_DIR/guilds/<id>/ (ver sharding.py)
+ECONOMY_MODE = os.environ.get("ECONOMY_MODE", "global").lower()
+# De quanto em quanto tempo cada processo publica o seu top para o !rankingglobal
+RANKING_GLOBAL_INTERVALO = float(os.environ.get("RANKING_GLOBAL_INTERVALO", 60))
+# Porta local do endpoint /metrics (formato Prometheus); 0 desliga
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9100))
+# Canal onde as imagens locais são enviadas uma única vez (ver asset_cache.py)
+ASSET_CHANNEL_ID = int(os.environ.get("ASSET_CHANNEL_ID", 0)) or None
 
-def add_win(user_id: str):
-    data = _load_json(WINS_FILE)
-    data[user_id] = int(data.get(user_id, 0)) + 1
-    _save_json(WINS_FILE, data)
+# Todos os helpers aceitam "db": por padrão usam o store, mas dentro de
+# um comando recebem a transação (store.transaction) para que as leituras
+# vejam as mutações pendentes e tudo seja gravado de uma vez no fim.
 
+def get_spent(user_id: str, db=None) -> int:
+    return int((db or store).get("spent", user_id, 0))
 
-def _load_join_times():
-    return _load_json(JOIN_TIMES_FILE)
+def add_spent(user_id: str, amount: int, db=None):
+    (db or store).incr("spent", user_id, amount)
 
+def get_wins(user_id: str, db=None) -> int:
+    return int((db or store).get("wins", user_id, 0))
 
-def _save_join_times(data):
-    _save_json(JOIN_TIMES_FILE, data)
+def add_win(user_id: str, db=None):
+    (db or store).incr("wins", user_id, 1)
 
 
-def get_balance(user_id: str) -> int:
-    data = _load_json(BALANCES_FILE)
-    return int(data.get(user_id, 0))
+def get_balance(user_id: str, db=None) -> int:
+    return int((db or store).get("balances", user_id, 0))
 
 
-def add_balance(user_id: str, amount: int):
-    data = _load_json(BALANCES_FILE)
-    data[user_id] = int(data.get(user_id, 0)) + int(amount)
-    _save_json(BALANCES_FILE, data)
+def add_balance(user_id: str, amount: int, db=None):
+    (db or store).incr("balances", user_id, amount)
 
 
-def deduct_balance(user_id: str, amount: int) -> bool:
-    data = _load_json(BALANCES_FILE)
-    current = int(data.get(user_id, 0))
+def deduct_balance(user_id: str, amount: int, db=None) -> bool:
+    current = get_balance(user_id, db)
     if current < amount:
         return False
-    data[user_id] = current - int(amount)
-    _save_json(BALANCES_FILE, data)
+    (db or store).incr("balances", user_id, -int(amount))
     return True
 
 
-def can_claim_daily(user_id: str, cooldown_seconds: int = 24 * 60 * 60):
-    data = _load_json(LAST_CLAIM_FILE)
-    last = float(data.get(user_id, 0))
+def can_claim_daily(user_id: str, cooldown_seconds: int = 24 * 60 * 60, db=None):
+    last = float((db or store).get("last_claims", user_id, 0))
     now = time.time()
     if now - last >= cooldown_seconds:
         return True, 0
     return False, int(cooldown_seconds - (now - last))
 
 
-def set_claim_time(user_id: str):
-    data = _load_json(LAST_CLAIM_FILE)
-    data[user_id] = time.time()
-    _save_json(LAST_CLAIM_FILE, data)
+def set_claim_time(user_id: str, db=None):
+    (db or store).set("last_claims", user_id, time.time())
+
 
+def get_user_cards(user_id: str, db=None) -> Dict[str, int]:
+    # {card_id: quantidade}
+    return (db or store).cards(user_id)
 
-def get_user_cards(user_id: str):
-    data = _load_json(CARDS_FILE)
-    return data.get(user_id, [])
 
+def listar_cartas(inventario: Dict[str, int]) -> List[dict]:
+    # Uma entrada por cópia, com os dados atuais do catálogo.
+    lista = []
+    for card_id, qtd in inventario.items():
+        carta = catalogo.get(card_id)
+        if carta:
+            lista.extend([carta] * qtd)
+    return lista
 
-def add_card_to_user(user_id: str, carta: dict, raridade: str):
-    data = _load_json(CARDS_FILE)
-    user_cards = data.get(user_id, [])
-    entry = dict(carta)
-    entry["raridade"] = raridade
-    user_cards.append(entry)
-    data[user_id] = user_cards
-    _save_json(CARDS_FILE, data)
 
+def add_card_to_user(user_id: str, carta: dict, raridade: str, db=None):
+    (db or store).add_card(user_id, carta["id"])
 
-def card_already_exists(user_id: str, carta: dict, raridade: str) -> bool:
-    user_cards = get_user_cards(user_id)
-    for card in user_cards:
-        if (card.get("nome") == carta.get("nome") and
-            card.get("ataque") == carta.get("ataque") and
-            card.get("vida") == carta.get("vida") and
-            card.get("raridade") == raridade):
-            return True
-    return False
+
+def card_already_exists(user_id: str, carta: dict, raridade: str, db=None) -> bool:
+    card_id = carta.get("id")
+    if card_id is None:
+        card_id = catalogo.resolve(carta.get("nome", ""), raridade)
+    return card_id is not None and (db or store).owns(user_id, card_id)
 
 def escolher_5_aleatorias(lista):
     if len(lista) <= 5:
@@ -153,113 +215,166 @@ EMOJI_RARITY = {
     "Lendária": "🌟"
 }
 
+# "id" é permanente: é o que fica salvo nos inventários. Nunca reutilize
+# nem renumere; carta nova recebe o próximo número livre.
 cartas = {
     "Comum": [
-        {"nome": "andryw", "imagem": "https://cdn.discordapp.com/attachments/785317706274308117/1448844425160556586/ANDRYW_RUHAN.jpeg", "ataque": 500, "vida": -500},
-        {"nome": "É MAFIA FAMILIA", "imagem": "https://cdn.discordapp.com/attachments/785317706274308117/1448844530081337567/MAFIA.PNG", "ataque": 500, "vida": 1000},
-        {"nome": "EVOLUCAO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448857631098929202/EVOLUCAO.jpeg", "ataque": 666, "vida": 999},
-        {"nome": "BOT DJ CLEITON RASTA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448842573824135320/BOT_DJ_CLEITON_RASTA.jpeg", "ataque": 0, "vida": 0},
-        {"nome": "PUNHETAÇO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448837360572825681/HORADOPUNHETAO.png", "ataque": 1000, "vida": 270},
-        {"nome": "CACHORRO DESCONFIADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448395325948825752/CACHORRO_DESCONFIADO.jpeg", "ataque": 780, "vida": 1340},
-        {"nome": "VAMO PRA LUA GRU", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448390676873085109/VAMO_PRA_LUA_GRU.jpeg","ataque": 1750,"vida": 2200},
-        {"nome": "ABROBA COM LEITE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448495068653551658/ABROBA_COM_LEITE.jpeg","ataque": 1324,"vida": 900},
-        {"nome": "SE ME CHAMOU DE JAO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450996316623863828/SE_ME_CHAMOU_DE_JAO.jpeg","ataque": 1209,"vida": 1402},
-        {"nome": "BEBE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450938745707823286/BEBE.jpeg","ataque": 1200,"vida": 650},
-        {"nome": "COCAO", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001216535625889/COCAO.jpeg","ataque": 1230,"vida": 769},
-        {"nome": "DEIVID N° 11", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001215633850624/DEIVID_N_11_.jpeg","ataque": 1111,"vida": 1111},
-        {"nome": "FooooOOOooOoOlha", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448396099768553542/fooooOOOooOoOlha.jpeg","ataque": 350 ,"vida": 1300},
-        {"nome": "CHAPADO PRATEADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448496992887242923/CHAPADO_PRATEADO.jpeg", "ataque": 1800, "vida": 1892},
-        {"nome": "ESPERMATOCHAPA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448501186855567381/ESPERMATOCHAPA.jpeg", "ataque": 100, "vida": 450},
-        {"nome": "MC BRINQUEDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448860449260175460/MC_BRINQUEDO.jpeg", "ataque": 500, "vida": 1500},
-        {"nome": "DJ ANDRE MARQUES", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448861400993632427/DJ_ANDRE_MARQUES.jpeg", "ataque": 1675, "vida": 1827},
-        {"nome": "CE ENTENDEU VEI?", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448866317020037352/ce_entendeu_vei_.jpeg", "ataque": 1249, "vida": 1233},
-        {"nome": "DIGIMON AGIOTA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450931276763889758/DIGIMON_AGIOTA.jpeg", "ataque": 1548, "vida": 765},
-        {"nome": "M M SAFADO KKKKKK", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448862042571407371/M_M_SAFADO_KKKKKK.jpeg", "ataque": 1892, "vida": 760},
-        {"nome": "BEBE CHAPADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448497494173679789/BEBE_CHAPADO_.jpeg?", "ataque": 420, "vida": 420}
+        {"id": 1, "nome": "andryw", "imagem": "https://cdn.discordapp.com/attachments/785317706274308117/1448844425160556586/ANDRYW_RUHAN.jpeg", "ataque": 500, "vida": -500},
+        {"id": 2, "nome": "É MAFIA FAMILIA", "imagem": "https://cdn.discordapp.com/attachments/785317706274308117/1448844530081337567/MAFIA.PNG", "ataque": 500, "vida": 1000},
+        {"id": 3, "nome": "EVOLUCAO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448857631098929202/EVOLUCAO.jpeg", "ataque": 666, "vida": 999},
+        {"id": 4, "nome": "BOT DJ CLEITON RASTA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448842573824135320/BOT_DJ_CLEITON_RASTA.jpeg", "ataque": 0, "vida": 0},
+        {"id": 5, "nome": "PUNHETAÇO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448837360572825681/HORADOPUNHETAO.png", "ataque": 1000, "vida": 270},
+        {"id": 6, "nome": "CACHORRO DESCONFIADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448395325948825752/CACHORRO_DESCONFIADO.jpeg", "ataque": 780, "vida": 1340},
+        {"id": 7, "nome": "VAMO PRA LUA GRU", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448390676873085109/VAMO_PRA_LUA_GRU.jpeg","ataque": 1750,"vida": 2200},
+        {"id": 8, "nome": "ABROBA COM LEITE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448495068653551658/ABROBA_COM_LEITE.jpeg","ataque": 1324,"vida": 900},
+        {"id": 9, "nome": "SE ME CHAMOU DE JAO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450996316623863828/SE_ME_CHAMOU_DE_JAO.jpeg","ataque": 1209,"vida": 1402},
+        {"id": 10, "nome": "BEBE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450938745707823286/BEBE.jpeg","ataque": 1200,"vida": 650},
+        {"id": 11, "nome": "COCAO", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001216535625889/COCAO.jpeg","ataque": 1230,"vida": 769},
+        {"id": 12, "nome": "DEIVID N° 11", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001215633850624/DEIVID_N_11_.jpeg","ataque": 1111,"vida": 1111},
+        {"id": 13, "nome": "FooooOOOooOoOlha", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448396099768553542/fooooOOOooOoOlha.jpeg","ataque": 350 ,"vida": 1300},
+        {"id": 14, "nome": "CHAPADO PRATEADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448496992887242923/CHAPADO_PRATEADO.jpeg", "ataque": 1800, "vida": 1892},
+        {"id": 15, "nome": "ESPERMATOCHAPA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448501186855567381/ESPERMATOCHAPA.jpeg", "ataque": 100, "vida": 450},
+        {"id": 16, "nome": "MC BRINQUEDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448860449260175460/MC_BRINQUEDO.jpeg", "ataque": 500, "vida": 1500},
+        {"id": 17, "nome": "DJ ANDRE MARQUES", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448861400993632427/DJ_ANDRE_MARQUES.jpeg", "ataque": 1675, "vida": 1827},
+        {"id": 18, "nome": "CE ENTENDEU VEI?", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448866317020037352/ce_entendeu_vei_.jpeg", "ataque": 1249, "vida": 1233},
+        {"id": 19, "nome": "DIGIMON AGIOTA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450931276763889758/DIGIMON_AGIOTA.jpeg", "ataque": 1548, "vida": 765},
+        {"id": 20, "nome": "M M SAFADO KKKKKK", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448862042571407371/M_M_SAFADO_KKKKKK.jpeg", "ataque": 1892, "vida": 760},
+        {"id": 21, "nome": "BEBE CHAPADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448497494173679789/BEBE_CHAPADO_.jpeg?", "ataque": 420, "vida": 420}
     ],
     "Rara": [
-        {"nome": "DOUTOR BUGIGANGA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448837175507554315/DOUTORBUGIGANGA.png", "ataque": 1000, "vida": 1500},
-        {"nome": "BOLOLOHAHAHA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448861006267814081/BOLOLOHAHA.jpeg", "ataque": 2109, "vida": 1082},
-        {"nome": "BERINHEAD", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448826182496682097/BERINHEAD.jpeg", "ataque": 899, "vida": 0},
-        {"nome": "FODEU KKKKKKK", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448499429832130672/FODEU_KKKKK.jpeg", "ataque": 1200, "vida": 879},
-        {"nome": "VEIO DA CORONA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836977259450388/veiodacorona.png", "ataque": 500, "vida": 2100},
-        {"nome": "EU QUE FIZ", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450936750238339326/EU_QUE_FIZ_1.jpeg", "ataque": 1762, "vida": 1203},
-        {"nome": "CHAPELEIRO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450996781742817320/CHAPELEIRO.jpeg", "ataque": 1823, "vida": 1574},
-        {"nome": "ANDRYW DOMADOR DE FERA", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001217105924180/ANDRYW_DOMADOR_DE_FERA.jpeg", "ataque": 1870, "vida": 1506},
-        {"nome": "ET BILU", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001215222681641/ET_BILU.jpeg", "ataque": 2100, "vida": 1250},
-        {"nome": "GRAGUINHAS", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450934719196954685/GRAGRINHAS_.jpeg", "ataque": 1760, "vida": 1305},
-        {"nome": "JOHANN MANDRAKE", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001214568497283/JOHANN_MANDRAKE.jpeg", "ataque": 157, "vida": 2100},
-        {"nome": "ONDE E QUE EU TO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450997696323260416/ONDE_E_QUE_EU_TO_1.jpeg", "ataque": 1980, "vida": 1023},
-        {"nome": "SMURF RABUDO ATIÇANDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448392918514536448/SMURF_RABUDO_ATICANDO.jpeg","ataque": 1000 ,"vida": 1669},
-        {"nome": "PERDOA O PAI", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448494096351232191/PERDOA_O_PAI.jpeg","ataque": 859,"vida": 1911},
-        {"nome": "CARECA VIAJANTE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450931868764737617/CARECA_VIAJANTE.jpeg","ataque": 2500,"vida": 1900},
-        {"nome": "FRED MERCURY PRATEADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448865899162636444/FRED_MERCURY_PRATEADO.jpeg","ataque": 1283,"vida": 2304},
-        {"nome": "MANUAL IMUNDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448858951683674132/MANUAL_IMUNDO.jpeg","ataque": 3255,"vida": 1},
-        {"nome": "FEIJAO COM FARINHA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448496138998255798/FEIJAO_COM_FARINHA.jpeg","ataque": 90,"vida": 2005}
+        {"id": 22, "nome": "DOUTOR BUGIGANGA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448837175507554315/DOUTORBUGIGANGA.png", "ataque": 1000, "vida": 1500},
+        {"id": 23, "nome": "BOLOLOHAHAHA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448861006267814081/BOLOLOHAHA.jpeg", "ataque": 2109, "vida": 1082},
+        {"id": 24, "nome": "BERINHEAD", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448826182496682097/BERINHEAD.jpeg", "ataque": 899, "vida": 0},
+        {"id": 25, "nome": "FODEU KKKKKKK", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448499429832130672/FODEU_KKKKK.jpeg", "ataque": 1200, "vida": 879},
+        {"id": 26, "nome": "VEIO DA CORONA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836977259450388/veiodacorona.png", "ataque": 500, "vida": 2100},
+        {"id": 27, "nome": "EU QUE FIZ", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450936750238339326/EU_QUE_FIZ_1.jpeg", "ataque": 1762, "vida": 1203},
+        {"id": 28, "nome": "CHAPELEIRO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450996781742817320/CHAPELEIRO.jpeg", "ataque": 1823, "vida": 1574},
+        {"id": 29, "nome": "ANDRYW DOMADOR DE FERA", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001217105924180/ANDRYW_DOMADOR_DE_FERA.jpeg", "ataque": 1870, "vida": 1506},
+        {"id": 30, "nome": "ET BILU", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001215222681641/ET_BILU.jpeg", "ataque": 2100, "vida": 1250},
+        {"id": 31, "nome": "GRAGUINHAS", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450934719196954685/GRAGRINHAS_.jpeg", "ataque": 1760, "vida": 1305},
+        {"id": 32, "nome": "JOHANN MANDRAKE", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001214568497283/JOHANN_MANDRAKE.jpeg", "ataque": 157, "vida": 2100},
+        {"id": 33, "nome": "ONDE E QUE EU TO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450997696323260416/ONDE_E_QUE_EU_TO_1.jpeg", "ataque": 1980, "vida": 1023},
+        {"id": 34, "nome": "SMURF RABUDO ATIÇANDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448392918514536448/SMURF_RABUDO_ATICANDO.jpeg","ataque": 1000 ,"vida": 1669},
+        {"id": 35, "nome": "PERDOA O PAI", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448494096351232191/PERDOA_O_PAI.jpeg","ataque": 859,"vida": 1911},
+        {"id": 36, "nome": "CARECA VIAJANTE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450931868764737617/CARECA_VIAJANTE.jpeg","ataque": 2500,"vida": 1900},
+        {"id": 37, "nome": "FRED MERCURY PRATEADO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448865899162636444/FRED_MERCURY_PRATEADO.jpeg","ataque": 1283,"vida": 2304},
+        {"id": 38, "nome": "MANUAL IMUNDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448858951683674132/MANUAL_IMUNDO.jpeg","ataque": 3255,"vida": 1},
+        {"id": 39, "nome": "FEIJAO COM FARINHA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448496138998255798/FEIJAO_COM_FARINHA.jpeg","ataque": 90,"vida": 2005}
     ],
     "Épica": [
-        {"nome": "ROGERIO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836870959005797/ROGERIO.jpg", "ataque": 2000, "vida": 2000},
-        {"nome": "CHIQUINHA CABELUDA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448827135870369832/CHIQUINHA_CABELUDA.jpeg", "ataque": 250, "vida": 3000},
-        {"nome": "PUNHETAO POCANDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448500084345016390/PUNHETAO_POCANDO.jpeg", "ataque": 2090, "vida": 602},
-        {"nome": "MARIO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450935326930636860/MARIO.jpeg", "ataque": 570, "vida": 3100},
-        {"nome": "PELO AMOR MAN", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450932800738955394/PELO_AMOR_MAN.jpeg", "ataque": 2100, "vida": 2300},
-        {"nome": "REAL RICH REAL LIFE", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001213859397702/REAL_RICH_REAL_LIFE.jpeg", "ataque": 2140, "vida": 2200},
-        {"nome": "RASTA DO ROBLOX", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450937547428593725/RASTA_DO_ROBLOX.jpeg", "ataque": 2014, "vida": 2103},
-        {"nome": "DEIVID PUTO", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001218221736118/DEVIDI_PUTO.jpeg", "ataque": 120, "vida": 3210},
-        {"nome": "GINECOLOGISTA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450998132711231620/GINECOLOGISTA.jpeg", "ataque": 3800, "vida": 1000},
-        {"nome": "ANDRYW AMERICA", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001217806237788/ANDRYW_AMERICA.jpeg", "ataque": 2100, "vida": 2500},
-        {"nome": "FESTA DO BOLO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450937547428593725/RASTA_DO_ROBLOX.jpeg", "ataque": 3200, "vida": 2000},
-        {"nome": "NOIA DO K9", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836448001331265/noiak9.png", "ataque": 1870, "vida": 1850},
-        {"nome": "DESCANSAR NE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450938305196855306/DESCANSAR_NE.jpeg", "ataque": 1750, "vida": 2301},
-        {"nome": "PASSARO FARMADOR DE AURA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450933552639250483/PASSARO_FARMADOR_DE_AURA.jpeg", "ataque": 3100, "vida": 1290},
-        {"nome": "SR. DEMERVALDO BATISTA DA SILVA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448862567089963098/sr._demervaldo_batista_da_silva.jpeg", "ataque": 1209, "vida": 2105},
-        {"nome": "TECNICO EM ELETRONICA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448393964989452298/TECNICO_EM_ELETRONICA_1.jpeg", "ataque": 3.14, "vida": 2400},
-        {"nome": "VOU PRO CEARA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448859508649754715/vou_pro_ceara.jpeg", "ataque": 1578, "vida": 2100},
-        {"nome": "PRIME BELO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448498026921594990/PRIME_BELO.jpeg", "ataque": 2100, "vida": 1720}
+        {"id": 40, "nome": "ROGERIO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836870959005797/ROGERIO.jpg", "ataque": 2000, "vida": 2000},
+        {"id": 41, "nome": "CHIQUINHA CABELUDA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448827135870369832/CHIQUINHA_CABELUDA.jpeg", "ataque": 250, "vida": 3000},
+        {"id": 42, "nome": "PUNHETAO POCANDO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448500084345016390/PUNHETAO_POCANDO.jpeg", "ataque": 2090, "vida": 602},
+        {"id": 43, "nome": "MARIO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450935326930636860/MARIO.jpeg", "ataque": 570, "vida": 3100},
+        {"id": 44, "nome": "PELO AMOR MAN", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450932800738955394/PELO_AMOR_MAN.jpeg", "ataque": 2100, "vida": 2300},
+        {"id": 45, "nome": "REAL RICH REAL LIFE", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001213859397702/REAL_RICH_REAL_LIFE.jpeg", "ataque": 2140, "vida": 2200},
+        {"id": 46, "nome": "RASTA DO ROBLOX", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450937547428593725/RASTA_DO_ROBLOX.jpeg", "ataque": 2014, "vida": 2103},
+        {"id": 47, "nome": "DEIVID PUTO", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001218221736118/DEVIDI_PUTO.jpeg", "ataque": 120, "vida": 3210},
+        {"id": 48, "nome": "GINECOLOGISTA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450998132711231620/GINECOLOGISTA.jpeg", "ataque": 3800, "vida": 1000},
+        {"id": 49, "nome": "ANDRYW AMERICA", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001217806237788/ANDRYW_AMERICA.jpeg", "ataque": 2100, "vida": 2500},
+        {"id": 50, "nome": "FESTA DO BOLO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450937547428593725/RASTA_DO_ROBLOX.jpeg", "ataque": 3200, "vida": 2000},
+        {"id": 51, "nome": "NOIA DO K9", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836448001331265/noiak9.png", "ataque": 1870, "vida": 1850},
+        {"id": 52, "nome": "DESCANSAR NE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450938305196855306/DESCANSAR_NE.jpeg", "ataque": 1750, "vida": 2301},
+        {"id": 53, "nome": "PASSARO FARMADOR DE AURA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450933552639250483/PASSARO_FARMADOR_DE_AURA.jpeg", "ataque": 3100, "vida": 1290},
+        {"id": 54, "nome": "SR. DEMERVALDO BATISTA DA SILVA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448862567089963098/sr._demervaldo_batista_da_silva.jpeg", "ataque": 1209, "vida": 2105},
+        {"id": 55, "nome": "TECNICO EM ELETRONICA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448393964989452298/TECNICO_EM_ELETRONICA_1.jpeg", "ataque": 3.14, "vida": 2400},
+        {"id": 56, "nome": "VOU PRO CEARA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448859508649754715/vou_pro_ceara.jpeg", "ataque": 1578, "vida": 2100},
+        {"id": 57, "nome": "PRIME BELO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448498026921594990/PRIME_BELO.jpeg", "ataque": 2100, "vida": 1720}
     ],
     "Lendária": [
-        {"nome": "NARUTO MACONHEIRO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836302781943878/NARUTOMACONHEIRO.png", "ataque": 2100, "vida": 1800},
-        {"nome": "BRUNO HENRIQUE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448500673829277757/BRUNO_HENRIQUE.jpeg", "ataque": 3100, "vida": 2100},
-        {"nome": "CR7 AURA+EGO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448835533206720727/cr7.png", "ataque": 3500, "vida": 500},
-        {"nome": "DEIVID N° 11 SUPREMO", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001216065736816/DEIVID_N_11_SUPREMO.jpeg", "ataque": 4000, "vida": 1650},
-        {"nome": "JOAO PAULO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450997214343069836/JOAO_PAULO.jpeg", "ataque": 3500, "vida": 2500},
-        {"nome": "REALRICH", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448858439509086389/REALRICH.jpeg", "ataque": 7777, "vida": 1},
-        {"nome": "ROCK PORRAAAAA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448860061912006877/ROCK_PORRAAAAAA.jpeg", "ataque": 6666, "vida": 1000},
-        {"nome": "MACONHESCO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448394810347229296/MACONHESCO.jpeg", "ataque": 1420, "vida": 3333}
+        {"id": 58, "nome": "NARUTO MACONHEIRO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448836302781943878/NARUTOMACONHEIRO.png", "ataque": 2100, "vida": 1800},
+        {"id": 59, "nome": "BRUNO HENRIQUE", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448500673829277757/BRUNO_HENRIQUE.jpeg", "ataque": 3100, "vida": 2100},
+        {"id": 60, "nome": "CR7 AURA+EGO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448835533206720727/cr7.png", "ataque": 3500, "vida": 500},
+        {"id": 61, "nome": "DEIVID N° 11 SUPREMO", "imagem": "https://media.discordapp.net/attachments/1448120749738037341/1451001216065736816/DEIVID_N_11_SUPREMO.jpeg", "ataque": 4000, "vida": 1650},
+        {"id": 62, "nome": "JOAO PAULO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1450997214343069836/JOAO_PAULO.jpeg", "ataque": 3500, "vida": 2500},
+        {"id": 63, "nome": "REALRICH", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448858439509086389/REALRICH.jpeg", "ataque": 7777, "vida": 1},
+        {"id": 64, "nome": "ROCK PORRAAAAA", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448860061912006877/ROCK_PORRAAAAAA.jpeg", "ataque": 6666, "vida": 1000},
+        {"id": 65, "nome": "MACONHESCO", "imagem": "https://cdn.discordapp.com/attachments/1448120749738037341/1448394810347229296/MACONHESCO.jpeg", "ataque": 1420, "vida": 3333}
     ]
 }
 
+catalogo = CardCatalog(cartas)
 
-async def atualizar_cargo_top(guild: discord.Guild, role_name: str, user_id: int):
-    role = discord.utils.get(guild.roles, name=role_name)
-    if not role:
-        return  # cargo não existe
+if ECONOMY_MODE == "global" and SHARD_IDS is not None:
+    # dois processos gravando os mesmos arquivos perderiam dados
+    raise RuntimeError("SHARD_IDS divide o bot entre processos: use ECONOMY_MODE=guild")
 
-    # Remove o cargo de todos que têm
-    for member in role.members:
-        if member.id != user_id:
-            try:
-                await member.remove_roles(role)
-            except Exception:
-                pass
 
-    # Dá o cargo ao novo TOP
-    member = guild.get_member(user_id)
-    if member and role not in member.roles:
-        try:
-            await member.add_roles(role)
-        except Exception:
-            pass
+def abrir_store(diretorio: Path, io):
+    return open_store(
+        STORAGE_BACKEND,
+        arquivos_economia(diretorio),
+        diretorio,
+        flush_interval=FLUSH_INTERVAL,
+        resolve_card=catalogo.resolve_entry,
+        io=io,
+        # SQLITE_PATH só vale para a economia global
+        sqlite_path=diretorio / "economy.db" if ECONOMY_MODE == "guild" else None,
+    )
+
+
+def montar_particao(particao):
+    st = particao.store
+    # Resumos de coleção mantidos pelos próprios registros do store
+    particao.colecoes = ColecoesCache(catalogo, st.cards)
+    st.subscribe(particao.colecoes.on_records)
+    particao.duelos = DuelRegistry(st, ttl=DUELO_TTL)
+    particao.join_awards = JoinAwardScheduler(st, _resolve_join_member, award_seconds=60 * 60, amount=100)
+    particao.ranking_cache = {"chave": None, "embed": None}
+    if getattr(bot, "economias_ativas", False):
+        iniciar_particao(particao)  # servidor visto pela primeira vez depois do on_ready
+
+
+def iniciar_particao(particao):
+    # recompensas por tempo e expiração de desafios, uma vez por partição
+    if particao.iniciada:
+        return
+    particao.iniciada = True
+    particao.join_awards.load(particao.store.table("join_times"))
+    particao.tarefas = [
+        asyncio.create_task(particao.join_awards.run()),
+        asyncio.create_task(particao.duelos.run()),
+    ]
+
+
+# A partição é aberta no primeiro uso, então montar_particao pode usar o
+# que é definido mais abaixo. Os nomes abaixo seguem a partição do comando
+# em andamento (EconomyBot.invoke); eventos usam economias.particao(gid).
+economias = Economias(
+    ECONOMY_MODE, DATA_DIR, abrir_store, montar_particao,
+    shard_count=SHARD_COUNT, shard_ids=SHARD_IDS,
+)
+store = economias.proxy("store")
+colecoes = economias.proxy("colecoes")
+duelos = economias.proxy("duelos")
+
+
+@bot.check
+async def economia_do_servidor(ctx):
+    # no modo por servidor não existe economia fora de um servidor
+    if economias.modo == "guild" and ctx.guild is None:
+        raise commands.NoPrivateMessage()
+    return True
+
+
+# Cargos do ranking sincronizados em segundo plano (ver role_sync.py)
+cargos_top = RoleSync()
+
+PESOS_RARIDADE = {"Comum": 60, "Rara": 30, "Épica": 9, "Lendária": 1}
+
+sorteador = CardSampler(catalogo, PESOS_RARIDADE)
+
 
 def sortear_carta():
-    raridade = random.choices(
-        population=["Comum", "Rara", "Épica", "Lendária"],
-        weights=[60, 30, 9, 1],
-        k=1
-    )[0]
+    carta = catalogo.get(sorteador.sortear()[0])
+    return carta, carta["raridade"]
+
 
-    carta = random.choice(cartas[raridade])
-    return carta, raridade
+def sortear_cartas(quantidade: int):
+    return [catalogo.get(card_id) for card_id in sorteador.sortear(quantidade)]
+
+
+assets = AssetCache(DATA_DIR / "assets.json", ASSET_CHANNEL_ID, io=economias.io)
 
 
 async def enviar_embed_com_imagem(ctx, embed, imagem):
@@ -267,6 +382,11 @@ async def enviar_embed_com_imagem(ctx, embed, imagem):
         embed.set_image(url=imagem)
         return await ctx.send(embed=embed)
 
+    url = await assets.url(bot, imagem)
+    if url:
+        embed.set_image(url=url)
+        return await ctx.send(embed=embed)
+
     else:
         try:
             file = discord.File(imagem, filename=os.path.basename(imagem))
@@ -277,112 +397,138 @@ async def enviar_embed_com_imagem(ctx, embed, imagem):
             return await ctx.send(embed=embed)
 
 
-async def paginate_embeds(ctx, embed_items, timeout: int = 120):
-    if not embed_items:
-        return
-
-    current = 0
-
-    first_embed, first_image = embed_items[current]
-    if isinstance(first_image, str) and first_image.startswith(("http://", "https://")):
-        message = await ctx.send(embed=first_embed)
-    else:
-        message = await enviar_embed_com_imagem(ctx, first_embed, first_image)
-
-    if len(embed_items) == 1:
-        return
+_pool_simulacao = None
 
-    LEFT = "⬅️"
-    RIGHT = "➡️"
-    STOP = "⏹️"
 
-    async def add_nav_reactions(msg):
-        for emoji in (LEFT, RIGHT, STOP):
-            try:
-                await msg.add_reaction(emoji)
-            except Exception:
-                pass
-
-    await add_nav_reactions(message)
+def _get_pool_simulacao():
+    # processo separado: a simulação nunca segura o event loop nem o
+    # heartbeat do gateway. Com "spawn" o filho reexecuta este arquivo como
+    # __mp_main__ (o multiprocessing faz isso com o __main__ de qualquer
+    # jeito): monta de novo o bot, o catálogo, o Economias e lê o
+    # assets.json, mas não conecta nem abre partição (são abertas só no
+    # primeiro uso), então não disputa o flock com o processo do bot. O
+    # trabalho em si só usa o módulo simulation e os parâmetros recebidos.
+    global _pool_simulacao
+    if _pool_simulacao is None:
+        _pool_simulacao = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool_simulacao
 
-    def check(reaction, user):
-        return user == ctx.author and reaction.message.id == message.id and str(reaction.emoji) in (LEFT, RIGHT, STOP)
 
-    while True:
-        try:
-            reaction, user = await bot.wait_for("reaction_add", timeout=timeout, check=check)
-        except Exception:
-            try:
-                await message.delete()
-            except Exception:
-                pass
-            break
-
-        emoji = str(reaction.emoji)
-        try:
-            await message.remove_reaction(reaction.emoji, user)
-        except Exception:
-            pass
+def _parametros_simulacao():
+    return {
+        "ids": sorteador.ids,
+        "probs": sorteador.probabilidades(),
+        "raridades": [catalogo.get(i)["raridade"] for i in sorteador.ids],
+        "cartas_por_raridade": {r: len(ids) for r, ids in catalogo.ids_by_rarity.items()},
+        "prob_fusao": {r: p for (r, _), p in probabilidades_fusao.items()},
+        "custo_fusao": CUSTO_FUSAO,
+        "recompensa_duplicata": RECOMPENSA_DUPLICATA,
+    }
 
-        if emoji == STOP:
-            try:
-                await message.delete()
-            except Exception:
-                pass
-            break
 
-        if emoji == RIGHT:
-            current = (current + 1) % len(embed_items)
-        elif emoji == LEFT:
-            current = (current - 1) % len(embed_items)
+@bot.command()
+@commands.is_owner()
+async def testdrop(ctx, tentativas: int = 1_000_000):
+    if simulation.np is None:
+        return await ctx.send("❌ O simulador precisa do numpy instalado (`pip install numpy`).")
+    tentativas = max(1, min(tentativas, 10 ** 9))
+
+    loop = asyncio.get_running_loop()
+    inicio = time.perf_counter()
+    r = await loop.run_in_executor(
+        _get_pool_simulacao(), simulation.relatorio, _parametros_simulacao(), tentativas
+    )
+    total = time.perf_counter() - inicio
 
-        try:
-            await message.delete()
-        except Exception:
-            pass
+    def pct(x):
+        return f"{x * 100:.2f}%"
 
-        next_embed, next_image = embed_items[current]
-        if isinstance(next_image, str) and next_image.startswith(("http://", "https://")):
-            message = await ctx.send(embed=next_embed)
-        else:
-            message = await enviar_embed_com_imagem(ctx, next_embed, next_image)
+    embed = discord.Embed(
+        title="📊 Teste de Drop",
+        description=(
+            f"{tentativas:,} sorteios • {r['jogadores']:,} jogadores simulados\n"
+            f"⏱️ {r['segundos']:.2f}s de simulação ({total:.2f}s no total)"
+        ),
+        color=discord.Color.teal()
+    )
 
-        await add_nav_reactions(message)
+    linhas = []
+    for rar in RARIDADES_ORDENADAS:
+        d = r["drops"]["por_raridade"].get(rar)
+        if d:
+            linhas.append(f"{EMOJI_RARITY[rar]} {rar}: **{pct(d['freq'])}** (IC95 {pct(d['lo'])}–{pct(d['hi'])})")
+    embed.add_field(name="Raridades", value="\n".join(linhas), inline=False)
 
+    linhas = []
+    for rar in RARIDADES_ORDENADAS:
+        freqs = [
+            (v["freq"], catalogo.get(cid)["nome"])
+            for cid, v in r["drops"]["por_carta"].items()
+            if catalogo.get(cid)["raridade"] == rar
+        ]
+        if freqs:
+            esperado = sorteador.probabilidade(catalogo.ids_by_rarity[rar][0])
+            lo, hi = min(freqs), max(freqs)
+            linhas.append(f"{rar}: {pct(lo[0])}–{pct(hi[0])} por carta (esperado {pct(esperado)})")
+    embed.add_field(name="Por carta", value="\n".join(linhas), inline=False)
 
-@bot.command()
-@commands.is_owner()
-async def testdrop(ctx, tentativas: int = 10000):
-    from collections import Counter
+    linhas = []
+    for rar in RARIDADES_ORDENADAS:
+        c = r["completar"].get(rar)
+        if c:
+            linhas.append(
+                f"{rar}: **{c['media']:.0f}** packs (IC95 {c['ic'][0]:.0f}–{c['ic'][1]:.0f}, "
+                f"p95 {c['p95']:.0f}, exato {c['exato']:.0f})"
+            )
+    embed.add_field(name="Packs para completar a raridade", value="\n".join(linhas), inline=False)
 
-    resultado = Counter()
+    linhas = []
+    for rar, por_fracao in r["fusoes"].items():
+        nova = obter_raridade_superior(rar)
+        partes = " | ".join(
+            f"{int(f * 100)}% possuídas: {v['moedas']:+.1f} moedas, nova {pct(v['carta_nova'])}"
+            for f, v in por_fracao.items()
+        )
+        linhas.append(f"**{rar} → {nova}**\n{partes}")
+    embed.add_field(name="Fusão (média por tentativa)", value="\n".join(linhas), inline=False)
 
-    for _ in range(tentativas):
-        _, raridade = sortear_carta()
-        resultado[raridade] += 1
+    await ctx.send(embed=embed)
 
-    linhas = []
-    for r in ["Comum", "Rara", "Épica", "Lendária"]:
-        qtd = resultado[r]
-        linhas.append(f"{r}: {qtd} ({qtd/tentativas*100:.2f}%)")
 
-    await ctx.send("📊 **Teste de Drop**\n" + "\n".join(linhas))
+CUSTO_PACK = 50
+BONUS_DUPLICATA_PACK = 32
+MAX_PACKS_POR_VEZ = 50
 
 
 @bot.command()
-async def abrirpack(ctx):
-    user_id = str(ctx.author.id)
-    COST = 50
+async def abrirpack(ctx, quantidade: int = 1):
+    if quantidade != 1:
+        return await abrir_varios_packs(ctx, quantidade)
 
-    if not deduct_balance(user_id, COST):
-        saldo = get_balance(user_id)
+    user_id = str(ctx.author.id)
+    COST = CUSTO_PACK
+
+    def comprar(tx):
+        carta = raridade = duplicada = None
+        pago = deduct_balance(user_id, COST, tx)
+        if pago:
+            add_spent(user_id, COST, tx)
+            carta, raridade = sortear_carta()
+            duplicada = card_already_exists(user_id, carta, raridade, tx)
+            if duplicada:
+                add_balance(user_id, BONUS_DUPLICATA_PACK, tx)
+            else:
+                add_card_to_user(user_id, carta, raridade, tx)
+        return pago, carta, raridade, duplicada, get_balance(user_id, tx)
+
+    pago, carta, raridade, duplicada, saldo = await store.atomic(comprar, user_id)
+
+    if not pago:
         await ctx.send(f"{ctx.author.mention} Saldo insuficiente. Você precisa de {COST} moedas. Saldo: {saldo} moedas.")
         return
 
-    add_spent(user_id, COST)
-
-    carta, raridade = sortear_carta()
-
     if not carta:
         return await ctx.send("Erro ao sortear carta.")
 
@@ -401,121 +547,282 @@ async def abrirpack(ctx):
         color=discord.Color.blue()
     )
 
-    if card_already_exists(user_id, carta, raridade):
-        add_balance(user_id, 32)
+    if duplicada:
         dup_emoji = EMOJI_RARITY.get(raridade, '')
         embed_dup = discord.Embed(
             title=f"{dup_emoji} Carta Duplicada - {raridade}",
             description=(
                 f"**Nome:** {nome_card}\n"
-                f"{ctx.author.mention} Você já possui esta carta!\n\n**Bonus:** +32 moedas"
+                f"{ctx.author.mention} Você já possui esta carta!\n\n**Bonus:** +{BONUS_DUPLICATA_PACK} moedas"
             ),
             color=discord.Color.gold()
         )
         await enviar_embed_com_imagem(ctx, embed_dup, imagem)
-        saldo_atual = get_balance(user_id)
-        await ctx.send(f"{ctx.author.mention} Saldo atual: {saldo_atual} moedas.")
+        await ctx.send(f"{ctx.author.mention} Saldo atual: {saldo} moedas.")
         return
 
-    add_card_to_user(user_id, carta, raridade)
     await enviar_embed_com_imagem(ctx, embed, imagem)
-    saldo = get_balance(user_id)
     await ctx.send(f"Carta adicionada! Saldo atual: {saldo} moedas.")
 
 
+def _dividir_campo(linhas, limite: int = 1024):
+    # Quebra as linhas em blocos que cabem no limite de um campo do embed.
+    blocos, atual = [], ""
+    for linha in linhas:
+        if atual and len(atual) + len(linha) + 1 > limite:
+            blocos.append(atual)
+            atual = ""
+        atual = f"{atual}\n{linha}" if atual else linha
+    if atual:
+        blocos.append(atual)
+    return blocos
+
+
+async def abrir_varios_packs(ctx, quantidade: int):
+    if quantidade < 1 or quantidade > MAX_PACKS_POR_VEZ:
+        return await ctx.send(f"❌ Você pode abrir de 1 a {MAX_PACKS_POR_VEZ} packs por vez.")
+
+    user_id = str(ctx.author.id)
+    custo = CUSTO_PACK * quantidade
+
+    # um sorteio, uma transação, uma mensagem
+    def comprar(tx):
+        novas, duplicadas, bonus = [], [], 0
+        pago = deduct_balance(user_id, custo, tx)
+        if pago:
+            add_spent(user_id, custo, tx)
+            for carta in sortear_cartas(quantidade):
+                if card_already_exists(user_id, carta, carta["raridade"], tx):
+                    duplicadas.append(carta)
+                else:
+                    add_card_to_user(user_id, carta, carta["raridade"], tx)
+                    novas.append(carta)
+            bonus = BONUS_DUPLICATA_PACK * len(duplicadas)
+            if bonus:
+                add_balance(user_id, bonus, tx)
+        return pago, novas, duplicadas, bonus, get_balance(user_id, tx)
+
+    pago, novas, duplicadas, bonus, saldo = await store.atomic(comprar, user_id)
+
+    if not pago:
+        await ctx.send(
+            f"{ctx.author.mention} Saldo insuficiente. Você precisa de {custo} moedas "
+            f"para {quantidade} packs. Saldo: {saldo} moedas."
+        )
+        return
+
+    embed = discord.Embed(
+        title=f"📦 {quantidade} packs abertos",
+        description=(
+            f"{ctx.author.mention} recebeu **{len(novas)}** cartas novas "
+            f"e **{len(duplicadas)}** duplicadas."
+        ),
+        color=discord.Color.blue()
+    )
+
+    ordem_raridade = ["Lendária", "Épica", "Rara", "Comum"]
+    for rar in ordem_raridade:
+        linhas = [
+            f"**{c['nome']}** — ⚔️ {c['ataque']} | ❤️ {c['vida']}"
+            for c in novas if c["raridade"] == rar
+        ]
+        for i, bloco in enumerate(_dividir_campo(linhas)):
+            nome_campo = f"{EMOJI_RARITY.get(rar, '')} {rar} (novas)" if i == 0 else "\u200b"
+            embed.add_field(name=nome_campo, value=bloco, inline=False)
+
+    if duplicadas:
+        contagem = {}
+        for c in duplicadas:
+            contagem[c["nome"]] = contagem.get(c["nome"], 0) + 1
+        linhas = [f"{nome} x{qtd}" for nome, qtd in contagem.items()]
+        for i, bloco in enumerate(_dividir_campo(linhas)):
+            nome_campo = f"♻️ Duplicadas (+{bonus} moedas)" if i == 0 else "\u200b"
+            embed.add_field(name=nome_campo, value=bloco, inline=False)
+
+    # destaque para a carta mais rara que veio nova
+    if novas:
+        melhor = min(novas, key=lambda c: ordem_raridade.index(c["raridade"]))
+        if melhor["imagem"].startswith(("http://", "https://")):
+            embed.set_thumbnail(url=melhor["imagem"])
+
+    embed.set_footer(text=f"Gasto: {custo} moedas • Saldo atual: {saldo} moedas")
+    await ctx.send(embed=embed)
+
+
+# Membros registrados por lote antes de devolver o controle ao event loop
+LOTE_REGISTRO = 1000
+
+
+# discord.py só devolve os membros de guild.chunk() quando o último chunk
+# chega. Para registrar cada chunk (até 1000 membros) assim que ele é
+# processado, o parser do GUILD_MEMBERS_CHUNK é embrulhado (como o
+# http.request em metrics.instrumentar_http) e entrega (id, bot) na fila
+# do servidor que está sendo registrado.
+_chunks_pendentes = {}
+
+
+def instrumentar_chunks(conexao):
+    original = conexao.parsers["GUILD_MEMBERS_CHUNK"]
+
+    def parse(data):
+        original(data)
+        fila = _chunks_pendentes.get(int(data["guild_id"]))
+        if fila is not None:
+            fila.put_nowait([(m["user"]["id"], m["user"].get("bot", False)) for m in data.get("members", ())])
+
+    conexao.parsers["GUILD_MEMBERS_CHUNK"] = parse
+
+
+async def registrar_guild(guild: discord.Guild):
+    inicio = time.perf_counter()
+    gid = str(guild.id)
+    join_awards = economias.particao(guild.id).join_awards
+    totais = {"membros": 0, "novos": 0, "primeiro_s": None}
+
+    def registrar(membros):
+        lote = [(gid, str(uid), None) for uid, eh_bot in membros
+                if not eh_bot and (gid, str(uid)) not in join_awards.due]
+        if lote:
+            join_awards.track_many(lote)  # um apply() por lote
+        totais["membros"] += len(membros)
+        totais["novos"] += len(lote)
+        if totais["primeiro_s"] is None:
+            totais["primeiro_s"] = time.perf_counter() - inicio
+
+    if guild.chunked:
+        membros = guild.members
+        for i in range(0, len(membros), LOTE_REGISTRO):
+            registrar([(m.id, m.bot) for m in membros[i:i + LOTE_REGISTRO]])
+            await asyncio.sleep(0)
+    else:
+        fila = _chunks_pendentes[guild.id] = asyncio.Queue()
+        pedido = asyncio.ensure_future(guild.chunk(cache=True))
+        # o callback roda depois do parse do último chunk: None fecha a fila
+        pedido.add_done_callback(lambda _: fila.put_nowait(None))
+        try:
+            while (membros := await fila.get()) is not None:
+                registrar(membros)
+        finally:
+            if _chunks_pendentes.get(guild.id) is fila:
+                del _chunks_pendentes[guild.id]
+        await pedido  # falha do chunk (intent faltando, desconexão) sobe daqui
+
+    return {
+        "membros": totais["membros"],
+        "novos": totais["novos"],
+        "primeiro_lote_s": totais["primeiro_s"] or 0.0,
+        "total_s": time.perf_counter() - inicio,
+    }
+
+
+async def registrar_membros():
+    inicio = time.perf_counter()
+    metricas = bot.metricas_inicio
+    for guild in list(bot.guilds):
+        try:
+            m = await registrar_guild(guild)
+        except Exception as e:
+            print(f"[inicio] falha ao registrar membros de {guild.id}: {e}")
+            continue
+        metricas["guilds"][str(guild.id)] = m
+        metricas["membros"] += m["membros"]
+        metricas["novos"] += m["novos"]
+    metricas["registro_s"] = time.perf_counter() - inicio
+    print(
+        f"[inicio] {len(metricas['guilds'])} servidores, {metricas['membros']} membros "
+        f"({metricas['novos']} novos) registrados em {metricas['registro_s']:.2f}s; "
+        f"on_ready em {metricas['ready_s']:.2f}s, recompensas ativas "
+        f"{metricas['premiando_s'] * 1000:.0f}ms depois"
+    )
+
+
 @bot.event
 async def on_ready():
-    print(f"{bot.user} está online!")
+    print(f"{bot.user} está online! ({bot.shard_count} shard(s), economia {economias.modo})")
+    if getattr(bot, "economias_ativas", False):
+        return  # reconexão: o registro já rodou
+
+    # As recompensas começam com o que já está salvo; os membros novos
+    # vão entrando conforme o registro em segundo plano avança. No modo
+    # por servidor, cada partição é aberta (e iniciada) pelo registro.
+    inicio = time.perf_counter()
+    bot.economias_ativas = True
+    for particao in economias.abertas():
+        iniciar_particao(particao)
+    bot.ranking_global_task = asyncio.create_task(ranking_global.run())
+    bot.metricas_inicio = {
+        "ready_s": inicio - _inicio_processo,
+        "premiando_s": time.perf_counter() - inicio,
+        "guilds": {},
+        "membros": 0,
+        "novos": 0,
+    }
+    bot.registro_task = asyncio.create_task(registrar_membros())
+
+
+@bot.event
+async def on_guild_join(guild):
     try:
-        if not hasattr(bot, "join_times_marked"):
-            data = _load_join_times()
-            now = time.time()
-            changed = False
-            for guild in bot.guilds:
-                gid = str(guild.id)
-                if gid not in data:
-                    data[gid] = {}
-                for member in guild.members:
-                    if member.bot:
-                        continue
-                    uid = str(member.id)
-                    if uid not in data[gid]:
-                        data[gid][uid] = now
-                        changed = True
-            if changed:
-                _save_join_times(data)
-            bot.join_times_marked = True
+        await registrar_guild(guild)
+    except Exception as e:
+        print(f"[inicio] falha ao registrar membros de {guild.id}: {e}")
+
+
+@bot.event
+async def on_member_join(member):
+    if member.bot:
+        return
+    try:
+        economias.particao(member.guild.id).join_awards.track(str(member.guild.id), str(member.id))
     except Exception:
         pass
 
-    if not hasattr(bot, "join_awards_task"):
-        bot.join_awards_task = asyncio.create_task(_process_join_awards())
+
+# O raw chega mesmo para quem não está no cache (servidor ainda não
+# carregado com chunk_guilds_at_startup=False); on_member_remove não.
+@bot.event
+async def on_raw_member_remove(payload):
+    try:
+        economias.particao(payload.guild_id).join_awards.untrack(str(payload.guild_id), str(payload.user.id))
+    except Exception:
+        pass
 
 
 @bot.event
-async def on_member_join(member):
+async def on_guild_remove(guild):
     try:
-        data = _load_join_times()
-        gid = str(member.guild.id)
-        uid = str(member.id)
-        if gid not in data:
-            data[gid] = {}
-        data[gid][uid] = time.time()
-        _save_join_times(data)
+        economias.particao(guild.id).join_awards.untrack(str(guild.id))
     except Exception:
         pass
 
 
-async def _process_join_awards():
-    CHECK_INTERVAL = 60
-    AWARD_SECONDS = 60 * 60
-    while True:
-        try:
-            now = time.time()
-            data = _load_join_times()
-            changed = False
-            for gid, users in list(data.items()):
-                guild = bot.get_guild(int(gid))
-                if guild is None:
-                    del data[gid]
-                    changed = True
-                    continue
-                for uid, ts in list(users.items()):
-                    try:
-                        if now - float(ts) >= AWARD_SECONDS:
-                            member = guild.get_member(int(uid))
-                            if member is None:
-                                del data[gid][uid]
-                                changed = True
-                                continue
-
-                            # Da recompensa
-                            add_balance(uid, 100)
-
-                            data[gid][uid] = now
-                            changed = True
-                    except Exception:
-                        try:
-                            del data[gid][uid]
-                            changed = True
-                        except Exception:
-                            pass
-                if gid in data and not data[gid]:
-                    del data[gid]
-                    changed = True
-            if changed:
-                _save_join_times(data)
-        except Exception:
-            pass
-        await asyncio.sleep(CHECK_INTERVAL)
+def _resolve_join_member(gid: str, uid: str):
+    guild = bot.get_guild(int(gid))
+    if guild is None:
+        return None
+    if not guild.chunked:
+        return True  # membros ainda chegando: saídas vêm pelo on_raw_member_remove
+    return guild.get_member(int(uid)) is not None
 
 
+# Recompensa de 100 moedas a cada hora no servidor (uma por partição,
+# criada em montar_particao)
+join_awards = economias.proxy("join_awards")
+
 
 @bot.command()
 async def kitdiario(ctx):
     user_id = str(ctx.author.id)
     COINS = 125
-    can_claim, wait = can_claim_daily(user_id)
+    def resgatar(tx):
+        can_claim, wait = can_claim_daily(user_id, db=tx)
+        if can_claim:
+            add_balance(user_id, COINS, tx)
+            set_claim_time(user_id, tx)
+        return can_claim, wait, get_balance(user_id, tx)
+
+    can_claim, wait, saldo = await store.atomic(resgatar, user_id)
+
     if not can_claim:
         hrs = wait // 3600
         mins = (wait % 3600) // 60
@@ -523,113 +830,172 @@ async def kitdiario(ctx):
         await ctx.send(f"{ctx.author.mention} Você já reivindicou o kit diário! Aguarde {hrs}h {mins}m {secs}s para reclamar novamente.")
         return
 
-    add_balance(user_id, COINS)
-    set_claim_time(user_id)
-    saldo = get_balance(user_id)
     await ctx.send(f"{ctx.author.mention} Você recebeu {COINS} moedas do kit diário! Saldo atual: {saldo} moedas.")
 
 
+ORDEM_COLECAO = ["Lendária", "Épica", "Rara", "Comum"]
+# limite do Discord é 6000 caracteres e 25 campos por embed
+MAX_CARACTERES_PAGINA = 5000
+MAX_CAMPOS_PAGINA = 10
+
+
+def paginas_colecao(resumo):
+    # Lista de páginas, cada uma uma lista de (nome do campo, valor).
+    # Guardada no resumo até o próximo ajuste do inventário.
+    if resumo.paginas is not None:
+        return resumo.paginas
+
+    campos = []
+    for rar in ORDEM_COLECAO:
+        linhas = [
+            f"**{c['nome']}** x{qtd}\n└ ⚔️ {c.get('ataque', '—')} | ❤️ {c.get('vida', '—')}"
+            for c, qtd in resumo.cartas(rar)
+        ]
+        titulo = f"{rar.upper()} {EMOJI_RARITY.get(rar, '')}"
+        for i, bloco in enumerate(_dividir_campo(linhas)):
+            campos.append((titulo if i == 0 else f"{titulo} (cont.)", bloco))
+
+    paginas, atual, tamanho = [], [], 0
+    for nome, valor in campos:
+        if atual and (tamanho + len(nome) + len(valor) > MAX_CARACTERES_PAGINA
+                      or len(atual) >= MAX_CAMPOS_PAGINA):
+            paginas.append(atual)
+            atual, tamanho = [], 0
+        atual.append((nome, valor))
+        tamanho += len(nome) + len(valor)
+    if atual:
+        paginas.append(atual)
+
+    resumo.paginas = paginas
+    return paginas
+
+
+def texto_completude(resumo):
+    linhas = []
+    for rar in ORDEM_COLECAO:
+        possui, total = resumo.completude(rar)
+        if total:
+            linhas.append(f"{EMOJI_RARITY.get(rar, '')} {rar}: {possui}/{total} ({possui * 100 // total}%)")
+    return "\n".join(linhas)
+
+
 @bot.command()
 async def minhacolecao(ctx):
     user_id = str(ctx.author.id)
-    cards = get_user_cards(user_id)
+    resumo = colecoes.get(user_id)
 
-    if not cards:
+    if not resumo.total:
         await ctx.send(f"{ctx.author.mention} Você ainda não possui cartas em sua coleção.")
         return
 
-    # Agrupar cartas por nome + raridade
-    colecao = {}
-
-    for c in cards:
-        chave = (c.get("nome"), c.get("raridade"))
-        if chave not in colecao:
-            colecao[chave] = {
-                "quantidade": 0,
-                "ataque": c.get("ataque", "—"),
-                "vida": c.get("vida", "—"),
-                "raridade": c.get("raridade", "Comum")
-            }
-        colecao[chave]["quantidade"] += 1
-
-    ordem_raridade = ["Lendária", "Épica", "Rara", "Comum"]
-
-    embed = discord.Embed(
-        title=f"📚 Coleção de {ctx.author.display_name}",
-        color=discord.Color.blurple()
-    )
+    paginas = paginas_colecao(resumo)
+    completude = texto_completude(resumo)
+    avatar = ctx.author.avatar.url if ctx.author.avatar else None
 
-    for rar in ordem_raridade:
-        linhas = []
+    async def render(pagina):
+        embed = discord.Embed(
+            title=f"📚 Coleção de {ctx.author.display_name}",
+            description=completude,
+            color=discord.Color.blurple()
+        )
+        for nome, valor in paginas[pagina]:
+            embed.add_field(name=nome, value=valor, inline=False)
+        embed.set_thumbnail(url=avatar)
+        rodape = f"Total de cartas: {resumo.total}"
+        if len(paginas) > 1:
+            rodape += f" • Página {pagina + 1}/{len(paginas)}"
+        embed.set_footer(text=rodape)
+        return embed, None
 
-        for (nome, r), dados in colecao.items():
-            if r != rar:
-                continue
+    await Paginador(ctx.author.id, len(paginas), render).start(ctx)
 
-            linhas.append(
-                f"**{nome}** x{dados['quantidade']}\n"
-                f"└ ⚔️ {dados['ataque']} | ❤️ {dados['vida']}"
-            )
 
-        if linhas:
-            emoji = EMOJI_RARITY.get(rar, "")
-            embed.add_field(
-                name=f"{rar.upper()} {emoji}",
-                value="\n".join(linhas),
-                inline=False
-            )
+MAX_CARTAS_POR_PAGINA = 10
 
-    embed.set_thumbnail(
-        url=ctx.author.avatar.url if ctx.author.avatar else None
-    )
 
-    embed.set_footer(
-        text=f"Total de cartas: {len(cards)}"
+def rarity_color(r):
+    return {
+        "Comum": discord.Color.light_grey(),
+        "Rara": discord.Color.blue(),
+        "Épica": discord.Color.purple(),
+        "Lendária": discord.Color.gold()
+    }.get(r, discord.Color.default())
+
+
+async def embed_carta(c: dict, qtd: int):
+    # (embed, arquivo local a anexar ou None)
+    nome = c.get("nome", "Desconhecida")
+    rar = c.get("raridade", "Desconhecida")
+    atk = c.get("ataque", "-")
+    vida = c.get("vida", "-")
+    imagem = c.get("imagem")
+
+    emoji = EMOJI_RARITY.get(rar, '')
+    descricao = f"**Ataque:** {atk}\n**Vida:** {vida}"
+    if qtd > 1:
+        descricao += f"\n**Quantidade:** x{qtd}"
+    embed = discord.Embed(
+        title=f"{emoji} {nome} - {rar}",
+        description=descricao,
+        color=rarity_color(rar)
     )
 
-    await ctx.send(embed=embed)
+    if not isinstance(imagem, str):
+        return embed, None
+    if imagem.startswith(("http://", "https://")):
+        embed.set_image(url=imagem)
+        return embed, None
+    url = await assets.url(bot, imagem)
+    if url:
+        embed.set_image(url=url)
+        return embed, None
+    if os.path.isfile(imagem):
+        embed.set_image(url=f"attachment://{os.path.basename(imagem)}")
+        return embed, imagem
+    embed.set_footer(text=f"Imagem local: {os.path.basename(imagem)}")
+    return embed, None
+
+
+def embed_lista_cartas(titulo: str, itens, pagina: int, total_paginas: int):
+    linhas = []
+    for c, qtd in itens:
+        rar = c.get("raridade", "Desconhecida")
+        extra = f" x{qtd}" if qtd > 1 else ""
+        linhas.append(
+            f"{EMOJI_RARITY.get(rar, '')} **{c['nome']}**{extra} — {rar} • "
+            f"⚔️ {c.get('ataque', '-')} ❤️ {c.get('vida', '-')}"
+        )
+    embed = discord.Embed(title=titulo, description="\n".join(linhas), color=discord.Color.blurple())
+    primeira = itens[0][0].get("imagem", "") if itens else ""
+    if isinstance(primeira, str) and primeira.startswith(("http://", "https://")):
+        embed.set_thumbnail(url=primeira)
+    embed.set_footer(text=f"Página {pagina + 1}/{total_paginas}")
+    return embed
 
 
 @bot.command()
-async def meuscards(ctx):
+async def meuscards(ctx, por_pagina: int = 1):
     user_id = str(ctx.author.id)
     cards = get_user_cards(user_id)
-    if not cards:
+    # Só o índice (id, quantidade) fica na sessão; cada página é montada
+    # quando alguém chega nela. Cartas que saíram do catálogo não contam.
+    indice = [(card_id, qtd) for card_id, qtd in cards.items() if card_id in catalogo]
+    if not indice:
         await ctx.send(f"{ctx.author.mention} Você ainda não possui cartas em sua coleção.")
         return
 
-    def rarity_color(r):
-        return {
-            "Comum": discord.Color.light_grey(),
-            "Rara": discord.Color.blue(),
-            "Épica": discord.Color.purple(),
-            "Lendária": discord.Color.gold()
-        }.get(r, discord.Color.default())
-
-    embed_items = []
-    for c in cards:
-        nome = c.get("nome", "Desconhecida")
-        rar = c.get("raridade", "Desconhecida")
-        atk = c.get("ataque", "-")
-        vida = c.get("vida", "-")
-        imagem = c.get("imagem")
-
-        emoji = EMOJI_RARITY.get(rar, '')
-        embed = discord.Embed(
-            title=f"{emoji} {nome} - {rar}",
-            description=f"**Ataque:** {atk}\n**Vida:** {vida}",
-            color=rarity_color(rar)
-        )
-
-        if isinstance(imagem, str) and imagem.startswith(("http://", "https://")):
-            embed.set_image(url=imagem)
-        else:
-            if isinstance(imagem, str):
-                embed.set_footer(text=f"Imagem local: {os.path.basename(imagem)}")
+    por_pagina = max(1, min(por_pagina, MAX_CARTAS_POR_PAGINA))
+    total_paginas = (len(indice) + por_pagina - 1) // por_pagina
 
-        embed_items.append((embed, imagem))
+    async def render(pagina):
+        fatia = indice[pagina * por_pagina:(pagina + 1) * por_pagina]
+        itens = [(catalogo.get(card_id), qtd) for card_id, qtd in fatia]
+        if por_pagina == 1:
+            return await embed_carta(*itens[0])
+        titulo = f"🃏 Cartas de {ctx.author.display_name}"
+        return embed_lista_cartas(titulo, itens, pagina, total_paginas), None
 
-    await paginate_embeds(ctx, embed_items)
+    await Paginador(ctx.author.id, total_paginas, render).start(ctx)
 
 
 @bot.command()
@@ -663,7 +1029,36 @@ def calcular_multiplicador(cartas):
         mult += MULTIPLICADORES.get(rar, 0)
     return round(mult, 2)
 
-duelos_pendentes = {}   # {desafiado_id: {"desafiante": id, "aposta": valor}}
+odds_cache = duel_odds.DuelOddsCache(MULTIPLICADORES)
+
+
+async def calcular_chances(id_a: str, id_b: str):
+    # (vitória, empate, derrota) de A contra B e se o cálculo foi exato;
+    # o cache é por (servidor, usuário): no modo por servidor são inventários
+    # diferentes. As distribuições que faltam são calculadas no executor.
+    gid = economias.atual().guild_id
+    dist_a, dist_b = await asyncio.gather(
+        odds_cache.adistribuicao(
+            (gid, id_a), store.inventory_version(id_a), lambda: listar_cartas(get_user_cards(id_a))
+        ),
+        odds_cache.adistribuicao(
+            (gid, id_b), store.inventory_version(id_b), lambda: listar_cartas(get_user_cards(id_b))
+        ),
+    )
+    return duel_odds.chances(dist_a, dist_b), dist_a.exata and dist_b.exata
+
+
+def formatar_chances(chances, exata: bool) -> str:
+    vitoria, empate, derrota = chances
+    texto = f"🟢 {vitoria * 100:.1f}% • 🟡 {empate * 100:.1f}% • 🔴 {derrota * 100:.1f}%"
+    return texto if exata else texto + " (estimado)"
+
+
+# Desafios pendentes por (desafiante, desafiado), salvos no store e
+# apagados sozinhos depois de DUELO_TTL segundos (um DuelRegistry por
+# partição, criado em montar_particao)
+DUELO_TTL = 5 * 60
+
 
 @bot.command()
 async def duelar(ctx, oponente: discord.Member, aposta: int):
@@ -679,22 +1074,27 @@ async def duelar(ctx, oponente: discord.Member, aposta: int):
     if oponente.id == ctx.author.id:
         return await ctx.send("❌ Você não pode se desafiar.")
 
-    duelos_pendentes[oponente.id] = {
-        "desafiante": ctx.author.id,
-        "aposta": aposta
-    }
+    duelos.criar(str(ctx.author.id), str(oponente.id), aposta)
 
     embed = discord.Embed(
         title="⚔️ Novo Duelo!",
         description=(
             f"{oponente.mention}, você foi desafiado por **{ctx.author.mention}**!\n"
             f"Aposta: **{aposta} moedas** 💰\n\n"
-            f"Use `!aceitar @{ctx.author.display_name} {aposta}` para aceitar."
+            f"Use `!aceitar @{ctx.author.display_name}` para aceitar "
+            f"(expira em {DUELO_TTL // 60} minutos)."
         ),
         color=discord.Color.orange()
     )
     embed.set_thumbnail(url=ctx.author.avatar.url if ctx.author.avatar else None)
 
+    chances, exata = await calcular_chances(str(ctx.author.id), str(oponente.id))
+    embed.add_field(
+        name=f"📊 Chances de {ctx.author.display_name}",
+        value=formatar_chances(chances, exata),
+        inline=False
+    )
+
     await ctx.send(embed=embed)
 
 @duelar.error
@@ -708,46 +1108,107 @@ async def duelar_error(ctx, error):
 
 
 @bot.command()
-async def aceitar(ctx, desafiante: discord.Member):
-    dados = duelos_pendentes.get(ctx.author.id)
-
-    if not dados:
-        return await ctx.send("❌ Você não foi desafiado.")
+async def chances(ctx, oponente: discord.Member):
+    if oponente.id == ctx.author.id:
+        return await ctx.send("❌ Escolha outro jogador.")
 
-    if dados["desafiante"] != desafiante.id:
-        return await ctx.send("❌ Esse desafio não é seu.")
+    resultado, exata = await calcular_chances(str(ctx.author.id), str(oponente.id))
+    embed = discord.Embed(
+        title=f"📊 {ctx.author.display_name} vs {oponente.display_name}",
+        description=(
+            f"{formatar_chances(resultado, exata)}\n\n"
+            "Vitória • empate • derrota, sorteando 5 cartas de cada inventário."
+        ),
+        color=discord.Color.orange()
+    )
+    await ctx.send(embed=embed)
 
-    aposta = dados["aposta"]
 
-    if get_balance(str(ctx.author.id)) < aposta:
-        return await ctx.send("❌ Você não tem moedas suficientes.")
+@bot.command()
+async def desafios(ctx):
+    pendentes = duelos.desafios_para(str(ctx.author.id))
+    if not pendentes:
+        return await ctx.send(f"{ctx.author.mention}, você não tem desafios pendentes.")
+
+    agora = time.time()
+    linhas = [
+        f"<@{desafiante}> — **{dados['aposta']} moedas** • expira em {int(dados['expira'] - agora) // 60 + 1} min"
+        for desafiante, dados in pendentes
+    ]
+    embed = discord.Embed(
+        title="⚔️ Desafios pendentes",
+        description="\n".join(linhas) + "\n\nUse `!aceitar @desafiante` para aceitar.",
+        color=discord.Color.orange()
+    )
+    await ctx.send(embed=embed)
 
-    if get_balance(str(desafiante.id)) < aposta:
-        return await ctx.send("❌ O desafiante não tem moedas suficientes.")
 
-    # desconta aposta
-    deduct_balance(str(ctx.author.id), aposta)
-    deduct_balance(str(desafiante.id), aposta)
+@bot.command()
+async def aceitar(ctx, desafiante: discord.Member = None):
+    id_b = str(ctx.author.id)
+
+    if desafiante is None:
+        pendentes = duelos.desafios_para(id_b)
+        if not pendentes:
+            return await ctx.send("❌ Você não foi desafiado.")
+        if len(pendentes) > 1:
+            return await ctx.send("❌ Você tem mais de um desafio. Use `!aceitar @desafiante` (veja `!desafios`).")
+        desafiante = ctx.guild.get_member(int(pendentes[0][0])) if ctx.guild else None
+        if desafiante is None:
+            return await ctx.send("❌ O desafiante não está mais no servidor.")
+
+    id_a = str(desafiante.id)
+
+    # tudo num único commit: desafio, apostas, gastos e prêmio
+    def duelo(tx):
+        dados = duelos.get(id_a, id_b, tx)
+        aposta = dados["aposta"] if dados else 0
+        if not dados:
+            return f"❌ Você não tem desafio pendente de {desafiante.mention}.", None
+        if get_balance(id_b, tx) < aposta:
+            return "❌ Você não tem moedas suficientes.", None
+        if get_balance(id_a, tx) < aposta:
+            return "❌ O desafiante não tem moedas suficientes.", None
+        duelos.remover(id_a, id_b, tx)
+
+        # desconta aposta
+        deduct_balance(id_b, aposta, tx)
+        deduct_balance(id_a, aposta, tx)
+
+        # registra gasto
+        add_spent(id_b, aposta, tx)
+        add_spent(id_a, aposta, tx)
+
+        cartas_a = escolher_5_aleatorias(listar_cartas(get_user_cards(id_a, tx)))
+        cartas_b = escolher_5_aleatorias(listar_cartas(get_user_cards(id_b, tx)))
+        total_a = calcular_total_com_mult(cartas_a)[3]
+        total_b = calcular_total_com_mult(cartas_b)[3]
+
+        if total_a > total_b:
+            vencedor = desafiante
+        elif total_b > total_a:
+            vencedor = ctx.author
+        else:
+            vencedor = None
 
-    # registra gasto
-    add_spent(str(ctx.author.id), aposta)
-    add_spent(str(desafiante.id), aposta)
+        premio = 0
+        if vencedor:
+            premio = aposta * 2
+            add_balance(str(vencedor.id), premio, tx)
+            add_win(str(vencedor.id), tx)
+        else:
+            add_balance(id_b, aposta, tx)
+            add_balance(id_a, aposta, tx)
+        return None, (cartas_a, cartas_b, vencedor, premio)
 
-    cartas_a = escolher_5_aleatorias(get_user_cards(str(desafiante.id)))
-    cartas_b = escolher_5_aleatorias(get_user_cards(str(ctx.author.id)))
+    erro, resultado = await store.atomic(duelo, id_a, id_b)
+    if erro:
+        return await ctx.send(erro)
 
+    cartas_a, cartas_b, vencedor, premio = resultado
     atk_a, vida_a, mult_a, total_a = calcular_total_com_mult(cartas_a)
     atk_b, vida_b, mult_b, total_b = calcular_total_com_mult(cartas_b)
 
-    del duelos_pendentes[ctx.author.id]
-    
-    if total_a > total_b:
-        vencedor = desafiante
-    elif total_b > total_a:
-        vencedor = ctx.author
-    else:
-        vencedor = None
-
     embed = discord.Embed(
         title="⚔️ Resultado do Duelo",
         color=discord.Color.gold()
@@ -782,18 +1243,12 @@ async def aceitar(ctx, desafiante: discord.Member):
     )
 
     if vencedor:
-        premio = aposta * 2
-        add_balance(str(vencedor.id), premio)
-        add_win(str(vencedor.id))
-
         embed.add_field(
             name="🏆 Vencedor",
             value=f"{vencedor.mention} ganhou **{premio} moedas** 💰",
             inline=False
         )
     else:
-        add_balance(str(ctx.author.id), aposta)
-        add_balance(str(desafiante.id), aposta)
         embed.add_field(
             name="🤝 Empate",
             value="Aposta devolvida aos jogadores.",
@@ -808,19 +1263,12 @@ async def vitorias(ctx):
     wins = get_wins(str(ctx.author.id))
     await ctx.send(f"{ctx.author.mention}, você possui **{wins} vitórias** em duelos!")
 
-@bot.command()
-async def ranking(ctx):
-    wins_data = _load_json(WINS_FILE)
-    spent_data = _load_json(SPENT_FILE)
+# O embed do ranking só é remontado quando o top 10 muda; top() vem dos
+# rankings mantidos pelo store, então montar a chave custa pouco. O cache
+# fica na partição (particao.ranking_cache).
 
-    if not wins_data and not spent_data:
-        await ctx.send("Nenhum dado de ranking disponível ainda.")
-        return
-
-    # Ordenações
-    ranking_wins = sorted(wins_data.items(), key=lambda x: x[1], reverse=True)[:10]
-    ranking_spent = sorted(spent_data.items(), key=lambda x: x[1], reverse=True)[:10]
 
+def montar_embed_ranking(ranking_wins, ranking_spent):
     medalhas = {1: "🥇", 2: "🥈", 3: "🥉"}
 
     def formatar_linhas(lista, sufixo):
@@ -857,24 +1305,94 @@ async def ranking(ctx):
         if top_user and top_user.avatar:
             embed.set_thumbnail(url=top_user.avatar.url)
 
-    embed.set_footer(text="Top 10 • Histórico total do servidor")
-    # Atualiza cargos automáticos
-    guild = ctx.guild
-    
+    embed.set_footer(text="Top 10 • Histórico total do servidor • !posicao para ver a sua")
+    return embed
+
+
+@bot.command()
+async def ranking(ctx):
+    ranking_wins = store.top("wins", 10)
+    ranking_spent = store.top("spent", 10)
+
+    if not ranking_wins and not ranking_spent:
+        await ctx.send("Nenhum dado de ranking disponível ainda.")
+        return
+
+    chave = (tuple(map(tuple, ranking_wins)), tuple(map(tuple, ranking_spent)))
+    cache = economias.atual().ranking_cache
+    if cache["chave"] != chave:
+        cache["embed"] = montar_embed_ranking(ranking_wins, ranking_spent)
+        cache["chave"] = chave
+
+    await ctx.send(embed=cache["embed"])
+
+    # Atualiza cargos automáticos depois da resposta
     if ranking_wins:
-        await atualizar_cargo_top(
-            guild,
-            ROLE_TOP_WINS,
-            int(ranking_wins[0][0])
-        )
-    
+        cargos_top.pedir(ctx.guild, ROLE_TOP_WINS, int(ranking_wins[0][0]))
+
     if ranking_spent:
-        await atualizar_cargo_top(
-            guild,
-            ROLE_TOP_SPENT,
-            int(ranking_spent[0][0])
-        )
-        
+        cargos_top.pedir(ctx.guild, ROLE_TOP_SPENT, int(ranking_spent[0][0]))
+
+
+@bot.command()
+async def posicao(ctx, membro: discord.Member = None):
+    membro = membro or ctx.author
+    user_id = str(membro.id)
+
+    embed = discord.Embed(
+        title=f"📈 Posição de {membro.display_name}",
+        color=discord.Color.gold()
+    )
+    for titulo, nome, sufixo in (
+        ("⚔️ Vitórias em Duelos", "wins", "vitória(s)"),
+        ("💸 Moedas Gastas", "spent", "moedas"),
+    ):
+        pos = store.rank(nome, user_id)
+        valor = f"`#{pos[0]}` — {pos[1]} {sufixo}" if pos else "Fora do ranking"
+        embed.add_field(name=titulo, value=valor, inline=False)
+
+    await ctx.send(embed=embed)
+
+
+def _nomes_ranking(gid, uid):
+    # gravados junto com o top: outro processo não tem esses caches
+    user = bot.get_user(int(uid))
+    guild = bot.get_guild(int(gid)) if gid else None
+    return (user.display_name if user else f"Usuário {uid}", guild.name if guild else None)
+
+
+# Cada processo publica o seu top em DATA_DIR/rankings (precisa ser uma
+# pasta compartilhada entre os processos) e o !rankingglobal junta todos.
+ranking_global = RankingGlobal(
+    economias,
+    DATA_DIR / "rankings",
+    "shards-" + "-".join(map(str, SHARD_IDS)) if SHARD_IDS else "principal",
+    _nomes_ranking,
+    intervalo=RANKING_GLOBAL_INTERVALO,
+)
+
+
+@bot.command()
+async def rankingglobal(ctx):
+    medalhas = {1: "🥇", 2: "🥈", 3: "🥉"}
+    embed = discord.Embed(title="🌎 Ranking Global", color=discord.Color.gold())
+    for titulo, nome, sufixo in (
+        ("⚔️ Vitórias em Duelos", "wins", "vitória(s)"),
+        ("💸 Moedas Gastas", "spent", "moedas"),
+    ):
+        entradas = await ranking_global.top(nome, 10)
+        if not entradas:
+            continue
+        linhas = []
+        for pos, (valor, gid, uid, nome_usuario, servidor) in enumerate(entradas, start=1):
+            onde = f" ({servidor or f'servidor {gid}'})" if gid else ""
+            linhas.append(f"{medalhas.get(pos, f'`#{pos}`')} **{nome_usuario}**{onde} — {valor} {sufixo}")
+        embed.add_field(name=titulo, value="\n".join(linhas), inline=False)
+
+    if not embed.fields:
+        await ctx.send("Nenhum dado de ranking disponível ainda.")
+        return
+    embed.set_footer(text=f"Top 10 de todos os servidores • atualizado a cada {int(RANKING_GLOBAL_INTERVALO)}s")
     await ctx.send(embed=embed)
 
 
@@ -896,34 +1414,29 @@ def obter_raridade_superior(raridade: str) -> Optional[str]:
         return RARIDADES_ORDENADAS[idx + 1]
     return None
 
-def escolher_cartas_raridade(cartas_usuario, raridade):
-    filtradas = [c for c in cartas_usuario if c.get("raridade") == raridade]
+def escolher_cartas_raridade(inventario, raridade):
+    filtradas = [c for c in listar_cartas(inventario) if c.get("raridade") == raridade]
     if len(filtradas) < 2:
         return None
     return random.sample(filtradas, 2)
 
-def possui_carta(inventario, carta):
-    return any(
-        c["nome"] == carta["nome"] and c["raridade"] == carta["raridade"]
-        for c in inventario
-    )
+def possui_carta(user_id, carta, db=None):
+    return (db or store).owns(user_id, carta["id"])
 
 
 # ================================================
 #              FUNÇÃO DE FUSÃO
 # ================================================
-def fusao(user_id: str, raridade: str):
+def fusao(user_id: str, raridade: str, db=None):
+    db = db or store
     raridade = raridade.capitalize()
 
     if raridade not in ["Comum", "Rara", "Épica"]:
         return {"erro": True, "msg": "❌ Raridade inválida. Use: Comum, Rara ou Épica."}
 
     # carregar dados
-    saldos = _load_json(BALANCES_FILE)
-    inventarios = _load_json(CARDS_FILE)
-
-    saldo = saldos.get(user_id, 0)
-    cartas_usuario = inventarios.get(user_id, [])
+    saldo = get_balance(user_id, db)
+    cartas_usuario = get_user_cards(user_id, db)
 
     if saldo < CUSTO_FUSAO:
         return {"erro": True, "msg": f"❌ Você precisa de {CUSTO_FUSAO} moedas para fundir."}
@@ -936,20 +1449,15 @@ def fusao(user_id: str, raridade: str):
     carta1, carta2 = escolhidas
 
     saldo -= CUSTO_FUSAO
-    add_spent(user_id, CUSTO_FUSAO)
+    add_balance(user_id, -CUSTO_FUSAO, db)
+    add_spent(user_id, CUSTO_FUSAO, db)
 
     prob = probabilidades_fusao.get((raridade, raridade), 0)
     sucesso = random.random() < prob
 
     if not sucesso:
         # destrói cartas
-        cartas_usuario.remove(carta1)
-        cartas_usuario.remove(carta2)
-
-        inventarios[user_id] = cartas_usuario
-        saldos[user_id] = saldo
-        _save_json(CARDS_FILE, inventarios)
-        _save_json(BALANCES_FILE, saldos)
+        db.remove_cards(user_id, [carta1["id"], carta2["id"]])
 
         return {
             "erro": False,
@@ -960,24 +1468,17 @@ def fusao(user_id: str, raridade: str):
     # SUCESSO
     nova_raridade = obter_raridade_superior(raridade)
     carta_base = random.choice(cartas[nova_raridade])
-    nova_carta = dict(carta_base)
-    nova_carta["raridade"] = nova_raridade
+    nova_carta = dict(catalogo.get(carta_base["id"]))
 
     # duplicata
     duplicata = False
-    if possui_carta(cartas_usuario, nova_carta):
+    if possui_carta(user_id, nova_carta, db):
         duplicata = True
         saldo += RECOMPENSA_DUPLICATA
+        add_balance(user_id, RECOMPENSA_DUPLICATA, db)
     else:
-        cartas_usuario.remove(carta1)
-        cartas_usuario.remove(carta2)
-        cartas_usuario.append(nova_carta)
-
-    inventarios[user_id] = cartas_usuario
-    saldos[user_id] = saldo
-
-    _save_json(CARDS_FILE, inventarios)
-    _save_json(BALANCES_FILE, saldos)
+        db.remove_cards(user_id, [carta1["id"], carta2["id"]])
+        db.add_card(user_id, nova_carta["id"])
 
     return {
         "erro": False,
@@ -988,14 +1489,136 @@ def fusao(user_id: str, raridade: str):
     }
     
 
+def fusao_em_lote(user_id: str, raridade: str, db=None):
+    # Funde todas as cartas da raridade numa passada: embaralha as cópias,
+    # forma os pares, sorteia de uma vez os sucessos e as cartas novas e
+    # aplica tudo como um único commit. Cada par segue a regra da fusão
+    # simples, na ordem, parando quando acabam as moedas.
+    db = db or store
+    raridade = raridade.capitalize()
+
+    if raridade not in ["Comum", "Rara", "Épica"]:
+        return {"erro": True, "msg": "❌ Raridade inválida. Use: Comum, Rara ou Épica."}
+
+    saldo = get_balance(user_id, db)
+    inventario = get_user_cards(user_id, db)
+    copias = [c["id"] for c in listar_cartas(inventario) if c.get("raridade") == raridade]
+
+    if len(copias) < 2:
+        return {"erro": True, "msg": f"❌ Você precisa de **2 cartas {raridade}** para fundir."}
+    if saldo < CUSTO_FUSAO:
+        return {"erro": True, "msg": f"❌ Você precisa de {CUSTO_FUSAO} moedas para fundir."}
+
+    random.shuffle(copias)
+    pares = len(copias) // 2
+    prob = probabilidades_fusao.get((raridade, raridade), 0)
+    nova_raridade = obter_raridade_superior(raridade)
+    sucessos = [r < prob for r in (random.random() for _ in range(pares))]
+    sorteadas = iter(random.choices(catalogo.ids_by_rarity[nova_raridade], k=sum(sucessos)))
+
+    destruir, novas, duplicatas = [], [], []
+    ganhas = set()
+    feitas = 0
+    for i, sucesso in enumerate(sucessos):
+        if saldo < CUSTO_FUSAO:
+            break
+        saldo -= CUSTO_FUSAO
+        feitas += 1
+        par = copias[2 * i:2 * i + 2]
+        if not sucesso:
+            destruir.extend(par)
+            continue
+        nova = next(sorteadas)
+        if nova in ganhas or db.owns(user_id, nova):
+            saldo += RECOMPENSA_DUPLICATA  # o par volta para o inventário
+            duplicatas.append(nova)
+        else:
+            destruir.extend(par)
+            novas.append(nova)
+            ganhas.add(nova)
+
+    custo = feitas * CUSTO_FUSAO
+    recompensa = len(duplicatas) * RECOMPENSA_DUPLICATA
+    add_balance(user_id, recompensa - custo, db)
+    add_spent(user_id, custo, db)
+    db.remove_cards(user_id, destruir)
+    for card_id in novas:
+        db.add_card(user_id, card_id)
+
+    return {
+        "erro": False,
+        "raridade": raridade,
+        "fusoes": feitas,
+        "pares": pares,
+        "falhas": feitas - len(novas) - len(duplicatas),
+        "destruidas": len(destruir),
+        "novas": [catalogo.get(cid) for cid in novas],
+        "duplicatas": [catalogo.get(cid) for cid in duplicatas],
+        "custo": custo,
+        "recompensa": recompensa,
+        "saldo": saldo,
+    }
+
+
+async def fusao_lote_cmd(ctx, raridade: str):
+    user_id = str(ctx.author.id)
+    resultado = await store.atomic(lambda tx: fusao_em_lote(user_id, raridade, tx), user_id)
+
+    if resultado["erro"]:
+        await ctx.send(resultado["msg"])
+        return
+
+    embed = discord.Embed(
+        title=f"🧪 Fusão em lote — {resultado['raridade']}",
+        description=(
+            f"**{resultado['fusoes']}** fusões • ✨ {len(resultado['novas'])} cartas novas • "
+            f"♻️ {len(resultado['duplicatas'])} duplicatas • 💥 {resultado['falhas']} falhas\n"
+            f"Cartas destruídas: **{resultado['destruidas']}**"
+        ),
+        color=discord.Color.purple()
+    )
+
+    if resultado["novas"]:
+        linhas = [
+            f"{EMOJI_RARITY.get(c['raridade'], '')} **{c['nome']}** — ⚔️ {c.get('ataque', '❓')} ❤️ {c.get('vida', '❓')}"
+            for c in resultado["novas"]
+        ]
+        for i, bloco in enumerate(_dividir_campo(linhas)):
+            embed.add_field(name="✨ Novas cartas" if i == 0 else "✨ Novas cartas (cont.)", value=bloco, inline=False)
+        if resultado["novas"][0]["imagem"].startswith(("http://", "https://")):
+            embed.set_thumbnail(url=resultado["novas"][0]["imagem"])
+
+    if resultado["duplicatas"]:
+        nomes = {}
+        for c in resultado["duplicatas"]:
+            nomes[c["nome"]] = nomes.get(c["nome"], 0) + 1
+        linhas = [f"{nome} x{qtd}" if qtd > 1 else nome for nome, qtd in nomes.items()]
+        for i, bloco in enumerate(_dividir_campo(linhas)):
+            titulo = f"♻️ Duplicatas (+{resultado['recompensa']} moedas)" if i == 0 else "♻️ Duplicatas (cont.)"
+            embed.add_field(name=titulo, value=bloco, inline=False)
+
+    rodape = f"Gasto: {resultado['custo']} moedas • Saldo atual: {resultado['saldo']} moedas"
+    if resultado["fusoes"] < resultado["pares"]:
+        rodape += f" • Moedas acabaram: {resultado['pares'] - resultado['fusoes']} pares não fundidos"
+    embed.set_footer(text=rodape)
+    await ctx.send(embed=embed)
+
+
 @bot.command(name="fusao")
-async def fusao_cmd(ctx, raridade: str = None):
+async def fusao_cmd(ctx, raridade: str = None, modo: str = None):
     if raridade is None:
-        await ctx.send("Use: `!fusao comum`, `!fusao rara`, `!fusao épica`")
+        await ctx.send("Use: `!fusao comum`, `!fusao rara`, `!fusao épica` (ou `!fusao comum all` para fundir todas)")
+        return
+
+    if modo is not None:
+        if modo.lower() not in ("all", "todas", "tudo"):
+            await ctx.send("Use `!fusao <raridade> all` para fundir todas as cartas da raridade.")
+            return
+        await fusao_lote_cmd(ctx, raridade)
         return
 
     user_id = str(ctx.author.id)
-    resultado = fusao(user_id, raridade)
+    resultado = await store.atomic(lambda tx: fusao(user_id, raridade, tx), user_id)
 
     if "erro" in resultado and resultado["erro"]:
         await ctx.send(resultado["msg"])
@@ -0,0 +1,185 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Métricas no formato texto do Prometheus, sem dependência extra.
+# Tudo aqui é barato (um lock e somas), então dá para chamar nos caminhos
+# quentes do store e dos comandos. O endpoint /metrics roda no próprio
+# event loop do bot com aiohttp (que já vem com o discord.py).
+
+# comando em execução na task atual; as tasks criadas dentro do comando
+# herdam o valor, então chamadas à API feitas por elas contam para ele
+comando_atual = contextvars.ContextVar("comando_atual", default="")
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_IO = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(nomes, valores, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, labels=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self._valores = {}
+        self._lock = threading.Lock()  # o store também grava de outras threads
+        REGISTRO.append(self)
+
+    def _chave(self, labels: dict):
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for chave, valor in itens:
+            linhas.extend(self._linhas(chave, valor))
+        return linhas
+
+    def _linhas(self, chave, valor):
+        return [f"{self.nome}{_labels(self.labels, chave)} {valor}"]
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def inc(self, quantidade: float = 1, **labels):
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + quantidade
+
+
+class Gauge(_Metrica):
+    tipo = "gauge"
+
+    def set(self, valor: float, **labels):
+        with self._lock:
+            self._valores[self._chave(labels)] = valor
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, labels=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, valor: float, **labels):
+        chave = self._chave(labels)
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                estado = self._valores[chave] = [[0] * len(self.buckets), 0, 0.0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    estado[0][i] += 1
+                    break
+            estado[1] += 1
+            estado[2] += valor
+
+    @contextmanager
+    def time(self, **labels):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **labels)
+
+    def _linhas(self, chave, estado):
+        contagens, total, soma = estado
+        linhas = []
+        acumulado = 0
+        for limite, qtd in zip(self.buckets, contagens):
+            acumulado += qtd
+            le = _labels(self.labels, chave, f'le="{float(limite)!r}"')
+            linhas.append(f"{self.nome}_bucket{le} {acumulado}")
+        le = _labels(self.labels, chave, 'le="+Inf"')
+        linhas.append(f"{self.nome}_bucket{le} {total}")
+        linhas.append(f"{self.nome}_sum{_labels(self.labels, chave)} {soma}")
+        linhas.append(f"{self.nome}_count{_labels(self.labels, chave)} {total}")
+        return linhas
+
+
+REGISTRO = []
+
+COMANDO_SEGUNDOS = Histogram(
+    "bot_command_duration_seconds", "Latência dos comandos", ("command",)
+)
+COMANDOS = Counter(
+    "bot_commands_total", "Comandos executados por resultado", ("command", "status")
+)
+STORAGE_SEGUNDOS = Histogram(
+    "bot_storage_duration_seconds", "Tempo em leituras e escritas do store",
+    ("backend", "op"), buckets=BUCKETS_IO,
+)
+STORAGE_BYTES = Counter(
+    "bot_storage_bytes_written_total", "Bytes gravados em disco pelo store", ("backend", "target")
+)
+STORAGE_FILA = Gauge("bot_storage_io_queue_depth", "Trabalhos na fila da thread de I/O do store")
+STORAGE_CONFLITOS = Counter(
+    "bot_storage_conflicts_total", "Transações refeitas porque outro processo mudou o que leram", ("backend",)
+)
+API_CHAMADAS = Counter(
+    "bot_discord_api_calls_total", "Chamadas HTTP à API do Discord", ("command", "route")
+)
+LOOP_LAG = Gauge("bot_event_loop_lag_seconds", "Último atraso medido do event loop")
+LOOP_LAG_HIST = Histogram(
+    "bot_event_loop_lag_distribution_seconds", "Atraso do event loop", buckets=BUCKETS_IO
+)
+
+
+def render() -> str:
+    linhas = []
+    for metrica in REGISTRO:
+        linhas.extend(metrica.render())
+    return "\n".join(linhas) + "\n"
+
+
+def instrumentar_http(http):
+    # conta cada request do discord.py pelo comando que a originou
+    original = http.request
+
+    async def request(route, *args, **kwargs):
+        API_CHAMADAS.inc(command=comando_atual.get() or "-", route=f"{route.method} {route.path}")
+        return await original(route, *args, **kwargs)
+
+    http.request = request
+
+
+async def medir_loop(intervalo: float = 0.5):
+    # quanto o sleep acorda atrasado = quanto algo segurou o loop
+    while True:
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atraso = max(0.0, time.perf_counter() - inicio - intervalo)
+        LOOP_LAG.set(atraso)
+        LOOP_LAG_HIST.observe(atraso)
+
+
+async def iniciar_servidor(host: str = "127.0.0.1", port: int = 9100):
+    from aiohttp import web
+
+    async def handler(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[metrics] http://{host}:{port}/metrics")
+    return runner
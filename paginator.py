@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import discord
+
+
+class _PularModal(discord.ui.Modal, title="Ir para a página"):
+    pagina = discord.ui.TextInput(label="Número da página", max_length=6)
+
+    def __init__(self, view: "Paginador"):
+        super().__init__()
+        self.view = view
+        self.pagina.placeholder = f"1 a {view.total}"
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            pagina = int(str(self.pagina.value).strip()) - 1
+        except ValueError:
+            await interaction.response.send_message("Página inválida.", ephemeral=True)
+            return
+        await self.view.mostrar(interaction, pagina)
+
+
+class Paginador(discord.ui.View):
+    # Paginação com botões que edita a mesma mensagem (uma interação por
+    # troca de página). As páginas são montadas sob demanda por
+    # render(pagina) -> (embed, arquivo local ou None) e só as últimas
+    # "cache_paginas" ficam guardadas, então uma coleção enorme custa
+    # apenas o índice que o render usa.
+
+    def __init__(self, autor_id: int, total: int, render, timeout: float = 120,
+                 cache_paginas: int = 4):
+        super().__init__(timeout=timeout)
+        self.autor_id = autor_id
+        self.total = total
+        self.render = render
+        self.cache_paginas = cache_paginas
+        self.atual = 0
+        self.message = None
+        self._cache = OrderedDict()
+        if total <= 1:
+            self.clear_items()
+
+    async def _pagina(self, pagina: int):
+        if pagina in self._cache:
+            self._cache.move_to_end(pagina)
+            return self._cache[pagina]
+        item = await self.render(pagina)
+        self._cache[pagina] = item
+        if len(self._cache) > self.cache_paginas:
+            self._cache.popitem(last=False)
+        return item
+
+    def _atualizar_botoes(self):
+        self.primeira.disabled = self.anterior.disabled = self.atual == 0
+        self.ultima.disabled = self.proxima.disabled = self.atual >= self.total - 1
+        self.pular.label = f"{self.atual + 1}/{self.total}"
+
+    async def start(self, ctx):
+        self._atualizar_botoes()
+        embed, arquivo = await self._pagina(0)
+        kwargs = {"embed": embed}
+        if self.total > 1:
+            kwargs["view"] = self
+        if arquivo:
+            kwargs["file"] = discord.File(arquivo)
+        self.message = await ctx.send(**kwargs)
+        if self.total <= 1:
+            self.stop()
+        return self.message
+
+    async def mostrar(self, interaction: discord.Interaction, pagina: int):
+        self.atual = max(0, min(pagina, self.total - 1))
+        self._atualizar_botoes()
+        embed, arquivo = await self._pagina(self.atual)
+        anexos = [discord.File(arquivo)] if arquivo else []
+        await interaction.response.edit_message(embed=embed, attachments=anexos, view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.autor_id:
+            await interaction.response.send_message("Essa coleção não é sua 😉", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        self._cache.clear()
+        if self.message is not None:
+            try:
+                await self.message.delete()
+            except Exception:
+                pass
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def primeira(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.mostrar(interaction, 0)
+
+    @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.primary)
+    async def anterior(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.mostrar(interaction, self.atual - 1)
+
+    @discord.ui.button(label="1/1", style=discord.ButtonStyle.secondary)
+    async def pular(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(_PularModal(self))
+
+    @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.primary)
+    async def proxima(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.mostrar(interaction, self.atual + 1)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def ultima(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.mostrar(interaction, self.total - 1)
+
+    @discord.ui.button(emoji="⏹️", style=discord.ButtonStyle.danger, row=1)
+    async def parar(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        self._cache.clear()
+        await interaction.response.defer()
+        try:
+            await interaction.message.delete()
+        except Exception:
+            pass
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import discord
+
+
+class RoleSync:
+    # Cargos automáticos do ranking (ex.: "👑 Campeão Supremo").
+    #
+    # pedir() só registra quem deveria ter o cargo e volta na hora; um
+    # worker por servidor aplica a diferença em segundo plano. Como as
+    # edições de cargo de um servidor caem no mesmo bucket de rate limit
+    # da API, cada worker espaça as chamadas (intervalo) e os servidores
+    # andam em paralelo. Pedidos repetidos para o mesmo cargo se juntam:
+    # vale só o último dono pedido.
+    #
+    # O dono aplicado por último fica guardado, então trocar o primeiro
+    # lugar custa um remove + um add. role.members só é varrido quando
+    # ainda não se sabe quem tem o cargo (ex.: logo depois de reiniciar).
+
+    def __init__(self, intervalo: float = 1.0, tentativas: int = 3, espera_proibido: float = 600):
+        self.intervalo = intervalo
+        self.tentativas = tentativas
+        self.espera_proibido = espera_proibido
+        self.desejado = {}   # (guild_id, nome do cargo) -> user_id
+        self.aplicado = {}   # (guild_id, nome do cargo) -> user_id
+        self._role_ids = {}  # (guild_id, nome do cargo) -> role_id
+        self._bloqueado = {} # (guild_id, nome do cargo) -> até quando não tentar
+        self._guilds = {}
+        self._pendentes = {}  # guild_id -> nomes de cargo na fila (em ordem)
+        self._workers = {}
+        self._ultima_chamada = {}
+        self.chamadas = 0
+
+    def pedir(self, guild: discord.Guild, role_name: str, user_id: int):
+        if guild is None:
+            return
+        key = (guild.id, role_name)
+        self.desejado[key] = user_id
+        if self.aplicado.get(key) == user_id:
+            return
+        if self._bloqueado.get(key, 0) > time.monotonic():
+            return
+        self._guilds[guild.id] = guild
+        self._pendentes.setdefault(guild.id, {})[role_name] = None
+        worker = self._workers.get(guild.id)
+        if worker is None or worker.done():
+            self._workers[guild.id] = asyncio.create_task(self._worker(guild.id))
+
+    async def _worker(self, guild_id: int):
+        pendentes = self._pendentes[guild_id]
+        while pendentes:
+            role_name = next(iter(pendentes))
+            del pendentes[role_name]
+            try:
+                await self._sincronizar(self._guilds[guild_id], role_name)
+            except Exception as e:
+                print(f"[cargos] falha ao sincronizar {role_name} em {guild_id}: {e}")
+        self._workers.pop(guild_id, None)
+
+    def _resolver_cargo(self, guild: discord.Guild, role_name: str):
+        key = (guild.id, role_name)
+        role = guild.get_role(self._role_ids[key]) if key in self._role_ids else None
+        if role is None or role.name != role_name:
+            role = discord.utils.get(guild.roles, name=role_name)
+            if role is None:
+                self._role_ids.pop(key, None)
+                return None
+            self._role_ids[key] = role.id
+        return role
+
+    async def _sincronizar(self, guild: discord.Guild, role_name: str):
+        key = (guild.id, role_name)
+        user_id = self.desejado[key]
+        if self.aplicado.get(key) == user_id:
+            return
+        role = self._resolver_cargo(guild, role_name)
+        if role is None:
+            return  # cargo não existe
+
+        if key in self.aplicado:
+            anteriores = [guild.get_member(self.aplicado[key])]
+        else:
+            anteriores = list(role.members)
+        remover = [m for m in anteriores if m is not None and m.id != user_id and role in m.roles]
+        novo = guild.get_member(user_id)
+        adicionar = novo is not None and role not in novo.roles
+
+        for member in remover:
+            if not await self._chamar(key, member.remove_roles, role, reason="Ranking: novo primeiro lugar"):
+                return
+        if adicionar:
+            if not await self._chamar(key, novo.add_roles, role, reason="Ranking: primeiro lugar"):
+                return
+        self.aplicado[key] = user_id
+
+        # o primeiro lugar mudou de novo enquanto aplicávamos
+        if self.desejado[key] != user_id:
+            self._pendentes.setdefault(guild.id, {})[role_name] = None
+
+    async def _esperar_vez(self, guild_id: int):
+        agora = time.monotonic()
+        proxima = self._ultima_chamada.get(guild_id, 0) + self.intervalo
+        if proxima > agora:
+            await asyncio.sleep(proxima - agora)
+        self._ultima_chamada[guild_id] = time.monotonic()
+
+    async def _chamar(self, key, func, *args, **kwargs) -> bool:
+        for tentativa in range(self.tentativas):
+            await self._esperar_vez(key[0])
+            self.chamadas += 1
+            try:
+                await func(*args, **kwargs)
+                return True
+            except discord.Forbidden:
+                # sem permissão (cargo acima do bot): não insiste por um tempo
+                print(f"[cargos] sem permissão para mexer em {key[1]} no servidor {key[0]}")
+                self._bloqueado[key] = time.monotonic() + self.espera_proibido
+                return False
+            except discord.NotFound:
+                return True  # membro ou cargo sumiu no meio do caminho
+            except discord.HTTPException as e:
+                espera = float(getattr(e, "retry_after", 0) or 2 ** tentativa)
+                print(f"[cargos] erro {e.status} em {key[1]}, tentando de novo em {espera:.1f}s")
+                await asyncio.sleep(espera)
+        return False
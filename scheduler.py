@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import time
+
+
+class JoinAwardScheduler:
+    # Recompensa por tempo no servidor. Em vez de varrer join_times a cada
+    # minuto, mantém um min-heap de (prazo, guild, usuário) e dorme até o
+    # prazo mais próximo. Todos que vencem no mesmo tick são creditados num
+    # único store.apply().
+    #
+    # Entradas antigas no heap (membro saiu ou foi reagendado) são ignoradas
+    # ao sair do heap: "due" guarda o prazo válido de cada membro.
+    #
+    # Os prazos também seguem os registros do store (subscribe): com o
+    # backend shared, a recompensa dada por outro processo reagenda aqui.
+    # tick() decide dentro de store.apply_fresh(), depois de ler o que os
+    # outros gravaram e com a trava, então a mesma hora não é paga duas vezes.
+
+    def __init__(self, store, resolve_member, award_seconds: int = 60 * 60, amount: int = 100):
+        self.store = store
+        # resolve_member(gid, uid) -> True (membro), False (saiu), None (guild sumiu)
+        self.resolve_member = resolve_member
+        self.award_seconds = award_seconds
+        self.amount = amount
+        self.heap = []
+        self.due = {}
+        self._wake = asyncio.Event()
+        store.subscribe(self._on_records)
+
+    def _on_records(self, records):
+        # os próprios registros já estão em "due" e passam direto
+        for op, nome, key, value in records:
+            if nome != "join_times":
+                continue
+            if op == "join":
+                gid, uid = key
+                if self.due.get((gid, uid)) != float(value) + self.award_seconds:
+                    self._push(gid, uid, value)
+            elif op == "join-" and key[1] is not None:
+                self.due.pop(tuple(key), None)
+            else:
+                # servidor inteiro removido ("join-" sem usuário, "del") ou trocado ("set")
+                gid = key[0] if op == "join-" else key
+                for k in [k for k in self.due if k[0] == gid]:
+                    del self.due[k]
+                if op == "set":
+                    for uid, ts in value.items():
+                        self._push(gid, uid, ts)
+
+    def load(self, join_times: dict):
+        for gid, users in join_times.items():
+            for uid, ts in users.items():
+                self.due[(gid, uid)] = float(ts) + self.award_seconds
+        self.heap = [(deadline, gid, uid) for (gid, uid), deadline in self.due.items()]
+        heapq.heapify(self.heap)
+        self._wake.set()
+
+    def _push(self, gid: str, uid: str, ts: float):
+        deadline = float(ts) + self.award_seconds
+        self.due[(gid, uid)] = deadline
+        if not self.heap or deadline < self.heap[0][0]:
+            self._wake.set()
+        heapq.heappush(self.heap, (deadline, gid, uid))
+
+    def track(self, gid: str, uid: str, ts: float = None):
+        self.track_many([(gid, uid, ts)])
+
+    def track_many(self, entries):
+        records = []
+        for gid, uid, ts in entries:
+            ts = time.time() if ts is None else ts
+            records.append(("join", "join_times", [gid, uid], ts))
+            self._push(gid, uid, ts)
+        if records:
+            self.store.apply(records)
+
+    def untrack(self, gid: str, uid: str = None):
+        if uid is None:
+            keys = [k for k in self.due if k[0] == gid]
+        else:
+            keys = [k for k in ((gid, uid),) if k in self.due]
+        if not keys:
+            return
+        for key in keys:
+            del self.due[key]
+        self.store.remove_join(gid, uid)
+
+    def tick(self, now: float = None):
+        now = time.time() if now is None else now
+        return self.store.apply_fresh(lambda: self._vencidos(now))
+
+    def _vencidos(self, now: float):
+        records = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, gid, uid = heapq.heappop(self.heap)
+            if self.due.get((gid, uid)) != deadline:
+                continue  # entrada obsoleta
+            try:
+                status = self.resolve_member(gid, uid)
+            except Exception:
+                status = False
+            if status is None:
+                for key in [k for k in self.due if k[0] == gid]:
+                    del self.due[key]
+                records.append(("join-", "join_times", [gid, None], None))
+                continue
+            if not status:
+                del self.due[(gid, uid)]
+                records.append(("join-", "join_times", [gid, uid], None))
+                continue
+
+            # Da recompensa
+            records.append(("incr", "balances", uid, self.amount))
+            records.append(("join", "join_times", [gid, uid], now))
+            self.due[(gid, uid)] = now + self.award_seconds
+            heapq.heappush(self.heap, (now + self.award_seconds, gid, uid))
+        return records
+
+    def _next_delay(self):
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - time.time())
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            delay = self._next_delay()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                continue  # entrou alguém com prazo mais cedo: recalcula
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[join_awards] falha no tick: {e}")
@@ -0,0 +1,186 @@
+import asyncio
+import contextvars
+import heapq
+import json
+import time
+from pathlib import Path
+
+from storage import IOWorker, _atomic_write
+
+MODOS = ("global", "guild")
+
+# partição do comando/evento em andamento (as tasks criadas nele herdam)
+particao_atual = contextvars.ContextVar("particao_atual", default=None)
+
+
+def shard_do_servidor(guild_id, shard_count: int) -> int:
+    # a mesma conta que o Discord usa para mandar um servidor a um shard
+    return (int(guild_id) >> 22) % shard_count
+
+
+class Particao:
+    # Uma economia: o store e o que é derivado dele (desafios, coleções,
+    # recompensas...), pendurado aqui por quem monta a partição.
+
+    def __init__(self, guild_id, store):
+        self.guild_id = guild_id  # None no modo global
+        self.store = store
+        self.iniciada = False
+
+
+class Economias:
+    # ECONOMY_MODE=global: uma economia só, nos arquivos de sempre em
+    # DATA_DIR. ECONOMY_MODE=guild: cada servidor tem a sua, em
+    # DATA_DIR/guilds/<id>/, aberta na primeira vez que é usada.
+    #
+    # Com SHARD_IDS cada processo só atende os servidores dos seus shards;
+    # particao() recusa os outros, então processos diferentes nunca abrem
+    # o mesmo diretório. Todas as partições do processo dividem uma thread
+    # de I/O (as chaves da fila levam o caminho do arquivo).
+
+    def __init__(self, modo: str, data_dir: Path, abrir, montar,
+                 shard_count: int = None, shard_ids=None):
+        if modo not in MODOS:
+            raise ValueError(f"ECONOMY_MODE desconhecido: {modo}")
+        self.modo = modo
+        self.data_dir = Path(data_dir)
+        self.abrir = abrir    # (diretório, io) -> store
+        self.montar = montar  # Particao -> None (cria os derivados)
+        self.shard_count = shard_count
+        self.shard_ids = set(shard_ids) if shard_ids is not None else None
+        self.io = IOWorker("storage-io")
+        self._particoes = {}
+        self._global = None
+
+    def _abrir(self, guild_id, diretorio: Path) -> Particao:
+        diretorio.mkdir(parents=True, exist_ok=True)
+        particao = Particao(guild_id, self.abrir(diretorio, self.io))
+        self.montar(particao)
+        return particao
+
+    def dono(self, guild_id) -> bool:
+        if self.shard_ids is None:
+            return True
+        return shard_do_servidor(guild_id, self.shard_count) in self.shard_ids
+
+    def particao(self, guild_id) -> Particao:
+        if self.modo == "global":
+            if self._global is None:
+                self._global = self._abrir(None, self.data_dir)
+            return self._global
+        if guild_id is None:
+            raise LookupError("economia por servidor: comando fora de um servidor")
+        gid = str(guild_id)
+        particao = self._particoes.get(gid)
+        if particao is None:
+            if not self.dono(guild_id):
+                raise LookupError(f"servidor {gid} pertence a outro processo (shard "
+                                  f"{shard_do_servidor(guild_id, self.shard_count)})")
+            particao = self._particoes[gid] = self._abrir(gid, self.data_dir / "guilds" / gid)
+        return particao
+
+    def abertas(self):
+        if self.modo == "global":
+            return [self.particao(None)]
+        return list(self._particoes.values())
+
+    def atual(self) -> Particao:
+        particao = particao_atual.get()
+        if particao is not None:
+            return particao
+        if self.modo == "global":
+            return self.particao(None)
+        raise LookupError("economia por servidor: nenhuma partição em uso")
+
+    def usar(self, guild_id):
+        # devolve o token para particao_atual.reset()
+        return particao_atual.set(self.particao(guild_id))
+
+    def proxy(self, atributo: str):
+        return _DaParticaoAtual(self, atributo)
+
+
+class _DaParticaoAtual:
+    # Encaminha para <partição atual>.<atributo>: permite que main.py siga
+    # usando "store", "duelos"... sem saber em qual servidor está.
+
+    def __init__(self, economias: Economias, atributo: str):
+        self._economias = economias
+        self._atributo = atributo
+
+    def __getattr__(self, nome):
+        return getattr(getattr(self._economias.atual(), self._atributo), nome)
+
+
+class RankingGlobal:
+    # Ranking entre todos os servidores (e processos). Cada processo
+    # publica o top N de cada tabela das suas partições em
+    # <diretório>/<processo>.json; top() junta os arquivos dos outros com
+    # os dados frescos deste. O top N da união é o top N dos tops, então
+    # ninguém precisa ler as economias dos outros processos.
+    #
+    # As entradas são (valor, guild_id, user_id, nome, servidor): no modo
+    # por servidor o mesmo usuário aparece uma vez por economia.
+
+    def __init__(self, economias: Economias, diretorio: Path, processo: str, nomear,
+                 tabelas=("wins", "spent"), n: int = 10, intervalo: float = 60):
+        self.economias = economias
+        self.diretorio = Path(diretorio)
+        self.processo = processo
+        self.nomear = nomear  # (guild_id, user_id) -> (nome do usuário, nome do servidor)
+        self.tabelas = tabelas
+        self.n = n
+        self.intervalo = intervalo
+
+    def local(self, tabela: str):
+        candidatos = []
+        for particao in self.economias.abertas():
+            for user_id, valor in particao.store.top(tabela, self.n):
+                candidatos.append((valor, particao.guild_id, user_id))
+        melhores = heapq.nlargest(self.n, candidatos, key=lambda x: x[0])
+        return [[valor, gid, uid, *self.nomear(gid, uid)] for valor, gid, uid in melhores]
+
+    def publicar(self):
+        dados = {
+            "processo": self.processo,
+            "atualizado": time.time(),
+            "tops": {tabela: self.local(tabela) for tabela in self.tabelas},
+        }
+        caminho = self.diretorio / f"{self.processo}.json"
+        return self.economias.io.submit(("ranking", str(caminho)), self._gravar, caminho, dados)
+
+    def _gravar(self, caminho: Path, dados: dict):
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        _atomic_write(caminho, dados)
+
+    def _ler_outros(self):
+        # roda na thread de I/O; arquivos velhos (processo parado) ficam de fora
+        limite = time.time() - 3 * self.intervalo
+        tops = []
+        for caminho in sorted(self.diretorio.glob("*.json")):
+            if caminho.stem == self.processo:
+                continue
+            try:
+                with caminho.open("r", encoding="utf-8") as f:
+                    dados = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if dados.get("atualizado", 0) >= limite:
+                tops.append(dados["tops"])
+        return tops
+
+    async def top(self, tabela: str, n: int = None):
+        n = n or self.n
+        outros = await asyncio.wrap_future(self.economias.io.submit(None, self._ler_outros))
+        entradas = [tuple(e) for e in self.local(tabela)]
+        for tops in outros:
+            entradas.extend(tuple(e) for e in tops.get(tabela, ()))
+        return heapq.nlargest(n, entradas, key=lambda e: e[0])
+
+    async def run(self):
+        while True:
+            try:
+                self.publicar()
+            except Exception as e:
+                print(f"[ranking global] falha ao publicar: {e}")
+            await asyncio.sleep(self.intervalo)
@@ -0,0 +1,126 @@
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional (pip install numpy / extra "sim")
+    np = None
+
+# Tudo aqui recebe só dados simples (listas/dicts) e devolve dicts, para
+# poder rodar num ProcessPoolExecutor sem importar o bot.
+
+Z95 = 1.959963984540054
+
+
+def _ic_proporcao(k: int, n: int):
+    # intervalo de Wilson 95%
+    if n == 0:
+        return 0.0, 0.0, 0.0
+    p = k / n
+    den = 1 + Z95 ** 2 / n
+    centro = (p + Z95 ** 2 / (2 * n)) / den
+    meia = Z95 * math.sqrt(p * (1 - p) / n + Z95 ** 2 / (4 * n * n)) / den
+    return p, centro - meia, centro + meia
+
+
+def _ic_media(amostras):
+    media = float(amostras.mean())
+    erro = float(amostras.std(ddof=1)) / math.sqrt(len(amostras)) if len(amostras) > 1 else 0.0
+    return media, media - Z95 * erro, media + Z95 * erro
+
+
+def simular_drops(ids, probs, raridades, tentativas: int, seed=None):
+    # Uma multinomial com n = tentativas é exatamente a contagem de
+    # "tentativas" sorteios independentes, sem laço em Python.
+    rng = np.random.default_rng(seed)
+    probs = np.asarray(probs, dtype=float)
+    contagens = rng.multinomial(tentativas, probs / probs.sum())
+
+    por_carta = {}
+    por_raridade = {}
+    for card_id, rar, k, p in zip(ids, raridades, contagens.tolist(), probs):
+        freq, lo, hi = _ic_proporcao(k, tentativas)
+        por_carta[card_id] = {"qtd": k, "freq": freq, "ic": (lo, hi), "esperado": float(p)}
+        por_raridade[rar] = por_raridade.get(rar, 0) + k
+    por_raridade = {
+        rar: dict(zip(("freq", "lo", "hi"), _ic_proporcao(k, tentativas)), qtd=k)
+        for rar, k in por_raridade.items()
+    }
+    return {"por_carta": por_carta, "por_raridade": por_raridade}
+
+
+def simular_completar_raridade(prob_raridade: float, n_cartas: int, jogadores: int, seed=None):
+    # Dentro de uma raridade todas as cartas têm o mesmo peso, então:
+    #   K = sorteios da raridade até ter todas = soma de geométricas
+    #       (colecionador de figurinhas com n_cartas cupons)
+    #   packs = K + falhas até K sucessos com prob. prob_raridade
+    # Tudo vetorizado por jogador.
+    rng = np.random.default_rng(seed)
+    restantes = np.arange(n_cartas, 0, -1) / n_cartas
+    k = rng.geometric(restantes, size=(jogadores, n_cartas)).sum(axis=1)
+    packs = k + rng.negative_binomial(k, prob_raridade)
+    media, lo, hi = _ic_media(packs)
+    # valor exato para conferência
+    exato = n_cartas * sum(1 / i for i in range(1, n_cartas + 1)) / prob_raridade
+    return {
+        "media": media,
+        "ic": (lo, hi),
+        "p50": float(np.median(packs)),
+        "p95": float(np.percentile(packs, 95)),
+        "exato": exato,
+    }
+
+
+def simular_fusao(prob_sucesso: float, custo: int, recompensa_duplicata: int,
+                  fracao_possuida: float, fusoes: int, seed=None):
+    # Segue a regra do comando: falha destrói as 2 cartas; sucesso com
+    # carta repetida devolve as 2 e paga a recompensa; sucesso com carta
+    # nova troca as 2 pela nova.
+    rng = np.random.default_rng(seed)
+    sucesso = rng.random(fusoes) < prob_sucesso
+    duplicata = sucesso & (rng.random(fusoes) < fracao_possuida)
+    moedas = -custo + duplicata * recompensa_duplicata
+    perdidas = np.where(duplicata, 0, 2)
+    nova = sucesso & ~duplicata
+
+    media_moedas, lo_m, hi_m = _ic_media(moedas.astype(float))
+    taxa, lo_n, hi_n = _ic_proporcao(int(nova.sum()), fusoes)
+    return {
+        "moedas": media_moedas,
+        "moedas_ic": (lo_m, hi_m),
+        "cartas_perdidas": float(perdidas.mean()),
+        "carta_nova": taxa,
+        "carta_nova_ic": (lo_n, hi_n),
+        "moedas_exato": -custo + prob_sucesso * fracao_possuida * recompensa_duplicata,
+    }
+
+
+def relatorio(params: dict, tentativas: int, seed=None):
+    # Ponto de entrada do !testdrop (roda no processo separado).
+    inicio = time.perf_counter()
+    drops = simular_drops(
+        params["ids"], params["probs"], params["raridades"], tentativas, seed
+    )
+
+    jogadores = min(max(tentativas // 100, 1000), 200_000)
+    completar = {}
+    for rar, n_cartas in params["cartas_por_raridade"].items():
+        prob_rar = sum(p for p, r in zip(params["probs"], params["raridades"]) if r == rar)
+        completar[rar] = simular_completar_raridade(prob_rar, n_cartas, jogadores, seed)
+
+    fusoes = {}
+    for rar, prob in params["prob_fusao"].items():
+        fusoes[rar] = {
+            f: simular_fusao(prob, params["custo_fusao"], params["recompensa_duplicata"],
+                             f, jogadores, seed)
+            for f in (0.0, 0.5, 1.0)
+        }
+
+    return {
+        "tentativas": tentativas,
+        "jogadores": jogadores,
+        "drops": drops,
+        "completar": completar,
+        "fusoes": fusoes,
+        "segundos": time.perf_counter() - inicio,
+    }
@@ -0,0 +1,1493 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import heapq
+import json
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, só o backend de um processo
+    fcntl = None
+
+import metrics
+from leaderboard import Leaderboard
+
+
+def _load_json(path: Path):
+    if not path.exists():
+        return {}
+    # Arquivo corrompido não pode virar "{}": isso zeraria a economia de
+    # todo mundo no próximo flush. Melhor falhar na inicialização.
+    with metrics.STORAGE_SEGUNDOS.time(backend="json", op="load"):
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _atomic_write(path: Path, data, backend: str = "json", indent=None):
+    # json.dump em pedaços em vez de um dumps() gigante: roda na thread de
+    # I/O e assim solta o GIL no meio, sem travar o loop por centenas de ms
+    with metrics.STORAGE_SEGUNDOS.time(backend=backend, op="write"):
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8", buffering=1 << 20) as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        tamanho = tmp.stat().st_size
+        os.replace(tmp, path)
+    metrics.STORAGE_BYTES.inc(tamanho, backend=backend, target=path.name)
+
+
+def _save_json(path: Path, data):
+    _atomic_write(path, data, indent=2)
+
+
+# ---------------------------------------------------------
+# I/O FORA DO EVENT LOOP
+# ---------------------------------------------------------
+class IOWorker:
+    # Uma thread por store faz todo o I/O de arquivo, na ordem de chegada,
+    # então as gravações de um mesmo arquivo nunca se cruzam. Enquanto um
+    # trabalho ainda está na fila:
+    #   - submit() com a mesma chave troca os argumentos pelos mais novos
+    #     (duas gravações do mesmo arquivo viram uma só);
+    #   - append() junta itens no último trabalho da fila, se for da mesma
+    #     chave (várias linhas do diário viram um write e um fsync).
+    # Os dois devolvem um concurrent.futures.Future; no loop, basta
+    # "await asyncio.wrap_future(fut)".
+
+    def __init__(self, nome: str = "storage-io"):
+        self._fila = deque()
+        self._por_chave = {}
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=nome, daemon=True)
+        self._thread.start()
+
+    def submit(self, chave, fn, *args) -> concurrent.futures.Future:
+        with self._cond:
+            job = self._por_chave.get(chave) if chave is not None else None
+            if job is not None:
+                job["args"] = args
+                return job["futuro"]
+            job = {"chave": chave, "fn": fn, "args": args, "futuro": concurrent.futures.Future()}
+            self._enfileirar(job)
+            return job["futuro"]
+
+    def append(self, chave, item, fn) -> concurrent.futures.Future:
+        # fn(itens) roda uma vez para todos os itens juntados
+        with self._cond:
+            if self._fila and self._fila[-1].get("lote") and self._fila[-1]["chave"] == chave:
+                job = self._fila[-1]
+                job["args"][0].append(item)
+                return job["futuro"]
+            job = {"chave": chave, "fn": fn, "args": ([item],), "futuro": concurrent.futures.Future(),
+                   "lote": True}
+            self._enfileirar(job)
+            return job["futuro"]
+
+    def barrier(self) -> concurrent.futures.Future:
+        # resolve quando tudo o que já estava na fila terminou
+        return self.submit(None, lambda: None)
+
+    def wait(self):
+        self.barrier().result()
+
+    def _enfileirar(self, job):
+        if job["chave"] is not None and not job.get("lote"):
+            self._por_chave[job["chave"]] = job
+        self._fila.append(job)
+        metrics.STORAGE_FILA.set(len(self._fila))
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._fila:
+                    self._cond.wait()
+                job = self._fila.popleft()
+                if self._por_chave.get(job["chave"]) is job:
+                    del self._por_chave[job["chave"]]
+                metrics.STORAGE_FILA.set(len(self._fila))
+            futuro = job["futuro"]
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                futuro.set_result(job["fn"](*job["args"]))
+            except BaseException as e:
+                futuro.set_exception(e)
+
+
+def _no_loop(loop, fn, *args):
+    # devolve um resultado da thread de I/O para o loop (sem loop, roda aqui)
+    if loop is not None:
+        try:
+            loop.call_soon_threadsafe(fn, *args)
+            return
+        except RuntimeError:
+            pass  # loop já fechado
+    fn(*args)
+
+
+def _loop_atual():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+# ---------------------------------------------------------
+# MUTAÇÕES
+# ---------------------------------------------------------
+# Toda alteração é um registro [op, tabela, chave, valor]. O mesmo registro
+# é aplicado na memória e, no modo journal, anexado ao diário em disco.
+# Inventários são {card_id: quantidade}; "card+"/"card-" mexem numa cópia.
+
+def _migrate_inventories(inventarios: dict, resolve_card):
+    # Formato antigo: lista de dicts completos (nome, imagem, ataque...).
+    # Devolve registros "set" com o inventário novo de cada usuário.
+    records = []
+    for uid, user_cards in inventarios.items():
+        if not isinstance(user_cards, list):
+            continue
+        inv = {}
+        for entry in user_cards:
+            card_id = resolve_card(entry)
+            if card_id is None:
+                print(f"[storage] carta fora do catálogo descartada ({uid}): {entry.get('nome')}")
+                continue
+            inv[str(card_id)] = inv.get(str(card_id), 0) + 1
+        records.append(("set", "cards", uid, inv))
+    return records
+
+
+def _apply_record(tables: dict, rec):
+    op, nome, key, value = rec
+    data = tables[nome]
+    if op == "incr":
+        data[key] = int(data.get(key, 0)) + int(value)
+    elif op == "set":
+        data[key] = value
+    elif op == "del":
+        data.pop(key, None)
+    elif op == "card+":
+        inv = data.setdefault(key, {})
+        inv[str(value)] = inv.get(str(value), 0) + 1
+    elif op == "card-":
+        inv = data.get(key, {})
+        if inv.get(str(value), 0) <= 0:
+            raise ValueError(f"carta {value} não está no inventário de {key}")
+        inv[str(value)] -= 1
+        if not inv[str(value)]:
+            del inv[str(value)]
+    elif op == "join":
+        gid, uid = key
+        data.setdefault(gid, {})[uid] = value
+    elif op == "join-":
+        gid, uid = key
+        if uid is None:
+            data.pop(gid, None)
+        else:
+            users = data.get(gid, {})
+            users.pop(uid, None)
+            if not users:
+                data.pop(gid, None)
+    else:
+        raise ValueError(f"operação desconhecida: {op}")
+
+
+class ConflitoDeVersao(Exception):
+    # outro processo mudou algo que a transação leu (ver BaseStore.atomic)
+    pass
+
+
+class BaseStore:
+    # Operações comuns a todos os backends; cada um implementa get(),
+    # cards(), card_count(), top(), rank(), table() e apply(records).
+
+    _locks = None
+    _versions = None
+    _listeners = ()
+
+    def inventory_version(self, user_id: str) -> int:
+        # Muda sempre que o inventário do usuário muda (só neste processo);
+        # serve de chave para caches derivados do inventário.
+        return self._versions.get(user_id, 0) if self._versions else 0
+
+    def _bump_versions(self, records):
+        for op, nome, key, _ in records:
+            if nome == "cards":
+                if self._versions is None:
+                    self._versions = {}
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def subscribe(self, callback):
+        # callback(records) depois de cada apply() bem-sucedido; usado por
+        # caches que se mantêm a partir das mutações (ex.: resumos de coleção)
+        self._listeners = tuple(self._listeners) + (callback,)
+
+    def _notify(self, records):
+        for callback in self._listeners:
+            try:
+                callback(records)
+            except Exception as e:
+                print(f"[storage] falha em listener: {e}")
+
+    # ----- persistência -----
+    # apply() muda a memória na hora e devolve o Future da gravação na
+    # thread de I/O (ou None quando não há o que esperar). commit() e
+    # aflush() esperam sem segurar o loop; flush() bloqueia (scripts, testes).
+    async def commit(self, records, lidos=None):
+        # "lidos" só importa para quem divide os dados com outros processos
+        futuro = self.apply(records)
+        if futuro is not None:
+            await asyncio.wrap_future(futuro)
+
+    def apply_fresh(self, build):
+        # build() -> registros, montados a partir do estado mais novo. Para
+        # tarefas em segundo plano que decidem pela memória (recompensas,
+        # expirações): no shared, build() roda depois de ler o diário dos
+        # outros processos e com a trava, então ninguém grava no meio.
+        records = build()
+        if records:
+            self.apply(records)
+        return records
+
+    def flush(self):
+        self._agendar_flush().result()
+
+    async def aflush(self):
+        await asyncio.wrap_future(self._agendar_flush())
+
+    def set(self, nome: str, key: str, value):
+        self.apply([("set", nome, key, value)])
+
+    def incr(self, nome: str, key: str, amount) -> int:
+        self.apply([("incr", nome, key, int(amount))])
+        return self.get(nome, key)
+
+    def delete(self, nome: str, key: str):
+        self.apply([("del", nome, key, None)])
+
+    # ----- inventários -----
+    # O inventário {card_id: quantidade} é o próprio índice de posse:
+    # "card+"/"card-" o mantêm em dia, então owns() é O(1).
+    def owns(self, user_id: str, card_id) -> bool:
+        return self.card_count(user_id, card_id) > 0
+
+    def add_card(self, user_id: str, card_id: int):
+        self.apply([("card+", "cards", user_id, int(card_id))])
+
+    def remove_cards(self, user_id: str, card_ids):
+        self.apply([("card-", "cards", user_id, int(cid)) for cid in card_ids])
+
+    def _migrate_cards(self, resolve_card):
+        if resolve_card is None:
+            return
+        records = _migrate_inventories(self.table("cards"), resolve_card)
+        if records:
+            backup = self.files["cards"].with_name("cards.legacy.json")
+            if self.files["cards"].exists() and not backup.exists():
+                shutil.copy(self.files["cards"], backup)
+            self.apply(records)
+            print(f"[storage] {len(records)} inventários migrados para ids do catálogo")
+
+    # ----- horários de entrada (por servidor) -----
+    def set_join(self, guild_id: str, user_id: str, ts: float):
+        self.apply([("join", "join_times", [guild_id, user_id], ts)])
+
+    def remove_join(self, guild_id: str, user_id: str = None):
+        self.apply([("join-", "join_times", [guild_id, user_id], None)])
+
+    # ----- transações -----
+    # Backends com versionado=True dão a cada registro a versão da última
+    # escrita (versao()). A transação anota a versão de tudo o que leu e o
+    # commit só grava se nada mudou desde então; senão levanta
+    # ConflitoDeVersao e atomic() roda o bloco de novo.
+    versionado = False
+
+    def versao(self, nome: str, key) -> int:
+        return 0
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        if self._locks is None:
+            self._locks = weakref.WeakValueDictionary()
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, *user_ids):
+        # Trava os usuários envolvidos sempre na mesma ordem (evita deadlock
+        # entre dois duelos cruzados) e grava tudo num único apply() no fim.
+        # Se o bloco levantar exceção, nada é aplicado.
+        locks = [self._lock(uid) for uid in sorted(set(user_ids))]
+        async with contextlib.AsyncExitStack() as stack:
+            for lock in locks:
+                await stack.enter_async_context(lock)
+            self._antes_da_transacao()
+            tx = Transaction(self)
+            yield tx
+            if tx.records:
+                await self.commit(tx.records, tx.lidos)
+
+    def _antes_da_transacao(self):
+        pass
+
+    async def atomic(self, fn, *user_ids, tentativas: int = 20):
+        # fn(tx) dentro de transaction(); refeita do zero a cada conflito.
+        # Devolve o que fn devolver.
+        for tentativa in range(tentativas):
+            try:
+                async with self.transaction(*user_ids) as tx:
+                    resultado = fn(tx)
+                return resultado
+            except ConflitoDeVersao:
+                metrics.STORAGE_CONFLITOS.inc(backend=self.backend)
+                if tentativa == tentativas - 1:
+                    raise
+                await asyncio.sleep(random.uniform(0, 0.001 * 2 ** min(tentativa, 5)))
+
+
+class Transaction:
+    # Mesma interface de leitura/escrita do store, mas as mutações ficam
+    # acumuladas aqui (e visíveis para as leituras da própria transação)
+    # até o commit. Cartas são guardadas como deltas por (usuário, carta),
+    # então checar posse não copia o inventário inteiro.
+
+    def __init__(self, store: BaseStore):
+        self.store = store
+        self.records = []
+        self._values = {}
+        self._card_deltas = {}
+        self.lidos = {} if store.versionado else None  # (tabela, chave) -> versão
+
+    _APAGADO = object()
+
+    def _ler(self, nome: str, key):
+        if self.lidos is not None and (nome, key) not in self.lidos:
+            self.lidos[(nome, key)] = self.store.versao(nome, key)
+
+    def get(self, nome: str, key: str, default=0):
+        if (nome, key) in self._values:
+            value = self._values[(nome, key)]
+            return default if value is self._APAGADO else value
+        self._ler(nome, key)
+        return self.store.get(nome, key, default)
+
+    def set(self, nome: str, key: str, value):
+        self._values[(nome, key)] = value
+        self.records.append(("set", nome, key, value))
+
+    def delete(self, nome: str, key: str):
+        self._values[(nome, key)] = self._APAGADO
+        self.records.append(("del", nome, key, None))
+
+    def incr(self, nome: str, key: str, amount) -> int:
+        value = int(self.get(nome, key, 0)) + int(amount)
+        self._values[(nome, key)] = value
+        self.records.append(("incr", nome, key, int(amount)))
+        return value
+
+    def card_count(self, user_id: str, card_id) -> int:
+        delta = self._card_deltas.get((user_id, str(card_id)), 0)
+        self._ler("cards", user_id)
+        return self.store.card_count(user_id, card_id) + delta
+
+    def owns(self, user_id: str, card_id) -> bool:
+        return self.card_count(user_id, card_id) > 0
+
+    def cards(self, user_id: str) -> dict:
+        self._ler("cards", user_id)
+        inv = dict(self.store.cards(user_id))
+        for (uid, cid), delta in self._card_deltas.items():
+            if uid != user_id or not delta:
+                continue
+            inv[cid] = inv.get(cid, 0) + delta
+            if not inv[cid]:
+                del inv[cid]
+        return inv
+
+    def add_card(self, user_id: str, card_id: int):
+        key = (user_id, str(card_id))
+        self._card_deltas[key] = self._card_deltas.get(key, 0) + 1
+        self.records.append(("card+", "cards", user_id, int(card_id)))
+
+    def remove_cards(self, user_id: str, card_ids):
+        for cid in card_ids:
+            if self.card_count(user_id, cid) <= 0:
+                raise ValueError(f"carta {cid} não está no inventário de {user_id}")
+            key = (user_id, str(cid))
+            self._card_deltas[key] = self._card_deltas.get(key, 0) - 1
+            self.records.append(("card-", "cards", user_id, int(cid)))
+
+
+class JsonStore(BaseStore):
+    # Carrega cada arquivo uma vez e serve as leituras da memória.
+    # As escritas só marcam a tabela como suja; um timer agrupa tudo
+    # que mudou dentro do intervalo em uma única gravação por arquivo,
+    # feita na thread de I/O a partir de uma cópia rasa da tabela.
+
+    backend = "json"
+
+    def __init__(self, files: dict, flush_interval: float = 5.0, resolve_card=None, io=None):
+        self.files = dict(files)
+        self.flush_interval = flush_interval
+        self.tables = {nome: _load_json(path) for nome, path in self.files.items()}
+        self.dirty = set()
+        self._timer = None
+        self._iniciar_io(io)
+        self._build_leaderboards()
+        self._migrate_cards(resolve_card)
+
+    def table(self, nome: str) -> dict:
+        return self.tables[nome]
+
+    def get(self, nome: str, key: str, default=0):
+        return self.tables[nome].get(key, default)
+
+    def apply(self, records):
+        records = [list(rec) for rec in records]
+        with metrics.STORAGE_SEGUNDOS.time(backend=self.backend, op="apply"):
+            self._aplicar(records)
+            futuro = self._persist(records)
+        self._notify(records)
+        return futuro
+
+    def _aplicar(self, records):
+        # só a memória (tabelas e rankings); a gravação fica com _persist()
+        for rec in records:
+            if self._cow:
+                self._privatizar(rec)
+            _apply_record(self.tables, rec)
+        self._bump_versions(records)
+        self._update_leaderboards(records)
+
+    # ----- cópias para a thread de I/O -----
+    # Gravar a partir de dict(tabela) custa só a cópia das chaves, mas os
+    # dicts internos (inventários, servidores de join_times) continuam
+    # compartilhados e "card+"/"join" os alteram no lugar. Enquanto a
+    # gravação não termina, o apply() copia o dict interno antes da
+    # primeira mudança (copy-on-write), e o que está sendo gravado fica
+    # congelado.
+    _MUDAM_NO_LUGAR = {"card+", "card-", "join", "join-"}
+
+    def _iniciar_io(self, io=None):
+        # várias lojas podem dividir uma thread (economia por servidor)
+        self.io = io or IOWorker(f"storage-{self.backend}")
+        self._cow = {}  # tabela -> (geração, chaves já copiadas)
+        self._geracao = 0
+
+    def _congelar(self, nomes):
+        self._geracao += 1
+        copias = {}
+        for nome in nomes:
+            copias[nome] = dict(self.tables[nome])
+            self._cow[nome] = (self._geracao, set())
+        return self._geracao, copias
+
+    def _liberar(self, nomes, geracao: int):
+        # só a gravação mais nova libera; as anteriores já terminaram (a fila é FIFO)
+        for nome in nomes:
+            if self._cow.get(nome, (None,))[0] == geracao:
+                del self._cow[nome]
+
+    def _privatizar(self, rec):
+        op, nome, key, _ = rec
+        estado = self._cow.get(nome)
+        if estado is None or op not in self._MUDAM_NO_LUGAR:
+            return
+        chave = key[0] if op in ("join", "join-") else key
+        if chave in estado[1]:
+            return
+        estado[1].add(chave)
+        interno = self.tables[nome].get(chave)
+        if isinstance(interno, dict):
+            self.tables[nome][chave] = dict(interno)
+
+    # ----- rankings -----
+    # Mantidos a cada apply(), então top() e rank() não ordenam a tabela.
+    RANKED = ("wins", "spent")
+
+    def _build_leaderboards(self):
+        self.leaderboards = {nome: Leaderboard(self.tables[nome]) for nome in self.RANKED}
+
+    def _update_leaderboards(self, records):
+        mudadas = {}
+        for _, nome, key, _ in records:
+            if nome in self.leaderboards:
+                mudadas.setdefault(nome, set()).add(key)
+        for nome, keys in mudadas.items():
+            board = self.leaderboards[nome]
+            if len(keys) > 1024 and len(keys) > len(board) // 8:
+                # carga em massa: reordenar tudo sai mais barato que um insort por chave
+                self.leaderboards[nome] = Leaderboard(self.tables[nome])
+                continue
+            for key in keys:
+                board.update(key, self.tables[nome].get(key, 0))
+
+    def top(self, nome: str, n: int = 10):
+        if nome in self.leaderboards:
+            return self.leaderboards[nome].top(n)
+        return heapq.nlargest(n, self.tables[nome].items(), key=lambda x: x[1])
+
+    def rank(self, nome: str, user_id: str):
+        return self.leaderboards[nome].rank(user_id)
+
+    def cards(self, user_id: str) -> dict:
+        return self.tables["cards"].get(user_id, {})
+
+    def card_count(self, user_id: str, card_id) -> int:
+        return self.tables["cards"].get(user_id, {}).get(str(card_id), 0)
+
+    # ----- persistência -----
+    def _persist(self, records):
+        for rec in records:
+            self.mark_dirty(rec[1])
+        return None  # a gravação é agrupada pelo timer; não há o que esperar
+
+    def mark_dirty(self, nome: str):
+        self.dirty.add(nome)
+        if self._timer is not None:
+            return
+        loop = _loop_atual()
+        if loop is None:
+            return  # sem loop (scripts): grava no flush() explícito
+        self._timer = loop.call_later(self.flush_interval, self._agendar_flush)
+
+    def _agendar_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pendentes, self.dirty = self.dirty, set()
+        loop = _loop_atual()
+        for nome in pendentes:
+            geracao, copias = self._congelar([nome])
+            # chave por arquivo: uma gravação ainda na fila recebe a cópia mais nova
+            self.io.submit(("json", str(self.files[nome])), self._gravar, nome, copias[nome], geracao, loop)
+        return self.io.barrier()
+
+    def _gravar(self, nome: str, copia: dict, geracao: int, loop):
+        # roda na thread de I/O
+        falhou = False
+        try:
+            _save_json(self.files[nome], copia)
+        except Exception as e:
+            print(f"[storage] falha ao gravar {self.files[nome]}: {e}")
+            falhou = True
+        _no_loop(loop, self._gravado, nome, geracao, falhou)
+
+    def _gravado(self, nome: str, geracao: int, falhou: bool):
+        self._liberar([nome], geracao)
+        if falhou:
+            self.mark_dirty(nome)
+
+
+class JournalStore(JsonStore):
+    # Cada apply() vira uma linha no diário (economy.journal), então um
+    # comando custa um append pequeno em vez de reescrever o arquivo todo.
+    # De tempos em tempos o estado é compactado em economy.snapshot.json
+    # (tmp + fsync + rename) e o diário recomeça do zero.
+    #
+    # Na inicialização: snapshot + replay das linhas com seq maior que a
+    # do snapshot. Uma linha truncada (crash no meio do append) é
+    # descartada inteira, então um lote de registros nunca fica pela metade.
+    #
+    # O arquivo do diário só é tocado pela thread de I/O: appends que
+    # chegam juntos viram um único write (e um fsync), e a compactação
+    # entra na mesma fila, então nenhuma linha cai do lado errado do corte.
+
+    backend = "journal"
+
+    def __init__(self, files: dict, data_dir: Path, flush_interval: float = 5.0,
+                 compact_every: int = 1000, fsync: bool = False, resolve_card=None, io=None):
+        self.files = dict(files)
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.dirty = set()
+        self._timer = None
+        self._compacting = None
+        self._iniciar_io(io)
+
+        self.snapshot_path = Path(data_dir) / "economy.snapshot.json"
+        self.journal_path = Path(data_dir) / "economy.journal"
+        self.old_journal_path = Path(data_dir) / "economy.journal.old"
+
+        self.seq, self.tables, self.pending = self._carregar()
+        self._abrir_diario()
+        self._build_leaderboards()
+        self._migrate_cards(resolve_card)
+
+    def _carregar(self):
+        # snapshot + as linhas dos diários depois dele: (seq, tabelas, linhas)
+        if self.snapshot_path.exists():
+            snap = _load_json(self.snapshot_path)
+            seq = int(snap.get("seq", 0))
+            tabelas = {nome: snap["tables"].get(nome, {}) for nome in self.files}
+        else:
+            # primeira execução: parte dos arquivos JSON antigos
+            seq = 0
+            tabelas = {nome: _load_json(path) for nome, path in self.files.items()}
+        linhas = 0
+        for path in (self.old_journal_path, self.journal_path):
+            seq, n = self._replay(path, tabelas, seq)
+            linhas += n
+        return seq, tabelas, linhas
+
+    def _abrir_diario(self):
+        self._journal = self.journal_path.open("a", encoding="utf-8")
+        if self._journal.tell() and not self._ends_with_newline():
+            self._journal.write("\n")  # isola a linha truncada
+
+    def _ends_with_newline(self) -> bool:
+        with self.journal_path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _replay(self, path: Path, tabelas: dict, seq: int):
+        linhas = 0
+        if not path.exists():
+            return seq, linhas
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # linha truncada por crash no meio do append
+                if entry["seq"] <= seq:
+                    continue
+                for rec in entry["ops"]:
+                    _apply_record(tabelas, rec)
+                seq = entry["seq"]
+                linhas += 1
+        return seq, linhas
+
+    def _persist(self, records):
+        if not records:
+            return None
+        self.seq += 1
+        line = json.dumps({"seq": self.seq, "ops": records}, ensure_ascii=False) + "\n"
+        futuro = self.io.append(("journal", str(self.journal_path)), line, self._escrever_diario)
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+        elif self._timer is None:
+            loop = _loop_atual()
+            if loop is not None:
+                self._timer = loop.call_later(self.flush_interval, self._agendar_sync)
+        return futuro
+
+    def _escrever_diario(self, linhas):
+        # roda na thread de I/O, com todas as linhas que se juntaram na fila
+        dados = "".join(linhas)
+        try:
+            with metrics.STORAGE_SEGUNDOS.time(backend="journal", op="append"):
+                self._journal.write(dados)
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+        except Exception as e:
+            print(f"[storage] falha ao gravar o diário: {e}")
+            raise
+        metrics.STORAGE_BYTES.inc(len(dados.encode("utf-8")), backend="journal", target=self.journal_path.name)
+
+    def _agendar_sync(self):
+        self._timer = None
+        self.io.submit(("sync", str(self.journal_path)), self._sync)
+
+    def _sync(self):
+        try:
+            os.fsync(self._journal.fileno())
+        except Exception as e:
+            print(f"[storage] falha no fsync do diário: {e}")
+
+    def _rotate(self):
+        # Começa um diário novo. O antigo só é apagado depois que o
+        # snapshot estiver seguro no disco.
+        self._journal.close()
+        if self.old_journal_path.exists():
+            # compactação anterior falhou: mantém os dois trechos
+            with self.old_journal_path.open("a", encoding="utf-8") as dst, \
+                    self.journal_path.open("r", encoding="utf-8") as src:
+                shutil.copyfileobj(src, dst)
+            self.journal_path.unlink()
+        else:
+            os.replace(self.journal_path, self.old_journal_path)
+        self._journal = self.journal_path.open("a", encoding="utf-8")
+
+    def _write_snapshot(self, estado: dict):
+        _atomic_write(self.snapshot_path, estado, backend="journal")
+        self.old_journal_path.unlink(missing_ok=True)
+
+    def _compactar(self, seq: int, copias: dict, geracao: int, loop):
+        # roda na thread de I/O; as linhas até "seq" já foram escritas (FIFO)
+        try:
+            self._rotate()
+            self._write_snapshot({"seq": seq, "tables": copias})
+        finally:
+            _no_loop(loop, self._liberar, list(copias), geracao)
+
+    def compact(self, forcar: bool = False):
+        if not forcar and self._compacting is not None and not self._compacting.done():
+            return  # a compactação anterior ainda está gravando
+        loop = _loop_atual()
+        geracao, copias = self._congelar(self.files)
+        self.pending = 0
+        started = time.perf_counter()
+
+        def done(fut):
+            if fut.exception() is not None:
+                print(f"[storage] falha ao compactar: {fut.exception()}")
+            elif time.perf_counter() - started > 1:
+                print(f"[storage] compactação levou {time.perf_counter() - started:.1f}s")
+
+        self._compacting = self.io.submit(None, self._compactar, self.seq, copias, geracao, loop)
+        self._compacting.add_done_callback(done)
+        if loop is None:
+            concurrent.futures.wait([self._compacting])  # scripts: termina antes de voltar
+
+    def _agendar_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.pending:
+            self.compact(forcar=True)
+        return self.io.barrier()
+
+
+class SharedJournalStore(JournalStore):
+    # O diário do JournalStore dividido entre processos que usam o mesmo
+    # DATA_DIR (reinício sem parada, scripts ao lado do bot). O diário é a
+    # fonte da verdade: cada processo tem a sua memória e aplica o que os
+    # outros anexaram ("acompanhar") antes de cada transação, de cada
+    # escrita e a cada acompanhar_a_cada segundos.
+    #
+    # Escrever é: flock em economy.journal.lock, acompanhar, conferir as
+    # versões lidas pela transação (CAS), aplicar, anexar a linha e soltar.
+    # O grosso da leitura das linhas alheias é feito antes de travar, então
+    # a trava dura o tempo de um write() (mais o fsync, com JOURNAL_FSYNC=1).
+    #
+    # A versão de um registro é o seq da última linha que o mudou. Quem
+    # anexa está em dia com o diário e usa o seq seguinte, então o seq é
+    # global e uma lacuna nele quer dizer que este processo perdeu linhas
+    # (ficou para trás de duas compactações): aí relê tudo do snapshot.
+    # Cada diário novo começa com um cabeçalho {"seq", "rotacao"} para a
+    # lacuna aparecer mesmo que ninguém mais escreva.
+    #
+    # A compactação gira o diário sob as duas travas e grava o snapshot
+    # fora da principal, segurando só economy.snapshot.lock até apagar o
+    # economy.journal.old. Quem abre o store segura essa trava (em modo
+    # compartilhado) enquanto carrega, para não pegar o snapshot novo com
+    # o .old já apagado.
+
+    backend = "shared"
+    versionado = True
+
+    def __init__(self, files: dict, data_dir: Path, flush_interval: float = 5.0,
+                 compact_every: int = 1000, fsync: bool = False, resolve_card=None, io=None,
+                 acompanhar_a_cada: float = 1.0):
+        if fcntl is None:
+            raise RuntimeError("STORAGE_BACKEND=shared precisa de flock (fcntl), que este sistema não tem")
+        self._trava = (Path(data_dir) / "economy.journal.lock").open("a")
+        self._trava_snapshot = (Path(data_dir) / "economy.snapshot.lock").open("a")
+        self._travas = 0
+        self._com_snapshot = False
+        self._pronto = False
+        self._cauda_partida = False
+        self._escrito_em = {}  # (tabela, chave) -> seq da última escrita
+        self._piso = 0         # versão de quem já saiu de _escrito_em
+        self.acompanhar_a_cada = acompanhar_a_cada
+        self._timer_acompanhar = None
+        fcntl.flock(self._trava_snapshot, fcntl.LOCK_SH)
+        try:
+            with self._travado():
+                super().__init__(files, data_dir, flush_interval, compact_every, fsync, resolve_card, io)
+        finally:
+            fcntl.flock(self._trava_snapshot, fcntl.LOCK_UN)
+        self._pronto = True
+
+    def _abrir_diario(self):
+        super()._abrir_diario()
+        self._journal.flush()
+        self._leitor = self.journal_path.open("rb")
+        self._leitor.seek(0, os.SEEK_END)
+
+    # ----- trava entre processos -----
+    # Reentrante dentro do processo: apply() dentro de commit(), compact()
+    # dentro de _persist(). Nunca fica presa durante um await.
+    def _travar(self, bloquear: bool = True) -> bool:
+        if self._travas == 0:
+            try:
+                fcntl.flock(self._trava, fcntl.LOCK_EX | (0 if bloquear else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            self._travado_em = time.perf_counter()
+        self._travas += 1
+        return True
+
+    def _destravar(self):
+        self._travas -= 1
+        if self._travas == 0:
+            fcntl.flock(self._trava, fcntl.LOCK_UN)
+            metrics.STORAGE_SEGUNDOS.observe(time.perf_counter() - self._travado_em,
+                                             backend=self.backend, op="lock_hold")
+
+    @contextlib.contextmanager
+    def _travado(self):
+        inicio = time.perf_counter()
+        esperou = self._travas == 0
+        self._travar()
+        if esperou:
+            metrics.STORAGE_SEGUNDOS.observe(time.perf_counter() - inicio, backend=self.backend, op="lock_wait")
+        try:
+            yield
+        finally:
+            self._destravar()
+
+    async def _travar_async(self):
+        # sem bloquear o loop enquanto outro processo escreve
+        inicio = time.perf_counter()
+        espera = 0.0005
+        while not self._travar(bloquear=False):
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 0.02)
+        metrics.STORAGE_SEGUNDOS.observe(time.perf_counter() - inicio, backend=self.backend, op="lock_wait")
+
+    # ----- versões -----
+    def versao(self, nome: str, key) -> int:
+        return self._escrito_em.get((nome, key), self._piso)
+
+    def _marcar(self, records, seq: int):
+        for _, nome, key, _ in records:
+            self._escrito_em[(nome, tuple(key) if isinstance(key, list) else key)] = seq
+
+    # ----- escrita -----
+    def apply(self, records):
+        self._acompanhar()
+        with self._travado():
+            self._acompanhar()
+            futuro = super().apply(records)
+        self._talvez_compactar()
+        return futuro
+
+    def apply_fresh(self, build):
+        self._acompanhar()
+        with self._travado():
+            self._acompanhar()  # os listeners já puseram em dia o que build() lê
+            records = build()
+            if records:
+                self.apply(records)
+        self._talvez_compactar()
+        return records
+
+    async def commit(self, records, lidos=None):
+        self._acompanhar()
+        await self._travar_async()
+        try:
+            self._acompanhar()
+            if lidos:
+                for (nome, key), versao in lidos.items():
+                    if self.versao(nome, key) != versao:
+                        raise ConflitoDeVersao(f"{nome}/{key} mudou em outro processo")
+            super().apply(records)
+        finally:
+            self._destravar()
+        self._talvez_compactar()
+
+    def _antes_da_transacao(self):
+        if self._timer_acompanhar is None:
+            self._agendar_acompanhar()
+        self._acompanhar()
+
+    def get(self, nome: str, key: str, default=0):
+        if self._timer_acompanhar is None:
+            self._agendar_acompanhar()
+        return self.tables[nome].get(key, default)
+
+    def _persist(self, records):
+        # sempre sob a trava (apply/commit), já em dia com o diário
+        if not records:
+            return None
+        self.seq += 1
+        self._anexar(json.dumps({"seq": self.seq, "ops": records}, ensure_ascii=False) + "\n")
+        self._marcar(records, self.seq)
+        self.pending += 1
+        if not self.fsync and self._timer is None:
+            loop = _loop_atual()
+            if loop is not None:
+                self._timer = loop.call_later(self.flush_interval, self._agendar_sync)
+        return None  # já está no diário (e no disco, com fsync)
+
+    def _anexar(self, linha: str):
+        if os.fstat(self._journal.fileno()).st_ino != os.fstat(self._leitor.fileno()).st_ino:
+            self._reabrir_escritor()  # outro processo girou o diário
+        elif self._cauda_partida:
+            self._journal.write("\n")  # isola a linha de quem caiu no meio do append
+        self._cauda_partida = False
+        with metrics.STORAGE_SEGUNDOS.time(backend=self.backend, op="append"):
+            self._journal.write(linha)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+        metrics.STORAGE_BYTES.inc(len(linha.encode("utf-8")), backend=self.backend,
+                                  target=self.journal_path.name)
+        self._leitor.seek(0, os.SEEK_END)  # a própria linha não precisa ser relida
+
+    def _talvez_compactar(self):
+        # fora da trava: compact() pega a dela e copia as tabelas depois de soltar
+        if self.pending >= self.compact_every and self._travas == 0:
+            self.compact()
+
+    def _sync(self):
+        # pelo caminho: o loop pode ter trocado o arquivo do escritor (rotação)
+        try:
+            fd = os.open(self.journal_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[storage] falha no fsync do diário: {e}")
+
+    def _reabrir_escritor(self):
+        self._journal.close()
+        JournalStore._abrir_diario(self)
+
+    # ----- leitura do que os outros anexaram -----
+    def _agendar_acompanhar(self):
+        loop = _loop_atual()
+        if loop is not None:
+            self._timer_acompanhar = loop.call_later(self.acompanhar_a_cada, self._acompanhar_periodico)
+
+    def _acompanhar_periodico(self):
+        # mantém em dia as leituras fora de transação (!saldo, ranking...)
+        try:
+            self._acompanhar()
+        except Exception as e:
+            print(f"[storage] falha ao ler o diário compartilhado: {e}")
+        self._agendar_acompanhar()
+
+    def _acompanhar(self):
+        while True:
+            if not self._ler_linhas(self._leitor, final=False):
+                return
+            try:
+                atual = os.stat(self.journal_path).st_ino
+            except FileNotFoundError:
+                return  # outro processo no meio da rotação: fica para a próxima
+            lido = os.fstat(self._leitor.fileno()).st_ino
+            if atual == lido:
+                return
+            # Diário girado: ninguém mais escreve no antigo, então termina de
+            # lê-lo; se um .old de outra rotação ficou no caminho, ele vem antes.
+            if not self._ler_linhas(self._leitor, final=True):
+                return
+            try:
+                with self.old_journal_path.open("rb") as old:
+                    if os.fstat(old.fileno()).st_ino != lido and not self._ler_linhas(old, final=True):
+                        return
+            except FileNotFoundError:
+                pass
+            try:
+                novo = self.journal_path.open("rb")
+            except FileNotFoundError:
+                return
+            self._leitor.close()
+            self._leitor = novo
+            self.pending = 0
+
+    def _ler_linhas(self, f, final: bool) -> bool:
+        # False quando achou uma lacuna no seq (e recarregou tudo)
+        while True:
+            inicio = f.tell()
+            linha = f.readline()
+            if not linha:
+                return True
+            if not linha.endswith(b"\n"):
+                # no diário atual é um append ainda em andamento (ou de quem
+                # caiu no meio dele); quem for escrever sob a trava o isola
+                if not final:
+                    f.seek(inicio)
+                    self._cauda_partida = True
+                return True
+            self._cauda_partida = False
+            try:
+                entry = json.loads(linha)
+            except ValueError:
+                continue  # linha truncada, já isolada
+            seq = entry["seq"]
+            if entry.get("rotacao"):
+                # cabeçalho de um diário novo: ele continua depois de "seq"
+                if seq > self.seq:
+                    self._recarregar()
+                    return False
+                continue
+            if seq <= self.seq:
+                continue
+            if seq != self.seq + 1:
+                self._recarregar()
+                return False
+            ops = entry["ops"]
+            try:
+                self._aplicar(ops)
+            except ValueError as e:
+                print(f"[storage] linha {seq} do diário compartilhado não se aplica: {e}")
+            self._marcar(ops, seq)
+            self.seq = seq
+            self.pending += 1
+            self._notify(ops)
+
+    def _recarregar(self):
+        # Relê snapshot + diários e aplica só a diferença, como registros
+        # "set"/"del", para rankings e caches (subscribe) acompanharem.
+        print(f"[storage] {self.journal_path.parent}: linhas do diário perdidas, recarregando do snapshot")
+        dentro_de_compact = self._com_snapshot and (self._compacting is None or self._compacting.done())
+        if not dentro_de_compact:
+            # o snapshot que este processo está gravando segura a trava dele
+            if self._compacting is not None:
+                concurrent.futures.wait([self._compacting])
+            fcntl.flock(self._trava_snapshot, fcntl.LOCK_SH)
+        try:
+            with self._travado():
+                seq, tabelas, linhas = self._carregar()
+                records = []
+                for nome in self.files:
+                    antigas, novas = self.tables[nome], tabelas[nome]
+                    records.extend(["del", nome, key, None] for key in antigas.keys() - novas.keys())
+                    records.extend(["set", nome, key, valor] for key, valor in novas.items()
+                                   if antigas.get(key) != valor)
+                self._aplicar(records)
+                self._marcar(records, seq)
+                self.seq, self.pending = seq, linhas
+                self._reabrir_escritor()
+                self._leitor.close()
+                self._leitor = self.journal_path.open("rb")
+                self._leitor.seek(0, os.SEEK_END)
+                self._cauda_partida = False
+        finally:
+            if not dentro_de_compact:
+                fcntl.flock(self._trava_snapshot, fcntl.LOCK_UN)
+        self._notify(records)
+
+    # ----- compactação -----
+    def compact(self, forcar: bool = False):
+        # a rotação aqui é imediata (não entra na fila de I/O), então nunca
+        # começa outra antes do snapshot anterior terminar
+        if not self._pronto or (self._compacting is not None and not self._compacting.done()):
+            return
+        # a trava do snapshot só é tentada (nunca esperada) com a principal
+        # na mão; quem espera por ela (_recarregar) nunca a segura ao contrário
+        with self._travado():
+            try:
+                fcntl.flock(self._trava_snapshot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # outro processo está compactando (ou abrindo o store)
+            self._com_snapshot = True
+            try:
+                self._acompanhar()
+                seq = self.seq
+                self._rotate()
+                # quem ainda lia o diário antigo sabe onde este começa (e
+                # se perdeu um do meio); o replay normal o pula pelo seq
+                self._journal.write(json.dumps({"seq": seq, "ops": [], "rotacao": True}) + "\n")
+                self._journal.flush()
+                self._leitor.close()
+                self._leitor = self.journal_path.open("rb")
+                self._leitor.seek(0, os.SEEK_END)
+                self._cauda_partida = False
+                self.pending = 0
+                self._escrito_em.clear()
+                self._piso = seq
+            except BaseException:
+                self._com_snapshot = False
+                fcntl.flock(self._trava_snapshot, fcntl.LOCK_UN)
+                raise
+        # Nada foi aplicado desde o acompanhar (não houve await), então a
+        # memória ainda é o estado em "seq" e a cópia sai sem a trava.
+        geracao, copias = self._congelar(self.files)
+        loop = _loop_atual()
+        started = time.perf_counter()
+
+        def done(fut):
+            if fut.exception() is not None:
+                print(f"[storage] falha ao compactar: {fut.exception()}")
+            elif time.perf_counter() - started > 1:
+                print(f"[storage] compactação levou {time.perf_counter() - started:.1f}s")
+
+        self._compacting = self.io.submit(None, self._gravar_snapshot, seq, copias, geracao, loop)
+        self._compacting.add_done_callback(done)
+        if loop is None:
+            concurrent.futures.wait([self._compacting])
+
+    def _gravar_snapshot(self, seq: int, copias: dict, geracao: int, loop):
+        # roda na thread de I/O; a trava do snapshot vai até o .old sumir
+        try:
+            self._write_snapshot({"seq": seq, "tables": copias})
+        finally:
+            self._com_snapshot = False
+            fcntl.flock(self._trava_snapshot, fcntl.LOCK_UN)
+            _no_loop(loop, self._liberar, list(copias), geracao)
+
+    def _agendar_flush(self):
+        # a compactação pode ficar com outro processo: o fsync garante o diário
+        self.io.submit(("sync", str(self.journal_path)), self._sync)
+        return super()._agendar_flush()
+
+
+class SqliteStore(BaseStore):
+    # Mesma API do JsonStore, mas cada apply() é uma transação no SQLite
+    # (modo WAL). Contadores ficam em colunas de "users" com índices para
+    # os rankings, e o inventário tem uma linha por (usuário, carta).
+    #
+    # Com WAL e synchronous=NORMAL o commit não faz fsync; o único passo
+    # que espera o disco é o checkpoint. O automático fica desligado e o
+    # checkpoint roda na thread de I/O, com conexão própria, um intervalo
+    # depois da última escrita. Leituras e commits seguem no loop para que
+    # cada comando leia o que o anterior gravou.
+
+    COLUMNS = {
+        "balances": "balance",
+        "wins": "wins",
+        "spent": "spent",
+        "last_claims": "last_claim",
+    }
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id    TEXT PRIMARY KEY,
+            balance    INTEGER NOT NULL DEFAULT 0,
+            wins       INTEGER NOT NULL DEFAULT 0,
+            spent      INTEGER NOT NULL DEFAULT 0,
+            last_claim REAL    NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_wins  ON users (wins DESC);
+        CREATE INDEX IF NOT EXISTS idx_users_spent ON users (spent DESC);
+
+        CREATE TABLE IF NOT EXISTS inventory (
+            user_id TEXT    NOT NULL,
+            card_id INTEGER NOT NULL,
+            count   INTEGER NOT NULL,
+            PRIMARY KEY (user_id, card_id)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS join_times (
+            guild_id TEXT NOT NULL,
+            user_id  TEXT NOT NULL,
+            ts       REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS duels (
+            challenger TEXT NOT NULL,
+            challenged TEXT NOT NULL,
+            data       TEXT NOT NULL,
+            PRIMARY KEY (challenger, challenged)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, files: dict, db_path: Path, flush_interval: float = 5.0, resolve_card=None,
+                 io=None):
+        self.files = dict(files)
+        self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self._timer = None
+        self._conn_io = None
+        self.io = io or IOWorker("storage-sqlite")
+        novo = not self.db_path.exists()
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA wal_autocheckpoint=0")
+        legado = self._rename_legacy_inventory()
+        self.conn.executescript(self.SCHEMA)
+        if novo:
+            self.import_json(resolve_card)
+        elif legado:
+            self._migrate_legacy_inventory(resolve_card)
+
+    def import_json(self, resolve_card=None):
+        # Migração única dos arquivos JSON antigos para o banco.
+        records = []
+        for nome, column in self.COLUMNS.items():
+            for uid, value in _load_json(self.files[nome]).items():
+                records.append(("set", nome, uid, value))
+        inventarios = _load_json(self.files["cards"])
+        if resolve_card is not None:
+            records.extend(_migrate_inventories(inventarios, resolve_card))
+        records.extend(
+            ("set", "cards", uid, inv)
+            for uid, inv in inventarios.items()
+            if isinstance(inv, dict)
+        )
+        for gid, users in _load_json(self.files["join_times"]).items():
+            records.extend(("join", "join_times", [gid, uid], ts) for uid, ts in users.items())
+        if records:
+            self.apply(records)
+            print(f"[storage] {len(records)} registros importados para {self.db_path}")
+
+    def _rename_legacy_inventory(self) -> bool:
+        # Bancos antigos guardavam o dict inteiro da carta em "card".
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(inventory)")]
+        if "card" not in columns:
+            return False
+        with self.conn:
+            self.conn.execute("DROP INDEX IF EXISTS idx_inventory_user")
+            self.conn.execute("ALTER TABLE inventory RENAME TO inventory_legacy")
+        return True
+
+    def _migrate_legacy_inventory(self, resolve_card):
+        if resolve_card is None:
+            raise RuntimeError("inventário antigo no banco: é preciso o catálogo para migrar")
+        inventarios = {}
+        for uid, card in self.conn.execute("SELECT user_id, card FROM inventory_legacy ORDER BY id"):
+            inventarios.setdefault(uid, []).append(json.loads(card))
+        records = _migrate_inventories(inventarios, resolve_card)
+        with self.conn:
+            for rec in records:
+                self._exec(rec)
+            self.conn.execute("DROP TABLE inventory_legacy")
+        print(f"[storage] {len(records)} inventários migrados para ids do catálogo")
+
+    def table(self, nome: str) -> dict:
+        if nome in self.COLUMNS:
+            column = self.COLUMNS[nome]
+            rows = self.conn.execute(f"SELECT user_id, {column} FROM users WHERE {column} != 0")
+            return dict(rows)
+        if nome == "cards":
+            data = {}
+            for uid, cid, count in self.conn.execute("SELECT user_id, card_id, count FROM inventory"):
+                data.setdefault(uid, {})[str(cid)] = count
+            return data
+        if nome == "join_times":
+            data = {}
+            for gid, uid, ts in self.conn.execute("SELECT guild_id, user_id, ts FROM join_times"):
+                data.setdefault(gid, {})[uid] = ts
+            return data
+        if nome == "duels":
+            rows = self.conn.execute("SELECT challenger, challenged, data FROM duels")
+            return {f"{a}:{b}": json.loads(data) for a, b, data in rows}
+        raise KeyError(nome)
+
+    def get(self, nome: str, key: str, default=0):
+        with metrics.STORAGE_SEGUNDOS.time(backend="sqlite", op="read"):
+            return self._get(nome, key, default)
+
+    def _get(self, nome: str, key: str, default=0):
+        if nome == "duels":
+            row = self.conn.execute(
+                "SELECT data FROM duels WHERE challenger = ? AND challenged = ?",
+                tuple(key.split(":", 1)),
+            ).fetchone()
+            return json.loads(row[0]) if row else default
+        column = self.COLUMNS[nome]
+        row = self.conn.execute(f"SELECT {column} FROM users WHERE user_id = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def top(self, nome: str, n: int = 10):
+        column = self.COLUMNS[nome]
+        return self.conn.execute(
+            f"SELECT user_id, {column} FROM users WHERE {column} > 0 "
+            f"ORDER BY {column} DESC, user_id LIMIT ?",
+            (n,),
+        ).fetchall()
+
+    def rank(self, nome: str, user_id: str):
+        # conta quem está à frente pelo índice da coluna
+        column = self.COLUMNS[nome]
+        valor = self.get(nome, user_id, 0)
+        if valor <= 0:
+            return None
+        (frente,) = self.conn.execute(
+            f"SELECT COUNT(*) FROM users WHERE {column} > ? OR ({column} = ? AND user_id < ?)",
+            (valor, valor, user_id),
+        ).fetchone()
+        return frente + 1, valor
+
+    def _exec(self, rec):
+        op, nome, key, value = rec
+        if nome in self.COLUMNS:
+            column = self.COLUMNS[nome]
+            if op == "incr":
+                self.conn.execute(
+                    f"INSERT INTO users (user_id, {column}) VALUES (?, ?) "
+                    f"ON CONFLICT (user_id) DO UPDATE SET {column} = {column} + excluded.{column}",
+                    (key, int(value)),
+                )
+            elif op == "set":
+                self.conn.execute(
+                    f"INSERT INTO users (user_id, {column}) VALUES (?, ?) "
+                    f"ON CONFLICT (user_id) DO UPDATE SET {column} = excluded.{column}",
+                    (key, value),
+                )
+            elif op == "del":
+                self.conn.execute(f"UPDATE users SET {column} = 0 WHERE user_id = ?", (key,))
+            else:
+                raise ValueError(f"operação desconhecida: {op}")
+        elif op == "set" and nome == "cards":
+            self.conn.execute("DELETE FROM inventory WHERE user_id = ?", (key,))
+            self.conn.executemany(
+                "INSERT INTO inventory (user_id, card_id, count) VALUES (?, ?, ?)",
+                [(key, int(cid), int(count)) for cid, count in value.items() if count > 0],
+            )
+        elif op == "card+":
+            self.conn.execute(
+                "INSERT INTO inventory (user_id, card_id, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (user_id, card_id) DO UPDATE SET count = count + 1",
+                (key, int(value)),
+            )
+        elif op == "card-":
+            cur = self.conn.execute(
+                "UPDATE inventory SET count = count - 1 "
+                "WHERE user_id = ? AND card_id = ? AND count > 0",
+                (key, int(value)),
+            )
+            if cur.rowcount == 0:
+                raise ValueError(f"carta {value} não está no inventário de {key}")
+            self.conn.execute(
+                "DELETE FROM inventory WHERE user_id = ? AND card_id = ? AND count = 0",
+                (key, int(value)),
+            )
+        elif op == "join":
+            gid, uid = key
+            self.conn.execute(
+                "INSERT INTO join_times (guild_id, user_id, ts) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET ts = excluded.ts",
+                (gid, uid, value),
+            )
+        elif op == "join-":
+            gid, uid = key
+            if uid is None:
+                self.conn.execute("DELETE FROM join_times WHERE guild_id = ?", (gid,))
+            else:
+                self.conn.execute(
+                    "DELETE FROM join_times WHERE guild_id = ? AND user_id = ?", (gid, uid)
+                )
+        elif nome == "duels":
+            # chave "desafiante:desafiado"
+            challenger, challenged = key.split(":", 1)
+            if op == "set":
+                self.conn.execute(
+                    "INSERT INTO duels (challenger, challenged, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (challenger, challenged) DO UPDATE SET data = excluded.data",
+                    (challenger, challenged, json.dumps(value)),
+                )
+            elif op == "del":
+                self.conn.execute(
+                    "DELETE FROM duels WHERE challenger = ? AND challenged = ?",
+                    (challenger, challenged),
+                )
+            else:
+                raise ValueError(f"operação desconhecida: {op}")
+        else:
+            raise ValueError(f"operação desconhecida: {op}")
+
+    def apply(self, records):
+        with metrics.STORAGE_SEGUNDOS.time(backend="sqlite", op="apply"):
+            with self.conn:
+                for rec in records:
+                    self._exec(rec)
+        self._bump_versions(records)
+        self._notify(records)
+        if self._timer is None:
+            loop = _loop_atual()
+            if loop is not None:
+                self._timer = loop.call_later(self.flush_interval, self._agendar_flush)
+        return None  # já está no WAL
+
+    def cards(self, user_id: str) -> dict:
+        with metrics.STORAGE_SEGUNDOS.time(backend="sqlite", op="read"):
+            rows = self.conn.execute(
+                "SELECT card_id, count FROM inventory WHERE user_id = ?", (user_id,)
+            )
+            return {str(cid): count for cid, count in rows}
+
+    def card_count(self, user_id: str, card_id) -> int:
+        with metrics.STORAGE_SEGUNDOS.time(backend="sqlite", op="read"):
+            row = self.conn.execute(
+                "SELECT count FROM inventory WHERE user_id = ? AND card_id = ?",
+                (user_id, int(card_id)),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _agendar_flush(self):
+        # cada apply() já é uma transação; só falta o checkpoint do WAL
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.io.submit(("checkpoint", str(self.db_path)), self._checkpoint)
+        return self.io.barrier()
+
+    def _checkpoint(self):
+        # roda na thread de I/O; a conexão é criada (e usada) só nela
+        if self._conn_io is None:
+            self._conn_io = sqlite3.connect(self.db_path)
+        try:
+            with metrics.STORAGE_SEGUNDOS.time(backend="sqlite", op="write"):
+                self._conn_io.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        except Exception as e:
+            print(f"[storage] falha no checkpoint do WAL: {e}")
+
+
+_reservas = {}
+
+
+def _reservar(data_dir: Path, compartilhado: bool):
+    # json e journal gravam a partir da própria memória: um segundo
+    # processo no mesmo DATA_DIR apagaria as escritas do primeiro sem
+    # aviso. Eles seguram economy.lock sozinhos (o shared, junto com os
+    # outros processos shared) e quem chega depois falha na inicialização.
+    if fcntl is None:
+        return
+    path = Path(data_dir) / "economy.lock"
+    chave = str(path.resolve())
+    if chave in _reservas:
+        if _reservas[chave][1] != compartilhado:
+            raise RuntimeError(f"{data_dir} já está aberto com outro STORAGE_BACKEND neste processo")
+        return  # outro store do mesmo processo (benchmarks reabrem a base)
+    f = path.open("a")
+    try:
+        fcntl.flock(f, (fcntl.LOCK_SH if compartilhado else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        dica = "" if compartilhado else "; para vários processos use STORAGE_BACKEND=shared"
+        raise RuntimeError(f"{data_dir} está em uso por outro processo{dica}") from None
+    _reservas[chave] = (f, compartilhado)
+
+
+def open_store(backend: str, files: dict, data_dir: Path, flush_interval: float = 5.0,
+               resolve_card=None, io=None, sqlite_path=None):
+    backend = (backend or "json").lower()
+    if backend in ("json", "journal", "shared"):
+        _reservar(data_dir, compartilhado=backend == "shared")
+    if backend == "json":
+        return JsonStore(files, flush_interval=flush_interval, resolve_card=resolve_card, io=io)
+    if backend in ("journal", "shared"):
+        return (SharedJournalStore if backend == "shared" else JournalStore)(
+            files,
+            data_dir,
+            flush_interval=flush_interval,
+            compact_every=int(os.environ.get("JOURNAL_COMPACT_EVERY", 1000)),
+            fsync=os.environ.get("JOURNAL_FSYNC", "0") == "1",
+            resolve_card=resolve_card,
+            io=io,
+        )
+    if backend == "sqlite":
+        return SqliteStore(
+            files,
+            sqlite_path or os.environ.get("SQLITE_PATH", Path(data_dir) / "economy.db"),
+            flush_interval=flush_interval,
+            resolve_card=resolve_card,
+            io=io,
+        )
+    raise ValueError(f"STORAGE_BACKEND desconhecido: {backend}")